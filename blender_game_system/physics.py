@@ -11,6 +11,7 @@ from game_system.entities import Actor
 from game_system.controllers import PlayerPawnController
 from game_system.enums import PhysicsType
 from game_system.latency_compensation import PhysicsExtrapolator
+from game_system.physics import RigidBodyStateStore
 from game_system.signals import *
 
 
@@ -68,10 +69,16 @@ class BlenderPhysicsSystem(DelegateByNetmode, SignalListener):
 class BlenderServerPhysics(BlenderPhysicsSystem):
     """Handles server-side physics"""
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.network_states = RigidBodyStateStore()
+
     def save_network_states(self):
         """Saves Physics transformations to network variables"""
-        for actor in Replicable.subclass_of_type(Actor):
-            actor.copy_state_to_network()
+        network_states = self.network_states
+        network_states.save(Replicable.subclass_of_type(Actor))
+        network_states.write_network_states(WorldInfo.elapsed)
 
     @PhysicsTickSignal.on_global
     def update(self, delta_time):
@@ -30,7 +30,7 @@ from logging import getLogger
 from math import radians, pi
 
 
-__all__ = ['PawnController', 'PlayerPawnController', 'AIPawnController']
+__all__ = ['PawnController', 'PlayerPawnController', 'AIPawnController', 'send_synthetic_move']
 
 
 class PawnController(Replicable):
@@ -438,4 +438,18 @@ class PlayerPawnController(PawnController):
         buttons, ranges = input_state.read()
         self.process_inputs(buttons, ranges)
 
-        self.pending_validation_move_id = move_id
\ No newline at end of file
+        self.pending_validation_move_id = move_id
+
+
+def send_synthetic_move(client):
+    """Send a move from the player controller of a simulated client, for use as the update function of
+    :py:func:`network.swarm.run_swarm`. Simulated clients have no inputs or pawn, so an empty move is sent
+
+    :param client: :py:class:`network.swarm.SwarmClient` instance
+    """
+    controller = client.replicable
+    if not isinstance(controller, PlayerPawnController):
+        return
+
+    controller.move_id = (controller.move_id + 1) % (WorldInfo.MAXIMUM_TICK + 1)
+    controller.server_receive_move(controller.move_id, controller.latest_correction_id, [], Vector(), 0.0)
@@ -94,7 +94,8 @@ class Actor(ComponentEntity, Replicable):
     component_tags = ("physics", "transform")
 
     # Network data
-    rigid_body_state = Attribute(RigidBodyState())
+    # Changes are reported with mark_changed rather than detected each replication pass
+    rigid_body_state = Attribute(RigidBodyState(), delta=True, versioned=True)
     rigid_body_time = Attribute(data_type=float, notify=True)
 
     roles = Attribute(Roles(Roles.authority, Roles.simulated_proxy), notify=True)
@@ -123,15 +124,36 @@ class Actor(ComponentEntity, Replicable):
 
     def copy_state_to_network(self):
         """Copies Physics State to network attributes"""
+        self.set_network_state(self.transform.world_position.copy(), self.physics.world_velocity.copy(),
+                               self.physics.world_angular.copy(), self.transform.world_orientation.copy(),
+                               WorldInfo.elapsed)
+
+    def set_network_state(self, position, velocity, angular, orientation, timestamp):
+        """Set network physics state
+
+        :param position: world position
+        :param velocity: world velocity
+        :param angular: world angular velocity
+        :param orientation: world orientation
+        :param timestamp: time at which state was saved
+        """
         state = self.rigid_body_state
 
-        state.position = self.transform.world_position.copy()
-        state.orientation = self.transform.world_orientation.copy()
-        state.angular = self.physics.world_angular.copy()
-        state.velocity = self.physics.world_velocity.copy()
+        state.position = position
+        state.orientation = orientation
+        state.angular = angular
+        state.velocity = velocity
         # state.collision_group = self.physics.collision_group
         # state.collision_mask = self.physics.collision_mask
-        self.rigid_body_time = WorldInfo.elapsed
+        self.rigid_body_time = timestamp
+
+        attribute_container = self._attribute_container
+        attribute_container.mark_changed(attribute_container.get_member_by_name("rigid_body_state"))
+
+        # Update spatial relevancy
+        relevancy_grid = getattr(WorldInfo.rules, "relevancy_grid", None)
+        if relevancy_grid is not None:
+            relevancy_grid.update(self, position)
 
     def on_initialised(self):
         super().on_initialised()
@@ -144,6 +166,10 @@ class Actor(ComponentEntity, Replicable):
     def on_deregistered(self):
         self.unload_components()
 
+        relevancy_grid = getattr(WorldInfo.rules, "relevancy_grid", None)
+        if relevancy_grid is not None:
+            relevancy_grid.remove(self)
+
         super().on_deregistered()
 
     def on_notify(self, name):
@@ -1,13 +1,15 @@
 from network.type_flag import TypeFlag
 from network.handlers import get_handler, register_description, register_handler
+from network.serialiser import bits_to_bytes, get_quantised_float
 
 from functools import partial
 from itertools import chain
+from math import pi, sqrt
 
 from .coordinates import Vector, Euler, Quaternion, Matrix
 
 __all__ = ["Euler4", "Euler8", "Vector4", "Vector8", "Quaternion4",
-           "Quaternion8", "Matrix4", "Matrix8"]
+           "Quaternion8", "Matrix4", "Matrix8", "QuantisedVector", "QuantisedEuler", "SmallestThreeQuaternion"]
 
 
 class Euler8:
@@ -90,6 +92,119 @@ class Matrix8(Matrix4):
     item_size = Vector8.size()
 
 
+class QuantisedVector:
+    """Handler for vectors with components quantised to a precision within a range"""
+
+    wrapper = Vector
+    wrapper_length = 3
+
+    default_minimum = None
+    default_maximum = None
+
+    def __init__(self, type_flag):
+        data = type_flag.data
+
+        minimum = data.get("min", self.default_minimum)
+        maximum = data.get("max", self.default_maximum)
+
+        if minimum is None or maximum is None:
+            raise ValueError("Quantised {} requires a min and max value".format(self.wrapper.__name__))
+
+        self.packer = get_quantised_float(minimum, maximum, data["precision"])
+
+    def pack(self, vector):
+        return self.packer.pack_multiple(vector, self.wrapper_length)
+
+    def unpack_from(self, bytes_string, offset=0):
+        components, size = self.packer.unpack_multiple(bytes_string, self.wrapper_length, offset)
+        return self.wrapper(components), size
+
+    def unpack_merge(self, vector, bytes_string, offset=0):
+        components, size = self.packer.unpack_multiple(bytes_string, self.wrapper_length, offset)
+        vector[:] = components
+        return size
+
+    def size(self, bytes_string=None):
+        return bits_to_bytes(self.packer.bits * self.wrapper_length)
+
+
+class QuantisedEuler(QuantisedVector):
+    """Handler for euler rotations with angles quantised to a precision (by default, within -pi to pi)"""
+
+    wrapper = Euler
+
+    default_minimum = -pi
+    default_maximum = pi
+
+
+class SmallestThreeQuaternion:
+    """Handler for unit quaternions, packed with the smallest-three encoding.
+
+    The index of the largest component is packed in two bits, followed by the three remaining components quantised
+    to a precision. The largest component is reconstructed from the others
+    """
+
+    wrapper = Quaternion
+
+    # Range of all but the largest component of a unit quaternion
+    component_limit = 1 / sqrt(2)
+
+    def __init__(self, type_flag):
+        limit = self.component_limit
+        self.packer = get_quantised_float(-limit, limit, type_flag.data["precision"])
+
+        self.bits = self.packer.bits
+        self.byte_length = bits_to_bytes(2 + 3 * self.bits)
+
+    def pack(self, quaternion):
+        components = list(quaternion)
+        largest_index = max(range(4), key=lambda i: abs(components[i]))
+
+        # q and -q are the same rotation, so the largest component is always positive
+        if components[largest_index] < 0:
+            components = [-c for c in components]
+
+        quantise = self.packer.quantise
+        bits = self.bits
+
+        packed = largest_index
+        for index, component in enumerate(components):
+            if index != largest_index:
+                packed = (packed << bits) | quantise(component)
+
+        return packed.to_bytes(self.byte_length, 'big')
+
+    def unpack_components(self, bytes_string, offset=0):
+        """Return list of quaternion components
+
+        :param bytes_string: packed data
+        :param offset: offset of packed data
+        """
+        byte_length = self.byte_length
+        packed = int.from_bytes(bytes_string[offset: offset + byte_length], 'big')
+
+        bits = self.bits
+        mask = (1 << bits) - 1
+        dequantise = self.packer.dequantise
+
+        smallest = [dequantise((packed >> (bits * index)) & mask) for index in (2, 1, 0)]
+        largest_index = packed >> (3 * bits)
+        largest = sqrt(max(0.0, 1.0 - sum(c * c for c in smallest)))
+
+        smallest.insert(largest_index, largest)
+        return smallest
+
+    def unpack_from(self, bytes_string, offset=0):
+        return self.wrapper(self.unpack_components(bytes_string, offset)), self.byte_length
+
+    def unpack_merge(self, quaternion, bytes_string, offset=0):
+        quaternion[:] = self.unpack_components(bytes_string, offset)
+        return self.byte_length
+
+    def size(self, bytes_string=None):
+        return self.byte_length
+
+
 def matrix_description(obj):
     return hash(tuple(chain.from_iterable(obj)))
 
@@ -102,10 +217,18 @@ def precision_switch(low, high, type_flag):
     return high if type_flag.data.get("max_precision") else low
 
 
+def quantised_switch(low, high, quantised, type_flag):
+    if "precision" in type_flag.data:
+        return quantised(type_flag)
+
+    return precision_switch(low, high, type_flag)
+
+
 # Register packers
-register_handler(Vector, partial(precision_switch, Vector4, Vector8), is_callable=True)
-register_handler(Euler, partial(precision_switch, Euler4, Euler8), is_callable=True)
-register_handler(Quaternion, partial(precision_switch, Quaternion4, Quaternion8), is_callable=True)
+register_handler(Vector, partial(quantised_switch, Vector4, Vector8, QuantisedVector), is_callable=True)
+register_handler(Euler, partial(quantised_switch, Euler4, Euler8, QuantisedEuler), is_callable=True)
+register_handler(Quaternion, partial(quantised_switch, Quaternion4, Quaternion8, SmallestThreeQuaternion),
+                 is_callable=True)
 register_handler(Matrix, partial(precision_switch, Matrix4, Matrix8), is_callable=True)
 
 # Register custom hash-like descriptions
@@ -1,6 +1,138 @@
+from array import array
 from collections import namedtuple
+from itertools import chain
+from math import nan
+
+from .coordinates import Euler, Vector
 
 
 RayTestResult = namedtuple("RayTestResult", "position normal entity distance")
 CollisionResult = namedtuple("CollisionResult", "entity state contacts")
 CollisionContact = namedtuple("CollisionContact", "position normal impulse")
+
+
+class RigidBodyStateStore:
+    """Struct-of-arrays store of rigid body network states.
+
+    The position, velocity, angular velocity and orientation of each actor are held in contiguous float arrays, with
+    three components per actor. States are saved from the physics world in one pass, and compared against the states
+    last written to the network, so that only the RigidBodyStates of changed actors are updated
+    """
+
+    fields = "position", "velocity", "angular", "orientation"
+
+    def __init__(self):
+        self.actors = []
+        self.rows = {}
+
+        self.columns = {name: array('d') for name in self.fields}
+        self.network_columns = {name: array('d') for name in self.fields}
+
+        # Metrics
+        self.changed_count = 0
+
+    def add(self, actor):
+        """Add row for actor
+
+        :param actor: Actor instance
+        """
+        self.rows[actor] = len(self.actors)
+        self.actors.append(actor)
+
+        for column in self.columns.values():
+            column.extend((0.0, 0.0, 0.0))
+
+        # Unsaved states are always changed
+        for column in self.network_columns.values():
+            column.extend((nan, nan, nan))
+
+    def remove(self, actor):
+        """Remove row of actor, replacing it with the last row
+
+        :param actor: Actor instance
+        """
+        row = self.rows.pop(actor)
+        last_actor = self.actors.pop()
+        last_row = len(self.actors)
+
+        columns = list(self.columns.values()) + list(self.network_columns.values())
+
+        if row != last_row:
+            self.actors[row] = last_actor
+            self.rows[last_actor] = row
+
+            for column in columns:
+                column[row * 3: row * 3 + 3] = column[last_row * 3: last_row * 3 + 3]
+
+        for column in columns:
+            del column[last_row * 3:]
+
+    def update_actors(self, actors):
+        """Add and remove rows to match a collection of actors
+
+        :param actors: collection of Actor instances
+        """
+        rows = self.rows
+
+        for actor in [a for a in self.actors if a not in actors]:
+            self.remove(actor)
+
+        for actor in actors:
+            if actor not in rows:
+                self.add(actor)
+
+    def save(self, actors):
+        """Save physics states of actors
+
+        :param actors: collection of Actor instances
+        """
+        self.update_actors(actors)
+
+        transforms = [actor.transform for actor in self.actors]
+        physics = [actor.physics for actor in self.actors]
+
+        columns = self.columns
+        columns["position"] = array('d', chain.from_iterable([t.world_position for t in transforms]))
+        columns["orientation"] = array('d', chain.from_iterable([t.world_orientation for t in transforms]))
+        columns["velocity"] = array('d', chain.from_iterable([p.world_velocity for p in physics]))
+        columns["angular"] = array('d', chain.from_iterable([p.world_angular for p in physics]))
+
+    def get_changed_rows(self):
+        """Return list of rows whose saved states differ from their network states"""
+        columns = self.columns
+        network_columns = self.network_columns
+
+        differing = [(memoryview(columns[name]), memoryview(network_columns[name])) for name in self.fields
+                     if columns[name] != network_columns[name]]
+
+        if not differing:
+            return []
+
+        return [row for row in range(len(self.actors))
+                if any(saved[row * 3: row * 3 + 3] != sent[row * 3: row * 3 + 3] for saved, sent in differing)]
+
+    def write_network_states(self, timestamp):
+        """Copy saved states of changed actors to their RigidBodyStates
+
+        :param timestamp: time at which states were saved
+        """
+        changed_rows = self.get_changed_rows()
+        columns = self.columns
+
+        position = columns["position"]
+        velocity = columns["velocity"]
+        angular = columns["angular"]
+        orientation = columns["orientation"]
+
+        actors = self.actors
+
+        for row in changed_rows:
+            start = row * 3
+            end = start + 3
+
+            actors[row].set_network_state(Vector(position[start: end]), Vector(velocity[start: end]),
+                                          Vector(angular[start: end]), Euler(orientation[start: end]), timestamp)
+
+        # Remember sent states
+        self.network_columns = {name: column[:] for name, column in columns.items()}
+        self.changed_count = len(changed_rows)
@@ -9,7 +9,7 @@ class RigidBodyState(Struct):
     position = Attribute(data_type=Vector)
     velocity = Attribute(data_type=Vector)
     angular = Attribute(data_type=Vector)
-    orientation = Attribute(data_type=Euler)
+    orientation = Attribute(data_type=Euler, precision=0.001)
 
     collision_group = Attribute(data_type=int)
     collision_mask = Attribute(data_type=int)
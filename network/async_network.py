@@ -0,0 +1,147 @@
+from .capture import CaptureDirection
+from .connection import Connection
+from .simple_network import SimpleNetwork
+
+from asyncio import (DatagramProtocol, Event, get_running_loop, new_event_loop, sleep, wait_for,
+                     TimeoutError as AsyncTimeoutError)
+from functools import partial
+from time import perf_counter
+
+__all__ = ['AsyncNetwork', 'AsyncNetworkProtocol']
+
+
+class AsyncNetworkProtocol(DatagramProtocol):
+    """Datagram protocol which dispatches received datagrams to a network"""
+
+    def __init__(self, network):
+        self.network = network
+
+    def datagram_received(self, data, address):
+        self.network.on_datagram(data, address)
+
+
+class AsyncNetwork(SimpleNetwork):
+    """Network update loop driven by an asyncio event loop.
+
+    Datagrams are dispatched to connections as they are received, and connections are sent to at the update rate.
+    The loop sleeps between updates, and waits for a datagram whilst there are no connections
+    """
+
+    def __init__(self, address="", port=0):
+        super().__init__(address, port)
+
+        self.transport = None
+        self._datagram_received = None
+
+    def on_datagram(self, data, address):
+        """Dispatch received datagram to the connection for its address
+
+        :param data: datagram data
+        :param address: address of remote peer
+        """
+        self.metrics.on_received_bytes(len(data))
+
+        if self.capture is not None:
+            self.capture.write(perf_counter(), CaptureDirection.received, address, data)
+
+        try:
+            connection = Connection[address]
+
+        # Create a new interface to handle connection
+        except KeyError:
+            connection = Connection(address)
+
+        connection.receive(data)
+
+        if self._datagram_received is not None:
+            self._datagram_received.set()
+
+    def receive(self):
+        """Update receive metrics and multi-cast listeners, datagrams are received by the event loop"""
+        self.metrics.reset_tick_counters()
+        self.multicast.receive()
+
+    def send_batch(self, datagrams):
+        """Send data to several remote peers using the transport
+
+        :param datagrams: sequence of (data, address) pairs
+        """
+        sendto = self.transport.sendto
+        data_length = 0
+
+        for data, address in datagrams:
+            sendto(data, address)
+            data_length += len(data)
+
+        if self.capture is not None:
+            self.capture_sent(datagrams)
+
+        self.metrics.on_sent_bytes(data_length)
+        self.metrics.on_send_calls(len(datagrams))
+
+        return data_length
+
+    async def serve(self, timeout=None, update_rate=1/60):
+        """Receive and send data until there are no connections after timeout has elapsed (or indefinitely)
+
+        :param timeout: minimum duration to serve for, in seconds
+        :param update_rate: interval between updates, in seconds
+        """
+        loop = get_running_loop()
+        self._datagram_received = Event()
+        self.transport, _ = await loop.create_datagram_endpoint(partial(AsyncNetworkProtocol, self), sock=self.socket)
+
+        started = loop.time()
+        next_update = started
+
+        try:
+            while True:
+                current_time = loop.time()
+
+                if timeout is None:
+                    remaining_time = None
+
+                else:
+                    remaining_time = started + timeout - current_time
+
+                if not Connection:
+                    if remaining_time is not None and remaining_time <= 0:
+                        break
+
+                    # Wait for a peer, rather than updating
+                    self._datagram_received.clear()
+
+                    try:
+                        await wait_for(self._datagram_received.wait(), remaining_time)
+
+                    except AsyncTimeoutError:
+                        continue
+
+                    next_update = loop.time()
+
+                self.step()
+
+                # Skip updates which were missed
+                next_update = max(next_update + update_rate, loop.time())
+                await sleep(next_update - loop.time())
+
+        finally:
+            self.transport.close()
+            self.transport = None
+            self._datagram_received = None
+
+            self.stop()
+
+    def run(self, timeout=None, update_rate=1/60):
+        """Serve on a new event loop until finished
+
+        :param timeout: minimum duration to serve for, in seconds
+        :param update_rate: interval between updates, in seconds
+        """
+        loop = new_event_loop()
+
+        try:
+            loop.run_until_complete(self.serve(timeout, update_rate))
+
+        finally:
+            loop.close()
@@ -60,13 +60,52 @@ if USE_BITARRAY:
             ``Bitfield.from_iterable()``"""
             return cls(iterable)
 
+        @classmethod
+        def from_int(cls, length, value):
+            field = cls(length)
+            field.set_mask(value)
+            return field
+
+        def iter_set_bits(self):
+            return (index for index, value in enumerate(self) if value)
+
+        def popcount(self):
+            return self.count(True)
+
+        def set_mask(self, value):
+            self[:] = [bool(value & (1 << index)) for index in range(len(self))]
+
+        def shift_in(self, bit):
+            self[:] = [bool(bit)] + self[:-1]
+
+        def to_int(self):
+            return sum(1 << index for index, value in enumerate(self) if value)
+
         calculate_footprint = staticmethod(bits_to_bytes)
         to_bytes = array_field.tobytes
 
 else:
+    # Integer handlers, by field size
+    _handlers = {}
+
+    def _get_field_handler(size):
+        """Return (cached) integer handler for a field of a given size
+
+        :param size: number of bits in field
+        """
+        try:
+            return _handlers[size]
+
+        except KeyError:
+            handler = _handlers[size] = get_handler(TypeFlag(int, max_bits=size))
+            return handler
+
     class BitField:
 
-        """BitField data type which supports slicing operations"""
+        """BitField data type which supports slicing operations.
+
+        Bits are stored in a single integer, with index zero as the least significant bit
+        """
 
         def __init__(self, size=8):
             self._value = 0
@@ -92,13 +131,20 @@ else:
                 return (self._value & (1 << value)) != 0
 
         def __iter__(self):
-            return (self[i] for i in range(self._size))
+            _value = self._value
+            return (bool(_value & (1 << index)) for index in range(self._size))
 
         def __setitem__(self, index, value):
             if isinstance(index, slice):
+                start, stop, step = index.indices(self._size)
+
+                # Whole-word assignment
+                if isinstance(value, BitField) and value._size >= stop == self._size and start == 0 and step == 1:
+                    self._value = value._value & self._mask
+                    return
 
                 current_value = self._value
-                for shift_depth, slice_value in zip(range(*index.indices(self._size)), value):
+                for shift_depth, slice_value in zip(range(start, stop, step), value):
 
                     if slice_value:
                         current_value |= 1 << shift_depth
@@ -144,6 +190,19 @@ else:
             field._value, field_size = field._handler.unpack_from(bytes_string, offset)
             return field, field_size
 
+        @classmethod
+        def from_int(cls, length, value):
+            """Factory function to create a BitField object of a known length from an integer mask
+
+            :param length: number of bits in field
+            :param value: integer mask, where bit N is the value of index N
+            """
+            field = cls()
+            field.resize(length)
+
+            field.set_mask(value)
+            return field
+
         @classmethod
         def from_iterable(cls, iterable):
             """Factory function to create a BitField from an iterable object
@@ -157,7 +216,7 @@ else:
             field = cls()
             field.resize(size)
 
-            field[:size] = iterable
+            field._value = sum(1 << index for index, value in enumerate(iterable) if value)
             return field
 
         def clear(self):
@@ -165,19 +224,55 @@ else:
             """
             self._value = 0
 
+        def iter_set_bits(self):
+            """Return iterator over the indices of set bits, in ascending order"""
+            value = self._value
+
+            while value:
+                # Skip to lowest set bit
+                lowest_bit = value & -value
+                index = lowest_bit.bit_length() - 1
+
+                yield index
+
+                value ^= lowest_bit
+
+        def popcount(self):
+            """Return number of set bits"""
+            return bin(self._value).count("1")
+
         def resize(self, size):
             """Resize the BitField
 
             :param size: new size of BitField instance
             """
-            #TODO cache the handler
             self._size = size
-            self._handler = get_handler(TypeFlag(int, max_bits=size))
+            self._mask = (1 << size) - 1
+            self._value &= self._mask
+            self._handler = _get_field_handler(size)
+
+        def set_mask(self, value):
+            """Set all bits from an integer mask
+
+            :param value: integer mask, where bit N is the value of index N
+            """
+            self._value = value & self._mask
+
+        def shift_in(self, bit):
+            """Shift all bits up by one index, discarding the last bit, and set the first bit
+
+            :param bit: value of first bit
+            """
+            self._value = ((self._value << 1) | (1 if bit else 0)) & self._mask
 
         def to_bytes(self):
             """Represent bitfield as bytes"""
             return self._handler.pack(self._value)
 
+        def to_int(self):
+            """Return integer mask, where bit N is the value of index N"""
+            return self._value
+
 
 class NamedBitField:
     """BitField class with support for named fields"""
@@ -0,0 +1,241 @@
+from .handlers import get_handler
+
+__all__ = ['BitWriter', 'BitReader', 'BitUIntHandler', 'BitBoolHandler', 'BitStructHandler', 'get_bit_handler']
+
+
+class BitWriter:
+    """Writes values of exact bit widths to a byte stream.
+
+    Values are written most significant bit first. Handlers without a bit representation are written as bytes,
+    aligned to the next byte boundary
+    """
+
+    __slots__ = "_chunks", "_value", "_bits"
+
+    def __init__(self):
+        self._chunks = []
+        self._value = 0
+        self._bits = 0
+
+    @property
+    def bit_length(self):
+        """Number of bits written"""
+        return sum(len(c) for c in self._chunks) * 8 + self._bits
+
+    def write(self, value, bits):
+        """Write unsigned integer value
+
+        :param value: unsigned integer, less than 2 ** bits
+        :param bits: number of bits to write
+        """
+        self._value = (self._value << bits) | value
+        self._bits += bits
+
+        # Flush whole bytes to keep the accumulator small
+        if self._bits >= 64:
+            self._flush()
+
+    def _flush(self):
+        remainder = self._bits & 7
+        whole_bytes = self._bits >> 3
+
+        self._chunks.append((self._value >> remainder).to_bytes(whole_bytes, 'big'))
+        self._value &= (1 << remainder) - 1
+        self._bits = remainder
+
+    def align(self):
+        """Pad with zero bits to the next byte boundary"""
+        remainder = self._bits & 7
+
+        if remainder:
+            self.write(0, 8 - remainder)
+
+        if self._bits:
+            self._flush()
+
+    def write_aligned_bytes(self, bytes_string):
+        """Write bytes, aligned to the next byte boundary
+
+        :param bytes_string: bytes to write
+        """
+        self.align()
+        self._chunks.append(bytes_string)
+
+    def write_value(self, handler, value):
+        """Write value using bit representation of handler, or its aligned bytes if it has none
+
+        :param handler: data handler
+        :param value: value to write
+        """
+        write_bits = getattr(handler, "write_bits", None)
+
+        if write_bits is None:
+            self.write_aligned_bytes(handler.pack(value))
+
+        else:
+            write_bits(self, value)
+
+    def to_bytes(self):
+        """Return written bytes, padded to a whole number of bytes"""
+        self.align()
+        return b''.join(self._chunks)
+
+
+class BitReader:
+    """Reads values of exact bit widths from a byte stream"""
+
+    __slots__ = "bytes_string", "bit_offset"
+
+    def __init__(self, bytes_string, offset=0):
+        """
+        :param bytes_string: byte stream
+        :param offset: byte offset to start reading from
+        """
+        self.bytes_string = bytes_string
+        self.bit_offset = offset * 8
+
+    @property
+    def byte_offset(self):
+        """Offset of the byte containing the next bit to be read"""
+        return self.bit_offset >> 3
+
+    def read(self, bits):
+        """Read unsigned integer value
+
+        :param bits: number of bits to read
+        """
+        if not bits:
+            return 0
+
+        start_bit = self.bit_offset
+        end_bit = start_bit + bits
+        end_byte = (end_bit + 7) >> 3
+
+        value = int.from_bytes(self.bytes_string[start_bit >> 3: end_byte], 'big')
+        self.bit_offset = end_bit
+
+        return (value >> ((end_byte << 3) - end_bit)) & ((1 << bits) - 1)
+
+    def align(self):
+        """Skip to the next byte boundary"""
+        self.bit_offset = (self.bit_offset + 7) & ~7
+
+    def read_value(self, handler):
+        """Read value using bit representation of handler, or its aligned bytes if it has none
+
+        :param handler: data handler
+        """
+        read_bits = getattr(handler, "read_bits", None)
+
+        if read_bits is not None:
+            return read_bits(self)
+
+        self.align()
+        value, size = handler.unpack_from(self.bytes_string, self.bit_offset >> 3)
+        self.bit_offset += size * 8
+
+        return value
+
+    def read_merge(self, handler, value):
+        """Read aligned bytes of handler into existing value
+
+        :param handler: data handler which supports unpack_merge
+        :param value: value to update
+        """
+        self.align()
+        size = handler.unpack_merge(value, self.bytes_string, self.bit_offset >> 3)
+        self.bit_offset += size * 8
+
+
+class BitUIntHandler:
+    """Bit representation of unsigned integers with a maximum bit width"""
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def write_bits(self, writer, value):
+        if value >> self.bits or value < 0:
+            raise ValueError("Integer cannot be packed in {} bits: {}".format(self.bits, value))
+
+        writer.write(value, self.bits)
+
+    def read_bits(self, reader):
+        return reader.read(self.bits)
+
+
+class BitBoolHandler:
+    """Bit representation of booleans"""
+
+    bits = 1
+
+    @staticmethod
+    def write_bits(writer, value):
+        writer.write(1 if value else 0, 1)
+
+    @staticmethod
+    def read_bits(reader):
+        return bool(reader.read(1))
+
+
+class BitStructHandler:
+    """Bit representation of fixed size struct handlers, which need not be byte-aligned"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.byte_length = handler.size()
+        self.bits = 8 * self.byte_length
+
+    def write_bits(self, writer, value):
+        writer.write(int.from_bytes(self.handler.pack(value), 'big'), self.bits)
+
+    def read_bits(self, reader):
+        return self.handler.unpack_from(reader.read(self.bits).to_bytes(self.byte_length, 'big'))[0]
+
+
+# Bit handlers, by bit width or struct handler
+_uint_handlers = {}
+_struct_handlers = {}
+
+
+def get_bit_handler(type_flag):
+    """Return handler which can read and write values of a TypeFlag to a bit stream.
+
+    Fixed width integers are written with the bit width of their max_value (or max_bits), booleans with a single bit, and fixed
+    size struct formats without alignment. Handlers of other types are returned as they are, and are written as
+    aligned bytes unless they support write_bits and read_bits
+
+    :param type_flag: TypeFlag instance
+    """
+    data_type = type_flag.data_type
+
+    if data_type is bool:
+        return BitBoolHandler
+
+    if data_type is int and "encoding" not in type_flag.data:
+        data = type_flag.data
+
+        if "max_value" in data:
+            bits = max(data["max_value"].bit_length(), 1)
+
+        else:
+            bits = data.get("max_bits", 8)
+
+        try:
+            return _uint_handlers[bits]
+
+        except KeyError:
+            handler = _uint_handlers[bits] = BitUIntHandler(bits)
+            return handler
+
+    handler = get_handler(type_flag)
+
+    # Fixed size struct formats can be packed at any bit offset
+    if getattr(handler, "struct_format", None) is not None and not hasattr(handler, "write_bits"):
+        try:
+            return _struct_handlers[handler]
+
+        except KeyError:
+            bit_handler = _struct_handlers[handler] = BitStructHandler(handler)
+            return bit_handler
+
+    return handler
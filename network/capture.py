@@ -0,0 +1,175 @@
+from bisect import bisect_left
+from mmap import mmap, ACCESS_READ
+from struct import Struct as PackStruct
+
+__all__ = ['CaptureDirection', 'CaptureRecord', 'CaptureWriter', 'CaptureReader']
+
+
+class CaptureDirection:
+    """Direction of captured datagrams"""
+    received = 0
+    sent = 1
+
+
+class CaptureRecord:
+    """Captured datagram"""
+
+    __slots__ = "timestamp", "direction", "address", "data"
+
+    def __init__(self, timestamp, direction, address, data):
+        self.timestamp = timestamp
+        self.direction = direction
+        self.address = address
+        self.data = data
+
+    def __repr__(self):
+        return "<CaptureRecord {:.4f} {} {} {} bytes>".format(self.timestamp, self.direction, self.address,
+                                                               len(self.data))
+
+
+class CaptureFormat:
+    """Binary capture log format.
+
+    File header, then records of: timestamp, direction, host length, port, data length, host, data.
+    An index of record offsets and timestamps is written when the log is closed, followed by a footer of the index
+    offset, record count and index marker. Logs without an index are indexed by reading all records
+    """
+
+    file_header = b"NETCAP1\0"
+    index_marker = b"NETIDX1\0"
+
+    record_header_struct = PackStruct("!dBBHI")
+    index_entry_struct = PackStruct("!Qd")
+    footer_struct = PackStruct("!QQ8s")
+
+
+class CaptureWriter(CaptureFormat):
+    """Writes captured datagrams to a binary log"""
+
+    def __init__(self, path):
+        """
+        :param path: path of log file
+        """
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(self.file_header)
+
+        self.offset = len(self.file_header)
+        self.index = []
+
+    def write(self, timestamp, direction, address, data):
+        """Write datagram to log
+
+        :param timestamp: wall time (time.perf_counter) at which datagram was captured
+        :param direction: CaptureDirection of datagram
+        :param address: (host, port) address of remote peer
+        :param data: datagram data
+        """
+        host, port = address
+        packed_host = host.encode()
+
+        record = self.record_header_struct.pack(timestamp, direction, len(packed_host), port, len(data)) + \
+            packed_host + bytes(data)
+
+        self.file.write(record)
+        self.index.append(self.index_entry_struct.pack(self.offset, timestamp))
+        self.offset += len(record)
+
+    def close(self):
+        """Write index and close log"""
+        file = self.file
+        file.write(b''.join(self.index))
+        file.write(self.footer_struct.pack(self.offset, len(self.index), self.index_marker))
+        file.close()
+
+
+class CaptureReader(CaptureFormat):
+    """Reads captured datagrams from a memory mapped binary log"""
+
+    def __init__(self, path):
+        """
+        :param path: path of log file
+        """
+        self.path = path
+
+        with open(path, "rb") as file:
+            self.memory = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+        if self.memory[:len(self.file_header)] != self.file_header:
+            raise ValueError("File is not a capture log: {}".format(path))
+
+        self.offsets, self.timestamps = self.read_index()
+
+    def read_index(self):
+        """Return lists of record offsets and timestamps, from the index if the log has one"""
+        memory = self.memory
+        footer_struct = self.footer_struct
+        footer_offset = len(memory) - footer_struct.size
+
+        if footer_offset >= len(self.file_header):
+            index_offset, record_count, marker = footer_struct.unpack_from(memory, footer_offset)
+
+            if marker == self.index_marker:
+                entry_struct = self.index_entry_struct
+                entries = [entry_struct.unpack_from(memory, index_offset + i * entry_struct.size)
+                           for i in range(record_count)]
+
+                return [offset for offset, _ in entries], [timestamp for _, timestamp in entries]
+
+        # Log was not closed, so read each record
+        offsets = []
+        timestamps = []
+
+        header_struct = self.record_header_struct
+        offset = len(self.file_header)
+
+        while offset + header_struct.size <= len(memory):
+            timestamp, _, host_length, _, data_length = header_struct.unpack_from(memory, offset)
+            end = offset + header_struct.size + host_length + data_length
+
+            # Record was partially written
+            if end > len(memory):
+                break
+
+            offsets.append(offset)
+            timestamps.append(timestamp)
+            offset = end
+
+        return offsets, timestamps
+
+    def read_record(self, offset):
+        """Return record at offset
+
+        :param offset: offset of record in log
+        """
+        header_struct = self.record_header_struct
+        timestamp, direction, host_length, port, data_length = header_struct.unpack_from(self.memory, offset)
+
+        host_offset = offset + header_struct.size
+        data_offset = host_offset + host_length
+
+        host = self.memory[host_offset: data_offset].decode()
+        data = memoryview(self.memory)[data_offset: data_offset + data_length]
+
+        return CaptureRecord(timestamp, direction, (host, port), data)
+
+    def find_index(self, timestamp):
+        """Return index of first record captured at or after timestamp
+
+        :param timestamp: capture timestamp
+        """
+        return bisect_left(self.timestamps, timestamp)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return self.read_record(self.offsets[index])
+
+    def __iter__(self):
+        read_record = self.read_record
+        for offset in self.offsets:
+            yield read_record(offset)
+
+    def close(self):
+        self.memory.close()
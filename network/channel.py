@@ -1,13 +1,16 @@
 from .conditions import is_reliable
 from .type_flag import TypeFlag
 from .decorators import with_tag
+from .delta import DeltaDecoder, DeltaEncoder, get_delta_flag
 from .enums import Netmodes
 from .flag_serialiser import FlagSerialiser
 from .handlers import static_description, get_handler
 from .logger import logger
+from .profiler import profiler
 from .tagged_delegate import DelegateByNetmode
 from .replicable import Replicable
 
+from collections import OrderedDict
 from functools import partial
 from time import clock
 
@@ -22,6 +25,9 @@ class Channel(DelegateByNetmode):
 
     subclasses = {}
 
+    # Serialisers and delta encoded attributes, by replicable class and bit packing
+    _serialisers = {}
+
     def __init__(self, connection, replicable):
         # Store important info
         self.replicable = replicable
@@ -34,10 +40,34 @@ class Channel(DelegateByNetmode):
         self.attribute_storage = replicable._attribute_container
         self.rpc_storage = replicable._rpc_container
 
-        # Create a serialiser instance
-        self.serialiser = FlagSerialiser(self.attribute_storage._ordered_mapping)
+        # Serialisers only depend upon the replicable class, so are shared by its channels
+        serialiser_key = replicable.__class__, connection.bit_packed
+
+        try:
+            self.serialiser, delta_attributes = self._serialisers[serialiser_key]
+
+        except KeyError:
+            # Delta encoded attributes are serialised as encoded bytes
+            serialiser_flags = OrderedDict()
+            delta_attributes = []
+
+            for name, attribute in self.attribute_storage._ordered_mapping.items():
+                delta_flag = get_delta_flag(attribute)
+
+                if delta_flag is None:
+                    serialiser_flags[name] = attribute
+
+                else:
+                    serialiser_flags[name] = delta_flag
+                    delta_attributes.append(attribute)
+
+            # Create a serialiser instance
+            self.serialiser = FlagSerialiser(serialiser_flags, bit_packed=connection.bit_packed)
+            self._serialisers[serialiser_key] = self.serialiser, delta_attributes
+
+        self.delta_attributes = list(delta_attributes)
 
-        self.rpc_id_packer = get_handler(TypeFlag(int))
+        self.rpc_id_packer = get_handler(TypeFlag(int, encoding="varint"))
         self.replicable_id_packer = get_handler(TypeFlag(Replicable))
         self.packed_id = self.replicable_id_packer.pack(replicable)
 
@@ -92,6 +122,11 @@ class Channel(DelegateByNetmode):
 @with_tag(Netmodes.client)
 class ClientChannel(Channel):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.delta_decoders = {attribute: DeltaDecoder(attribute) for attribute in self.delta_attributes}
+
     def notify_callback(self, notifications):
         invoke_notify = self.replicable.on_notify
         for attribute_name in notifications:
@@ -117,9 +152,19 @@ class ClientChannel(Channel):
         notifications = []
         notify = notifications.append
 
+        delta_decoders = self.delta_decoders
+
         for attribute_name, value in self.serialiser.unpack(bytes_string, replicable_data, offset=offset):
             attribute = get_attribute(attribute_name)
 
+            # Decode against previously received values
+            if attribute in delta_decoders:
+                value = delta_decoders[attribute].decode(value, replicable_data[attribute])
+
+                # Outdated values are not applied
+                if value is None:
+                    continue
+
             # Store new value
             replicable_data[attribute] = value
 
@@ -138,8 +183,20 @@ class ServerChannel(Channel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.hash_dict = self.attribute_storage.get_default_descriptions()
-        self.complaint_dict = self.attribute_storage.get_default_complaints()
+        attribute_storage = self.attribute_storage
+
+        # Versions of last replicated values
+        self.sent_versions = {attribute: 0 for attribute in attribute_storage.versions}
+        self.complain_attributes = [attribute for attribute in attribute_storage.versions if attribute.complain]
+
+        # Descriptions of last replicated values which depend upon role context
+        default_descriptions = attribute_storage.get_default_descriptions()
+        self.hash_dict = {attribute: default_descriptions[attribute]
+                          for attribute in attribute_storage.contextual_attributes}
+
+        # Delta encoders, and snapshots which were last encoded
+        self.delta_encoders = {attribute: DeltaEncoder(attribute) for attribute in self.delta_attributes}
+        self.delta_snapshots = {}
 
     @property
     def replication_priority(self):
@@ -163,15 +220,18 @@ class ServerChannel(Channel):
         # Get Replicable and its class
         replicable = self.replicable
 
+        # Versions of attribute values, described (if needed) outside of role context
+        versions = self.attribute_storage.get_versions()
+        sent_versions = self.sent_versions
+
         # Set role context
         with replicable.roles.set_context(is_owner):
 
             # Local access
             previous_hashes = self.hash_dict
-            previous_complaints = self.complaint_dict
 
-            complaint_hashes = self.attribute_storage.complaints
-            is_complaining = previous_complaints != complaint_hashes
+            is_complaining = any(versions[attribute] != sent_versions[attribute]
+                                 for attribute in self.complain_attributes)
 
             # Get names of Replicable attributes
             can_replicate = replicable.conditions(is_owner, is_complaining, self.is_initial)
@@ -182,6 +242,10 @@ class ServerChannel(Channel):
 
             # Store dict of attribute-> value
             to_serialise = {}
+            is_contextual = False
+
+            delta_encoders = self.delta_encoders
+            self.delta_snapshots.clear()
 
             # Iterate over attributes
             for name in can_replicate:
@@ -189,26 +253,38 @@ class ServerChannel(Channel):
                 attribute = get_attribute(name)
                 value = attribute_data[attribute]
 
-                # Check if the last hash is the same
-                last_hash = previous_hashes[attribute]
+                # Compare descriptions of context dependent values
+                if attribute in previous_hashes:
+                    sent_versions[attribute] = versions[attribute]
+                    new_hash = get_description(value)
 
-                # Get value hash
-                # Use the complaint hash if it is there to save computation
-                new_hash = complaint_hashes[attribute] if (attribute in complaint_hashes) else get_description(value)
+                    # If values match, don't update
+                    if previous_hashes[attribute] == new_hash:
+                        continue
 
-                # If values match, don't update
-                if last_hash == new_hash:
-                    continue
+                    # Remember hash of value
+                    previous_hashes[attribute] = new_hash
+                    is_contextual = True
 
-                # Add value to data dict
-                to_serialise[name] = value
+                # Otherwise compare versions
+                else:
+                    version = versions[attribute]
+
+                    # If values match, don't update
+                    if sent_versions[attribute] == version:
+                        continue
+
+                    # Remember version of value
+                    sent_versions[attribute] = version
 
-                # Remember hash of value
-                previous_hashes[attribute] = new_hash
+                    # Encode against acknowledged snapshot of value
+                    if attribute in delta_encoders:
+                        encoder = delta_encoders[attribute]
+                        value, self.delta_snapshots[encoder] = encoder.encode(value)
+                        is_contextual = True
 
-                # Set new complaint hash if it was complaining
-                if attribute.complain and attribute in complaint_hashes:
-                    previous_complaints[attribute] = new_hash
+                # Add value to data dict
+                to_serialise[name] = value
 
             # We must have now replicated
             self.last_replication_time = clock()
@@ -216,10 +292,35 @@ class ServerChannel(Channel):
 
             # An output of bytes asserts we have data
             if to_serialise:
-                # Returns packed data
-                data = self.serialiser.pack(to_serialise)
+                # Context dependent values are packed for this channel only
+                if is_contextual:
+                    data = self.serialiser.pack(to_serialise)
+
+                # Share packed data between channels
+                else:
+                    data, is_cached = self.attribute_storage.get_encoded(to_serialise, self.serialiser.pack)
+                    profiler.count("encode_cache_hits" if is_cached else "encode_cache_misses")
 
             else:
                 data = None
 
         return data
+
+    def on_snapshots_acked(self, delta_snapshots, packet):
+        """Use acknowledged snapshots as baselines for delta encoding
+
+        :param delta_snapshots: mapping of delta encoder to snapshot id
+        :param packet: acknowledged packet
+        """
+        for encoder, snapshot_id in delta_snapshots.items():
+            encoder.on_ack(snapshot_id)
+
+    def take_ack_callback(self):
+        """Return callback for acknowledgement of the last attributes payload, or None if not required"""
+        if not self.delta_snapshots:
+            return None
+
+        delta_snapshots = self.delta_snapshots.copy()
+        self.delta_snapshots.clear()
+
+        return partial(self.on_snapshots_acked, delta_snapshots)
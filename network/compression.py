@@ -0,0 +1,139 @@
+from collections import Counter
+from zlib import adler32, compressobj, decompressobj, error as ZlibError, Z_DEFAULT_COMPRESSION
+
+__all__ = ['PacketCompressor', 'train_dictionary', 'get_dictionary_id']
+
+
+def get_dictionary_id(dictionary):
+    """Return identifier of preset dictionary, which peers compare to agree upon a dictionary
+
+    :param dictionary: preset dictionary bytes
+    """
+    return adler32(dictionary)
+
+
+def train_dictionary(samples, size=2 ** 15, segment_length=8):
+    """Return preset dictionary for zlib, trained from sample data (e.g. captured packet payloads).
+
+    The dictionary is composed of the most common segments of the samples, with the most common segments last, as
+    they are closest to (and so cheapest to reference from) compressed data
+
+    :param samples: iterable of bytes-like samples
+    :param size: maximum size of dictionary (no larger than the zlib window)
+    :param segment_length: length of counted segments
+    """
+    counts = Counter()
+
+    for sample in samples:
+        sample = bytes(sample)
+
+        # Count each segment once per sample, so that a single large sample does not dominate
+        counts.update({sample[i: i + segment_length] for i in range(0, len(sample) - segment_length + 1)})
+
+    # Segments which occur in only one sample are not worth referencing
+    segments = [segment for segment, count in counts.most_common() if count > 1]
+    segments = segments[:size // segment_length]
+
+    return b''.join(reversed(segments))
+
+
+class PacketCompressor:
+    """Compresses packet data with zlib and an optional preset dictionary.
+
+    Compression is skipped for data which is too small to benefit, and after a run of attempts which did not reduce
+    the data size by enough to pay off. Compression is attempted again after a number of skipped calls
+    """
+
+    # Smallest data which is compressed
+    min_size = 64
+
+    # Compressed data must be no larger than this fraction of its original size to be worth sending
+    max_ratio = 0.9
+
+    # Weight of the latest attempt in the moving average ratio
+    ratio_weight = 0.25
+
+    # Number of calls skipped before compression is attempted again
+    probe_interval = 16
+
+    # Largest decompressed data
+    max_decompressed_size = 2 ** 16
+
+    def __init__(self, dictionary=b'', level=Z_DEFAULT_COMPRESSION):
+        """
+        :param dictionary: preset dictionary, which must be used by both peers
+        :param level: zlib compression level
+        """
+        self.dictionary = dictionary
+        self.dictionary_id = get_dictionary_id(dictionary)
+        self.level = level
+
+        # Loading the dictionary is expensive, so each call uses a copy of primed objects
+        if dictionary:
+            self._compressor = compressobj(level, zdict=dictionary)
+            self._decompressor = decompressobj(zdict=dictionary)
+
+        else:
+            self._compressor = compressobj(level)
+            self._decompressor = decompressobj()
+
+        self.ratio = 0.0
+        self.skipped_calls = 0
+
+        # Metrics
+        self.compressed_count = 0
+        self.skipped_count = 0
+        self.saved_bytes = 0
+
+    def compress(self, data):
+        """Return compressed data, or None if it was not worth compressing
+
+        :param data: bytes-like data
+        """
+        size = len(data)
+        if size < self.min_size:
+            return None
+
+        # Only probe occasionally whilst compression does not pay off
+        if self.ratio > self.max_ratio:
+            self.skipped_calls += 1
+
+            if self.skipped_calls < self.probe_interval:
+                self.skipped_count += 1
+                return None
+
+            self.skipped_calls = 0
+
+        compressor = self._compressor.copy()
+        compressed = compressor.compress(data) + compressor.flush()
+        ratio = len(compressed) / size
+
+        weight = self.ratio_weight
+        self.ratio = ratio * weight + self.ratio * (1 - weight)
+
+        if ratio > self.max_ratio:
+            self.skipped_count += 1
+            return None
+
+        self.compressed_count += 1
+        self.saved_bytes += size - len(compressed)
+
+        return compressed
+
+    def decompress(self, data):
+        """Return decompressed data, or None if it is invalid or too large
+
+        :param data: compressed data
+        """
+        decompressor = self._decompressor.copy()
+
+        try:
+            decompressed = decompressor.decompress(data, self.max_decompressed_size)
+
+        except ZlibError:
+            return None
+
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            return None
+
+        return decompressed
@@ -1,4 +1,3 @@
-from collections import deque
 from time import clock
 from socket import gethostbyname
 
@@ -7,8 +6,8 @@ from .conversions import conversion
 from .type_flag import TypeFlag
 from .handlers import get_handler
 from .metaclasses.register import InstanceRegister
-from .packet import PacketCollection
-from .streams import Dispatcher, InjectorStream, HandshakeStream
+from .packet import PacketCollection, PacketWriter
+from .streams import CompressionStream, Dispatcher, FragmentStream, InjectorStream, HandshakeStream
 
 
 __all__ = "Connection",
@@ -22,6 +21,12 @@ class Connection(metaclass=InstanceRegister):
 
     subclasses = {}
 
+    # Number of packets to ack per packet (power of two, up to 128)
+    ack_window = 32
+
+    # Maximum size of sent datagrams, in bytes
+    mtu = 1400
+
     @classmethod
     def create_connection(cls, address, port):
         """Return new connnection to remote peer.
@@ -42,8 +47,9 @@ class Connection(metaclass=InstanceRegister):
         self.sequence_max_size = 2 ** 16 - 1
         self.sequence_handler = get_handler(TypeFlag(int, max_value=self.sequence_max_size))
 
-        # Number of packets to ack per packet
-        self.ack_window = 32
+        ack_window = self.ack_window
+        if ack_window & (ack_window - 1) or not 8 <= ack_window <= 128:
+            raise ValueError("Ack window must be a power of two between 8 and 128: {}".format(ack_window))
 
         # BitField and bitfield size
         self.incoming_ack_bitfield = BitField(self.ack_window)
@@ -58,9 +64,15 @@ class Connection(metaclass=InstanceRegister):
         self.protocol_handler = get_handler(TypeFlag(int))
         self.handshake_packer = get_handler(TypeFlag(int))
 
-        # Storage for packets requesting ack or received
-        self.requested_ack = {}
-        self.received_window = deque(maxlen=self.ack_window)
+        # Ring buffer of packets requesting ack, indexed by sequence
+        self.sent_window = 2 * ack_window
+        self.sent_packets = [None] * self.sent_window
+
+        # Bit N set if packet (local_sequence - N) is awaiting ack
+        self.pending_ack_mask = 0
+
+        # Bit N set if packet (remote_sequence - N) was received
+        self.received_mask = 0
 
         # Current indicators of latest out/incoming sequence numbers
         self.local_sequence = 0
@@ -74,84 +86,160 @@ class Connection(metaclass=InstanceRegister):
         self.tagged_throttle_sequence = None
         self.throttle_pending = False
 
+        # Buffer into which datagrams are written, reused by each send
+        self.packet_writer = PacketWriter(self.mtu)
+
         # Internal packet data
         self.dispatcher = Dispatcher()
         self.injector = self.dispatcher.create_stream(InjectorStream)
+        self.fragmenter = self.dispatcher.create_stream(FragmentStream)
+        self.compressor = self.dispatcher.create_stream(CompressionStream)
 
         self.handshake = self.dispatcher.create_stream(HandshakeStream)
         self.handshake.connection_info = self.instance_id
         self.handshake.remove_connection = self.deregister
+        self.handshake.compression_stream = self.compressor
+
+    @property
+    def replication_scheduler(self):
+        """Return scheduler of replication stream (providing replication metrics), or None if not replicating"""
+        replication_stream = self.handshake.replication_stream
+        return getattr(replication_stream, "scheduler", None)
 
     def get_reliable_information(self, remote_sequence):
         """Update stored information for remote peer reliability feedback
 
         :param remote_sequence: latest received packet's sequence
         """
-        # The last received sequence number and received list
-        received_window = self.received_window
+        # Acknowledge all packets we've received before remote_sequence
         ack_bitfield = self.outgoing_ack_bitfield
+        ack_bitfield.set_mask(self.received_mask >> 1)
 
-        # Acknowledge all packets we've received
-        for index in range(self.ack_window):
-            packet_sqn = remote_sequence - (index + 1)
+        return ack_bitfield
 
-            if packet_sqn < 0:
-                continue
+    def register_received(self, sequence):
+        """Update received window for a received packet
 
-            ack_bitfield[index] = packet_sqn in received_window
+        :param sequence: sequence of received packet
+        """
+        remote_sequence = self.remote_sequence
 
-        return ack_bitfield
+        # If we receive a newer foreign sequence, update our local record
+        if self.sequence_more_recent(sequence, remote_sequence):
+            shift = (sequence - remote_sequence) % (self.sequence_max_size + 1)
+            self.received_mask = ((self.received_mask << shift) | 1) & ((2 << self.ack_window) - 1)
+            self.remote_sequence = sequence
 
-    def handle_reliable_information(self, ack_base, ack_bitfield):
-        """Update internal packet management, concerning dropped packets and available bandwidth
+        else:
+            index = (remote_sequence - sequence) % (self.sequence_max_size + 1)
 
-        :param ack_base: base sequence for ack window
-        :param ack_bitfield: ack window bitfield
+            if index <= self.ack_window:
+                self.received_mask |= 1 << index
+
+    def register_sent(self, sequence, packet_collection):
+        """Store packet collection until it is acknowledged or dropped
+
+        :param sequence: sequence of sent packet, following the previous sent sequence
+        :param packet_collection: sent packet collection
         """
-        requested_ack = self.requested_ack
-        window_size = self.ack_window
+        sent_window = self.sent_window
+        pending_ack_mask = self.pending_ack_mask << 1
 
-        # Iterate over ACK bitfield
-        for relative_sequence in range(window_size):
-            absolute_sequence = ack_base - (relative_sequence + 1)
+        # The oldest packet falls out of the ring, so assume it is lost
+        dropped_mask = pending_ack_mask >> sent_window << sent_window
+        if dropped_mask:
+            pending_ack_mask ^= dropped_mask
+            self.handle_dropped_packets(self.pop_sent_packets(dropped_mask, sequence))
 
-            # If we are waiting for this packet, acknowledge it
-            if ack_bitfield[relative_sequence] and absolute_sequence in requested_ack:
-                sent_packet = requested_ack.pop(absolute_sequence)
-                sent_packet.on_ack()
+        self.pending_ack_mask = pending_ack_mask | 1
+        self.sent_packets[sequence % sent_window] = packet_collection
 
-                # If a packet has had time to return since throttling began
-                if absolute_sequence == self.tagged_throttle_sequence:
-                    self.stop_throttling()
+    def pop_sent_packets(self, mask, sequence=None):
+        """Remove and return (sequence, packet collection) pairs of sent packets, oldest first
 
-        # Acknowledge the sequence of this packet
-        if ack_base in self.requested_ack:
-            sent_packet = requested_ack.pop(ack_base)
-            sent_packet.on_ack()
+        :param mask: bit mask of sent packets relative to sequence
+        :param sequence: sequence of mask origin (defaults to local sequence)
+        """
+        if sequence is None:
+            sequence = self.local_sequence
 
-            # If a packet has had time to return since throttling began
-            if ack_base == self.tagged_throttle_sequence:
-                self.stop_throttling()
+        sent_packets = self.sent_packets
+        sent_window = self.sent_window
+        sequence_size = self.sequence_max_size + 1
 
-        # Dropped locals
-        missed_ack = False
+        relative_sequences = []
+        while mask:
+            lowest_bit = mask & -mask
+            relative_sequences.append(lowest_bit.bit_length() - 1)
+            mask ^= lowest_bit
 
-        # Find packets we think are dropped and resend them
-        considered_dropped = [s for s in requested_ack if (ack_base - s) >= window_size]
+        popped = []
+        for relative_sequence in reversed(relative_sequences):
+            absolute_sequence = (sequence - relative_sequence) % sequence_size
+            index = absolute_sequence % sent_window
+
+            popped.append((absolute_sequence, sent_packets[index]))
+            sent_packets[index] = None
+
+        return popped
+
+    def handle_dropped_packets(self, dropped_packets):
+        """Redeliver reliable members of dropped packets, and respond to network conditions
+
+        :param dropped_packets: sequence of (sequence, packet collection) pairs
+        """
         redelivery_queue = self.injector.queue
-        # If the packet drops off the ack_window assume it is lost
-        for absolute_sequence in considered_dropped:
+
+        for _, packet_collection in dropped_packets:
             # Only reliable members asked to be informed if received/dropped
-            reliable_collection = requested_ack.pop(absolute_sequence).to_reliable()
+            reliable_collection = packet_collection.to_reliable()
             reliable_collection.on_not_ack()
 
-            missed_ack = True
             redelivery_queue.extend(reliable_collection.members)
 
+            # Unreliable members are not redelivered
+            for packet in packet_collection.unreliable_members:
+                packet.release()
+
         # Respond to network conditions
-        if missed_ack and not self.throttle_pending:
+        if dropped_packets and not self.throttle_pending:
             self.start_throttling()
 
+    def handle_reliable_information(self, ack_base, ack_bitfield):
+        """Update internal packet management, concerning dropped packets and available bandwidth
+
+        :param ack_base: base sequence for ack window
+        :param ack_bitfield: ack window bitfield
+        """
+        sent_window = self.sent_window
+        ack_offset = (self.local_sequence - ack_base) % (self.sequence_max_size + 1)
+
+        # Ack base is older than any packet awaiting ack
+        if ack_offset >= sent_window:
+            return
+
+        # Acknowledged packets relative to local sequence, including the sequence of this packet
+        acked_mask = ((((ack_bitfield.to_int() << 1) | 1) << ack_offset) & ((1 << sent_window) - 1))
+        acked_mask &= self.pending_ack_mask
+
+        # If the packet drops off the ack_window assume it is lost
+        dropped_window = ack_offset + self.ack_window
+        dropped_mask = (self.pending_ack_mask ^ acked_mask) >> dropped_window << dropped_window
+
+        self.pending_ack_mask ^= acked_mask | dropped_mask
+
+        # If we are waiting for these packets, acknowledge them
+        for absolute_sequence, sent_packet in self.pop_sent_packets(acked_mask):
+            sent_packet.on_ack()
+
+            # If a packet has had time to return since throttling began
+            if absolute_sequence == self.tagged_throttle_sequence:
+                self.stop_throttling()
+
+        # Find packets we think are dropped and resend them
+        if dropped_mask:
+            self.handle_dropped_packets(self.pop_sent_packets(dropped_mask))
+
     def receive(self, bytes_string):
         """Handle received bytes from peer
 
@@ -168,55 +256,106 @@ class Connection(metaclass=InstanceRegister):
         ack_bitfield_size = self.ack_packer.unpack_merge(self.incoming_ack_bitfield, bytes_string, offset=offset)
         offset += ack_bitfield_size
 
-        # Dictionary of packets waiting for acknowledgement
+        # Acknowledge packets waiting for acknowledgement
         self.handle_reliable_information(ack_base, self.incoming_ack_bitfield)
 
-        # If we receive a newer foreign sequence, update our local record
-        if self.sequence_more_recent(sequence, self.remote_sequence):
-            self.remote_sequence = sequence
-
         # Update received window
-        self.received_window.append(sequence)
-        if len(self.received_window) > self.ack_window:
-            self.received_window.popleft()
+        self.register_received(sequence)
 
         # Handle received packets
-        packet_collection = PacketCollection.from_bytes(bytes_string[offset:])
+        packet_collection = PacketCollection.from_bytes(bytes_string, offset)
         self.dispatcher.handle_packets(packet_collection)
 
-    def send(self, network_tick):
-        """Pull data from connection interfaces to send
+    def pull_datagrams(self, network_tick):
+        """Pull data from connection interfaces to send, returning the ack header and list of (sequence, packet
+        collection) pairs of datagrams to write.
+
+        Each datagram is sequenced (and acknowledged) individually. Oversized packets are fragmented, and packets
+        which do not fit within half of the ack window are deferred to the next send. Streams may time out or
+        disconnect the connection, so this must not run concurrently with other connections
 
         :param network_tick: if this is a network tick
         """
-        # Increment the local sequence, ensure that the sequence does not overflow, by wrapping it around
-        sequence = self.local_sequence = (self.local_sequence + 1) % (self.sequence_max_size + 1)
         remote_sequence = self.remote_sequence
-
-        # If we are waiting to detect when throttling will have returned
-        if self.throttle_pending and self.tagged_throttle_sequence is None:
-            self.tagged_throttle_sequence = sequence
+        sequence_handler = self.sequence_handler
 
         packet_collection = self.dispatcher.pull_packets(network_tick, self.bandwidth)
 
         # Get ack bitfield for reliable feedback
         ack_bitfield = self.get_reliable_information(remote_sequence)
 
-        # Store acknowledge request for reliable members of packet
-        self.requested_ack[sequence] = packet_collection
+        # Header information shared by all datagrams
+        ack_header = sequence_handler.pack(remote_sequence) + self.ack_packer.pack(ack_bitfield)
+        max_payload_size = self.mtu - sequence_handler.size() - len(ack_header)
+
+        collections = self.fragmenter.split_packets(packet_collection, max_payload_size)
 
-        # Construct header information
-        payload = [self.sequence_handler.pack(sequence), self.sequence_handler.pack(remote_sequence),
-                   self.ack_packer.pack(ack_bitfield)]
+        # Ensure that all datagrams sent at once can be acknowledged by the peer
+        max_datagrams = self.ack_window // 2
+        if len(collections) > max_datagrams:
+            for deferred_collection in collections[max_datagrams:]:
+                self.injector.queue.extend(deferred_collection.members)
 
-        # Include user defined payload
-        packet_bytes = packet_collection.to_bytes()
-        payload.append(packet_bytes)
+            collections = collections[:max_datagrams]
+
+        sequenced_collections = []
+
+        for datagram_collection in collections:
+            # Increment the local sequence, ensure that the sequence does not overflow, by wrapping it around
+            sequence = self.local_sequence = (self.local_sequence + 1) % (self.sequence_max_size + 1)
+
+            # If we are waiting to detect when throttling will have returned
+            if self.throttle_pending and self.tagged_throttle_sequence is None:
+                self.tagged_throttle_sequence = sequence
+
+            # Store acknowledge request for reliable members of packet
+            self.register_sent(sequence, datagram_collection)
+            sequenced_collections.append((sequence, datagram_collection))
 
         # Force bandwidth to grow (until throttled)
         self.bandwidth += self.packet_growth
 
-        return b''.join(payload)
+        return ack_header, sequenced_collections
+
+    def write_datagrams(self, ack_header, sequenced_collections):
+        """Return list of datagrams of pulled packet collections, compressing their packets if negotiated.
+
+        Only this connection's writer and compressor are used, so connections may write concurrently
+
+        :param ack_header: packed ack header shared by all datagrams
+        :param sequenced_collections: list of (sequence, packet collection) pairs
+        """
+        sequence_handler = self.sequence_handler
+        writer = self.packet_writer
+        datagrams = []
+
+        for sequence, datagram_collection in sequenced_collections:
+            writer.reset()
+            writer.write_value(sequence_handler, sequence)
+            writer.write(ack_header)
+
+            packets_offset = writer.offset
+            datagram_collection.write_to(writer)
+
+            # Replace packets with compressed packet, if compression pays off
+            packed_packets = memoryview(writer.buffer)[packets_offset: writer.offset]
+            compressed_packet = self.compressor.compress_packets(packed_packets)
+            packed_packets.release()
+
+            if compressed_packet is not None:
+                writer.offset = packets_offset
+                compressed_packet.write_to(writer)
+
+            datagrams.append(writer.to_bytes())
+
+        return datagrams
+
+    def send(self, network_tick):
+        """Pull data from connection interfaces to send, returning list of datagrams no larger than the MTU
+
+        :param network_tick: if this is a network tick
+        """
+        return self.write_datagrams(*self.pull_datagrams(network_tick))
 
     def sequence_more_recent(self, base, sequence):
         """Compare two sequence identifiers and determine if one is newer than the other
@@ -1,4 +1,5 @@
 from .descriptors import Attribute
+from .enums import Roles
 from .handlers import static_description
 from .rpc import RPCInterfaceFactory
 
@@ -14,6 +15,9 @@ AttributeStorageInterface = namedtuple("StorageInterface", "get set complain")
 RPCStorageInterface = namedtuple("StorageInterface", "set")
 StorageInterface = namedtuple("StorageInterface", "get set")
 
+# Values of these types cannot be modified in place, so only change when set
+IMMUTABLE_TYPES = {int, float, bool, str, bytes, type(None)}
+
 
 class AbstractStorageContainer:
     """Abstract base class for reading and writing data values belonging an object"""
@@ -142,14 +146,41 @@ class RPCStorageContainer(AbstractStorageContainer):
 class AttributeStorageContainer(AbstractStorageContainer):
     """Storage container for Attributes.
 
-    Handles data storage, access and complaints.
+    Handles data storage, access, complaints and versions.
     """
 
+    # Current replication pass, see :py:meth:`AttributeStorageContainer.begin_replication_pass`
+    replication_pass = 0
+
     def __init__(self, instance, *args, **kwargs):
         super().__init__(instance, *args, **kwargs)
 
         self.complaints = self.get_default_complaints()
 
+        # Version of each attribute value, incremented when changed
+        self.versions = {attribute: 0 for attribute in self.data}
+
+        # Roles descriptions depend upon the context of the receiver, so cannot be versioned
+        self.contextual_attributes = [a for a in self.data if issubclass(a.data_type, Roles)]
+
+        # Versioned attributes report in-place modifications with mark_changed, so need not be described
+        self._versioned_descriptions = {a: d for a, d in self.get_default_descriptions().items()
+                                        if a not in self.contextual_attributes and not a.data.get("versioned")}
+        self._versioned_pass = None
+
+        # Encoded values of the current replication pass
+        self._encoded = {}
+        self._encoded_pass = None
+
+    @staticmethod
+    def begin_replication_pass():
+        """Begin a new replication pass.
+
+        Values which may be modified in place are described at most once per pass. If no pass is begun, they are
+        described whenever versions are requested
+        """
+        AttributeStorageContainer.replication_pass += 1
+
     def get_description_mapping(self):
         """Return mapping of attributes to value network descriptions (:py:func:`network.handlers.static_description`)"""
         return {attribute: static_description(value) for attribute, value in self.data.items()}
@@ -186,6 +217,84 @@ class AttributeStorageContainer(AbstractStorageContainer):
         """Return deepcopy of default value for attribute"""
         return attribute.get_new_value()
 
+    def get_encoded(self, values, encode):
+        """Return encoded attribute values, shared with other callers for the same values, versions and encode function.
+
+        Encoded values are only retained for the current replication pass
+
+        :param values: mapping of attribute names to values
+        :param encode: function to encode values, if no encoded form is found
+        :returns: encoded values, True if encoded form was found
+        """
+        replication_pass = self.replication_pass
+
+        # Without replication passes, encoded values would be retained indefinitely
+        if not replication_pass:
+            return encode(values), False
+
+        if replication_pass != self._encoded_pass:
+            self._encoded.clear()
+            self._encoded_pass = replication_pass
+
+        mapping = self._mapping
+        versions = self.versions
+        key = encode, frozenset([(name, versions[mapping[name]]) for name in values])
+
+        try:
+            return self._encoded[key], True
+
+        except KeyError:
+            encoded = self._encoded[key] = encode(values)
+            return encoded, False
+
+    def get_versions(self):
+        """Return mapping of attributes to value versions
+
+        Values which are not of immutable types are described to detect in-place modifications
+        """
+        versions = self.versions
+        replication_pass = self.replication_pass
+
+        # Already described this pass
+        if replication_pass and replication_pass == self._versioned_pass:
+            return versions
+
+        self._versioned_pass = replication_pass
+
+        data = self.data
+        descriptions = self._versioned_descriptions
+        immutable_types = IMMUTABLE_TYPES
+        get_description = static_description
+
+        for attribute, last_description in descriptions.items():
+            value = data[attribute]
+
+            if type(value) in immutable_types:
+                continue
+
+            description = get_description(value)
+            if description != last_description:
+                descriptions[attribute] = description
+                versions[attribute] += 1
+
+        return versions
+
+    def mark_changed(self, attribute):
+        """Increment version of attribute whose value was modified in place
+
+        :param attribute: Attribute instance
+        """
+        self.versions[attribute] += 1
+
+    def set_value(self, attribute, value):
+        """Store new value for attribute, and increment its version
+
+        :param attribute: Attribute instance
+        :param value: new value
+        """
+        self.data[attribute] = value
+        self.versions[attribute] += 1
+
     def new_storage_interface(self, name, member):
         """Return new AttributeStorageInterface instance for class member
 
@@ -193,9 +302,10 @@ class AttributeStorageContainer(AbstractStorageContainer):
         :param member: Attribute instance
         """
         getter, setter = self.get_storage_accessors(member)
+        versioned_setter = partial(self.set_value, member)
 
         complain_setter = partial(self.complaints.__setitem__, member)
-        interface = AttributeStorageInterface(getter, setter, complain_setter)
+        interface = AttributeStorageInterface(getter, versioned_setter, complain_setter)
         default_value = self.get_default_value(member)
 
         member.register(self._instance, interface)
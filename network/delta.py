@@ -0,0 +1,345 @@
+from collections import OrderedDict
+from copy import deepcopy
+from struct import Struct as PackStruct
+
+from .containers import IMMUTABLE_TYPES
+from .handlers import get_handler, static_description
+from .type_flag import TypeFlag
+
+__all__ = ['DeltaCodec', 'DeltaEncoder', 'DeltaDecoder', 'get_delta_flag']
+
+
+def copy_value(value):
+    """Return copy of value, which may be the value itself if it is immutable
+
+    :param value: value to copy
+    """
+    if type(value) in IMMUTABLE_TYPES:
+        return value
+
+    return deepcopy(value)
+
+
+def get_delta_flag(type_flag):
+    """Return TypeFlag with which delta encoded values of a type flag are packed, or None if not delta encoded
+
+    :param type_flag: TypeFlag instance
+    """
+    if not type_flag.data.get("delta"):
+        return None
+
+    return TypeFlag(bytes, max_length=2 ** 16 - 1)
+
+
+class DeltaCodec:
+    """Base class for delta compression of Struct values against snapshots known to both peers.
+
+    Payload format: snapshot id, baseline id (equal to snapshot id if not delta encoded), delta mask,
+    quantised differences of delta fields, struct serialiser data of other changed fields.
+
+    Float (and float sequence) fields are sent as quantised differences from the baseline when in range
+    """
+
+    # Size of snapshot id space
+    snapshot_ids = 256
+
+    # Quantisation of differences from baseline
+    default_precision = 1e-3
+
+    id_handler = get_handler(TypeFlag(int, max_value=255))
+
+    def __init__(self, type_flag):
+        """
+        :param type_flag: TypeFlag of delta encoded struct attribute
+        """
+        self.struct_cls = type_flag.data_type
+        self.precision = type_flag.data.get("delta_precision", self.default_precision)
+
+        struct = self.struct_cls()
+        self.field_names = list(struct._attribute_container._ordered_mapping)
+        self.mask_handler = get_handler(TypeFlag(int, max_bits=len(self.field_names)))
+        self.serialiser = struct._serialiser
+
+        self._component_structs = {}
+
+    def get_component_struct(self, count):
+        """Return struct for a number of quantised components
+
+        :param count: number of components
+        """
+        try:
+            return self._component_structs[count]
+
+        except KeyError:
+            component_struct = self._component_structs[count] = PackStruct("!{}h".format(count))
+            return component_struct
+
+    @staticmethod
+    def get_components(value):
+        """Return list of float components of value, or None if it cannot be quantised
+
+        :param value: field value
+        """
+        if isinstance(value, float):
+            return [value]
+
+        try:
+            components = list(value)
+
+        except TypeError:
+            return None
+
+        if components and all(isinstance(c, float) for c in components):
+            return components
+
+        return None
+
+    @staticmethod
+    def from_components(base_value, components):
+        """Return new value of the same type as base value, with given components
+
+        :param base_value: value of field in baseline
+        :param components: list of components
+        """
+        if isinstance(base_value, float):
+            return components[0]
+
+        value = deepcopy(base_value)
+        value[:] = components
+        return value
+
+    def read_snapshot(self, bytes_string, offset, baseline):
+        """Return field values of snapshot encoded against baseline
+
+        :param bytes_string: payload data
+        :param offset: offset of delta mask in payload
+        :param baseline: field values of baseline, or None if not delta encoded
+        """
+        delta_mask, mask_size = self.mask_handler.unpack_from(bytes_string, offset)
+        offset += mask_size
+
+        precision = self.precision
+        snapshot = {}
+
+        for index, name in enumerate(self.field_names):
+            if not delta_mask & (1 << index):
+                continue
+
+            base_value = baseline[name]
+
+            if type(base_value) is float:
+                difference, = self.get_component_struct(1).unpack_from(bytes_string, offset)
+                offset += 2
+
+                snapshot[name] = base_value + difference * precision
+                continue
+
+            base_components = self.get_components(base_value)
+            component_struct = self.get_component_struct(len(base_components))
+
+            differences = component_struct.unpack_from(bytes_string, offset)
+            offset += component_struct.size
+
+            components = [c + d * precision for c, d in zip(base_components, differences)]
+            snapshot[name] = self.from_components(base_value, components)
+
+        # Unpack changed values without merging into baseline values
+        for name, value in self.serialiser.unpack(bytes_string, offset=offset):
+            snapshot[name] = value
+
+        # Remaining values are unchanged
+        if baseline is not None:
+            for name, value in baseline.items():
+                if name not in snapshot:
+                    snapshot[name] = copy_value(value)
+
+        return snapshot
+
+
+class DeltaEncoder(DeltaCodec):
+    """Delta encodes successive values of a Struct attribute for a single peer.
+
+    Values are encoded against the newest snapshot that the peer has acknowledged, or in full if there is none
+    """
+
+    def __init__(self, type_flag):
+        super().__init__(type_flag)
+
+        self.snapshot_id = 0
+        self.snapshots = OrderedDict()
+
+        self.baseline_id = None
+        self.baseline = None
+
+        # Metrics
+        self.full_count = 0
+        self.delta_count = 0
+
+    def quantise(self, value, base_value):
+        """Return quantised differences of value from base value, or None if they cannot be quantised
+
+        :param value: field value
+        :param base_value: field value of baseline
+        """
+        precision = self.precision
+
+        if type(value) is float and type(base_value) is float:
+            difference = round((value - base_value) / precision)
+            return [difference] if -32768 <= difference <= 32767 else None
+
+        components = self.get_components(value)
+        if components is None:
+            return None
+
+        base_components = self.get_components(base_value)
+        if base_components is None or len(base_components) != len(components):
+            return None
+
+        differences = [round((c - b) / precision) for c, b in zip(components, base_components)]
+
+        if not all(-32768 <= d <= 32767 for d in differences):
+            return None
+
+        return differences
+
+    def encode(self, struct):
+        """Return payload of struct encoded against the acknowledged baseline, and its snapshot id
+
+        :param struct: Struct instance
+        """
+        snapshot_id = self.snapshot_id = self.snapshot_id + 1
+        packed_id = snapshot_id % self.snapshot_ids
+
+        attribute_data = struct._attribute_container.data
+        get_member = struct._attribute_container.get_member_by_name
+        values = {name: attribute_data[get_member(name)] for name in self.field_names}
+
+        baseline = self.baseline
+
+        # Peer may have replaced baselines older than half the id space
+        if baseline is not None and snapshot_id - self.baseline_id >= self.snapshot_ids // 2:
+            baseline = None
+
+        if baseline is None:
+            header = self.id_handler.pack(packed_id) * 2
+            delta_mask = 0
+            delta_data = []
+            changed = values
+            self.full_count += 1
+
+        else:
+            header = self.id_handler.pack(packed_id) + self.id_handler.pack(self.baseline_id % self.snapshot_ids)
+            delta_mask = 0
+            delta_data = []
+            changed = {}
+
+            get_description = static_description
+
+            for index, name in enumerate(self.field_names):
+                value = values[name]
+                base_value = baseline[name]
+
+                differences = self.quantise(value, base_value)
+
+                if differences is None:
+                    if get_description(value) != get_description(base_value):
+                        changed[name] = value
+
+                elif any(differences):
+                    delta_mask |= 1 << index
+                    delta_data.append(self.get_component_struct(len(differences)).pack(*differences))
+
+            self.delta_count += 1
+
+        body = self.mask_handler.pack(delta_mask) + b''.join(delta_data) + self.serialiser.pack(changed)
+
+        # Remember snapshot as the peer will reconstruct it
+        self.snapshots[snapshot_id] = self.read_snapshot(body, 0, baseline)
+
+        while len(self.snapshots) > self.snapshot_ids // 2:
+            self.snapshots.popitem(last=False)
+
+        return header + body, snapshot_id
+
+    def on_ack(self, snapshot_id):
+        """Use acknowledged snapshot as the baseline, if newer than the current baseline
+
+        :param snapshot_id: id of acknowledged snapshot
+        """
+        if self.baseline_id is not None and snapshot_id <= self.baseline_id:
+            return
+
+        try:
+            self.baseline = self.snapshots[snapshot_id]
+
+        except KeyError:
+            return
+
+        self.baseline_id = snapshot_id
+
+        # Older snapshots will not be acknowledged
+        snapshots = self.snapshots
+        while next(iter(snapshots)) < snapshot_id:
+            snapshots.popitem(last=False)
+
+
+class DeltaDecoder(DeltaCodec):
+    """Decodes delta encoded values of a Struct attribute, from a single peer"""
+
+    def __init__(self, type_flag):
+        super().__init__(type_flag)
+
+        self.snapshots = [None] * self.snapshot_ids
+        self.latest_id = None
+
+    def is_newer(self, snapshot_id):
+        """Return True if snapshot is newer than the latest applied snapshot
+
+        :param snapshot_id: packed snapshot id
+        """
+        if self.latest_id is None:
+            return True
+
+        difference = (snapshot_id - self.latest_id) % self.snapshot_ids
+        return 0 < difference < self.snapshot_ids // 2
+
+    def decode(self, bytes_string, struct=None):
+        """Update struct with encoded values, returning struct or None if the payload was not applied.
+
+        Payloads which are older than the latest applied payload are only remembered as baselines
+
+        :param bytes_string: payload data
+        :param struct: Struct instance to update (a new Struct is created if None)
+        """
+        id_handler = self.id_handler
+        snapshot_id, id_size = id_handler.unpack_from(bytes_string)
+        baseline_id, baseline_id_size = id_handler.unpack_from(bytes_string, id_size)
+
+        if baseline_id == snapshot_id:
+            baseline = None
+
+        else:
+            baseline = self.snapshots[baseline_id]
+
+            # Baseline was never received
+            if baseline is None:
+                return None
+
+        snapshot = self.snapshots[snapshot_id] = self.read_snapshot(bytes_string, id_size + baseline_id_size,
+                                                                     baseline)
+
+        if not self.is_newer(snapshot_id):
+            return None
+
+        self.latest_id = snapshot_id
+
+        if struct is None:
+            struct = self.struct_cls()
+
+        attribute_data = struct._attribute_container.data
+        get_member = struct._attribute_container.get_member_by_name
+
+        for name, value in snapshot.items():
+            attribute_data[get_member(name)] = copy_value(value)
+
+        return struct
@@ -20,7 +20,8 @@ class Netmodes(Enumeration):
 
 class ConnectionProtocols(Enumeration):
     values = "request_disconnect", "request_handshake", "handshake_success", "handshake_failed", "replication_init", \
-             "replication_del",  "attribute_update", "invoke_method", "invoke_handshake"
+             "replication_del",  "attribute_update", "invoke_method", "invoke_handshake", \
+             "fragment", "compressed"
 
 
 class IterableCompressionType(Enumeration):
@@ -1,230 +1,385 @@
-from .bitfield import BitField
+from .bitstream import BitReader, BitWriter, get_bit_handler
 from .handlers import get_handler
 from .type_flag import TypeFlag
 
-__all__ = ["FlagSerialiser"]
+from struct import Struct
 
+__all__ = ["FlagSerialiser", "compile_codec", "compile_bit_codec"]
 
-class FlagSerialiser:
-    """Interface class for parsing/dumping data to bytes
-    Packed member order: Contents, Data, Booleans, Nones
+
+# Compiled codecs, by attribute schema
+_codecs = {}
+_bit_codecs = {}
+
+
+def _get_run_format(handler):
+    """Return struct character format of a handler which packs a single value, or None
+
+    :param handler: data handler
     """
+    struct_format = getattr(handler, "struct_format", None)
 
-    # The last two entries of the contents mask 
-    NONE_CONTENT_INDEX = -1
-    BOOL_CONTENT_INDEX = -2
+    if struct_format is None or not struct_format.startswith("!") or len(struct_format) != 2:
+        return None
 
-    def __init__(self, arguments):
-        """Accepts ordered dict as argument"""
-        self.bool_args = [(key, value) for key, value in arguments.items() if value.data_type is bool]
-        self.non_bool_args = [(key, value) for key, value in arguments.items() if value.data_type is not bool]
-        self.non_bool_handlers = [(key, get_handler(value)) for key, value in self.non_bool_args]
+    return struct_format[1:]
 
-        self.enumerated_non_bool_handlers = list(enumerate(self.non_bool_handlers))
-        self.enumerated_bool_args = list(enumerate(self.bool_args))
 
-        # Maintain count of data types
-        self.total_none_booleans = len(self.non_bool_args)
-        self.total_booleans = len(self.bool_args)
-        self.total_contents = self.total_none_booleans + self.total_booleans
+def _find_fixed_runs(handlers):
+    """Return list of (start, end) index pairs of consecutive single-value struct handlers
 
-        # BitFields used for packing
-        self.bool_bits = BitField(self.total_booleans)
-        self.none_bits = BitField(self.total_contents)
+    :param handlers: ordered list of handlers
+    """
+    runs = []
+    start = None
 
-        # Additional two bits when including NoneType and Boolean values
-        self.content_bits = BitField(self.total_contents + 2)
+    for index, handler in enumerate(handlers + [None]):
+        is_fixed = handler is not None and _get_run_format(handler) is not None
 
-        self.boolean_packer = get_handler(TypeFlag(BitField, fields=self.total_booleans))
-        self.contents_packer = get_handler(TypeFlag(BitField, fields=len(self.content_bits)))
+        if is_fixed and start is None:
+            start = index
 
-    def report_information(self, bytes_string, offset=0):
-        """Display the contents of a serialised stream
+        elif not is_fixed and start is not None:
+            if index - start > 1:
+                runs.append((start, index))
 
-        :param bytes_string: data to interpret
-        :param offset: offset from start of stream
-        """
-        content_packer = self.contents_packer
-        # Get header of packed data
-        content_bitfield, contents_size = content_packer.unpack_from(bytes_string, offset)
-        offset += contents_size
+            start = None
 
-        content_bits = content_bitfield[:]
+    return runs
 
-        print("Header Data: ", bytes_string[:offset])
-        entry_names, entry_handlers = zip(*(self.non_bool_args + self.bool_args))
 
-        # If there are NoneType values they will be first
-        if content_bits[self.NONE_CONTENT_INDEX]:
-            none_bits, none_size = content_packer.unpack_from(bytes_string, offset)
-            offset += none_size
+def compile_codec(arguments):
+    """Compile specialised pack and unpack functions for an ordered mapping of names to TypeFlags.
 
-            print("NoneType Values Data: ", bytes_string[:offset], none_bits)
+    The compiled functions are cached by schema, and produce the same packed format as :py:class:`FlagSerialiser`:
+    contents mask, NoneType mask (if any NoneType values), data, Boolean mask (if any Boolean values).
+
+    Consecutive fields packed with a single struct character are merged into a single struct call when all of them
+    are included.
+
+    :param arguments: ordered mapping of name to TypeFlag
+    :returns: pack, unpack functions
+    """
+    schema = tuple(arguments.items())
+
+    try:
+        return _codecs[schema]
+
+    except KeyError:
+        pass
+
+    bool_keys = [key for key, value in schema if value.data_type is bool]
+    non_bool_handlers = [(key, get_handler(value)) for key, value in schema if value.data_type is not bool]
+
+    total_none_booleans = len(non_bool_handlers)
+    total_booleans = len(bool_keys)
+    total_contents = total_none_booleans + total_booleans
+
+    # Masks are packed with the same handlers as BitFields of the same size
+    namespace = {"pack_contents": get_handler(TypeFlag(int, max_bits=total_contents + 2)).pack,
+                 "unpack_contents": get_handler(TypeFlag(int, max_bits=total_contents + 2)).unpack_from,
+                 "pack_nones": get_handler(TypeFlag(int, max_bits=total_contents)).pack,
+                 "unpack_nones": get_handler(TypeFlag(int, max_bits=total_contents)).unpack_from,
+                 "pack_booleans": get_handler(TypeFlag(int, max_bits=total_booleans)).pack,
+                 "unpack_booleans": get_handler(TypeFlag(int, max_bits=total_booleans)).unpack_from,
+                 "NONE_FLAG": 1 << (total_contents + 1), "BOOL_FLAG": 1 << total_contents}
+
+    handlers = [handler for _, handler in non_bool_handlers]
+    runs = {start: end for start, end in _find_fixed_runs(handlers)}
+
+    pack_lines = ["def pack(data):",
+                  "    contents = nones = packed_count = 0",
+                  "    values = []",
+                  "    append = values.append"]
+
+    unpack_lines = ["def unpack(bytes_string, previous_values={}, offset=0):",
+                    "    contents, size = unpack_contents(bytes_string, offset)",
+                    "    offset += size",
+                    "    if contents & NONE_FLAG:",
+                    "        nones, size = unpack_nones(bytes_string, offset)",
+                    "        offset += size",
+                    "    else:",
+                    "        nones = 0",
+                    "    items = []",
+                    "    append = items.append"]
+
+    def add_field(index, indent):
+        key, handler = non_bool_handlers[index]
+        namespace["pack_{}".format(index)] = handler.pack
+        namespace["unpack_{}".format(index)] = handler.unpack_from
+
+        pack_lines.extend(indent + line for line in (
+            "if {!r} in data:".format(key),
+            "    value = data[{!r}]".format(key),
+            "    if value is None:",
+            "        nones |= {}".format(1 << index),
+            "    else:",
+            "        append(pack_{}(value))".format(index),
+            "        packed_count += 1",
+            "    contents |= {}".format(1 << index)))
+
+        unpack_lines.extend(indent + line for line in (
+            "if contents & {}:".format(1 << index),
+            "    if nones & {}:".format(1 << index),
+            "        append(({!r}, None))".format(key),
+            "    else:"))
+
+        # Merge with existing values where possible
+        if hasattr(handler, "unpack_merge"):
+            namespace["merge_{}".format(index)] = handler.unpack_merge
+
+            unpack_lines.extend(indent + line for line in (
+                "        previous_value = previous_values.get({!r})".format(key),
+                "        if previous_value is not None:",
+                "            offset += merge_{}(previous_value, bytes_string, offset)".format(index),
+                "            append(({!r}, previous_value))".format(key),
+                "        else:",
+                "            value, size = unpack_{}(bytes_string, offset)".format(index),
+                "            offset += size",
+                "            append(({!r}, value))".format(key)))
 
         else:
-            none_bits = [False] * self.total_contents
+            unpack_lines.extend(indent + line for line in (
+                "        value, size = unpack_{}(bytes_string, offset)".format(index),
+                "        offset += size",
+                "        append(({!r}, value))".format(key)))
+
+    index = 0
+    while index < total_none_booleans:
+        if index not in runs:
+            add_field(index, "    ")
+            index += 1
+            continue
+
+        # Fixed size run
+        end = runs[index]
+        run_indices = range(index, end)
+        run_keys = [non_bool_handlers[i][0] for i in run_indices]
+        run_mask = sum(1 << i for i in run_indices)
+        run_struct = Struct("!" + "".join(_get_run_format(handlers[i]) for i in run_indices))
+        run_names = ", ".join("value_{}".format(i) for i in run_indices)
+
+        namespace["pack_run_{}".format(index)] = run_struct.pack
+        namespace["unpack_run_{}".format(index)] = run_struct.unpack_from
+
+        pack_lines.append("    if {}:".format(" and ".join("{0!r} in data and data[{0!r}] is not None".format(key)
+                                                     for key in run_keys)))
+        pack_lines.append("        append(pack_run_{}({}))".format(index, ", ".join("data[{!r}]".format(key)
+                                                                                   for key in run_keys)))
+        pack_lines.append("        packed_count += {}".format(len(run_keys)))
+        pack_lines.append("        contents |= {}".format(run_mask))
+        pack_lines.append("    else:")
+
+        unpack_lines.append("    if contents & {0} == {0} and not nones & {0}:".format(run_mask))
+        unpack_lines.append("        {}, = unpack_run_{}(bytes_string, offset)".format(run_names, index))
+        unpack_lines.append("        offset += {}".format(run_struct.size))
+        unpack_lines.extend("        append(({!r}, value_{}))".format(key, i) for i, key in zip(run_indices, run_keys))
+        unpack_lines.append("    else:")
+
+        # Fall back to individual fields if any are excluded or None
+        for i in run_indices:
+            add_field(i, "        ")
+
+        index = end
+
+    # Booleans
+    boolean_shift = total_none_booleans
+    pack_lines.extend(("    if len(data) != packed_count:",
+                       "        booleans = 0"))
+
+    for index, key in enumerate(bool_keys):
+        content_bit = 1 << (boolean_shift + index)
+        pack_lines.extend(("        if {!r} in data:".format(key),
+                           "            value = data[{!r}]".format(key),
+                           "            if value is None:",
+                           "                nones |= {}".format(content_bit),
+                           "            elif value:",
+                           "                booleans |= {}".format(1 << index),
+                           "            contents |= {}".format(content_bit)))
+
+    pack_lines.extend(("        append(pack_booleans(booleans))",
+                       "        contents |= BOOL_FLAG",
+                       "    if nones:",
+                       "        return pack_contents(contents | NONE_FLAG) + pack_nones(nones) + b''.join(values)",
+                       "    return pack_contents(contents) + b''.join(values)"))
+
+    if total_booleans:
+        unpack_lines.extend(("    if contents & BOOL_FLAG:",
+                             "        booleans, size = unpack_booleans(bytes_string, offset)"))
+
+        for index, key in enumerate(bool_keys):
+            content_bit = 1 << (boolean_shift + index)
+            unpack_lines.extend(("        if contents & {}:".format(content_bit),
+                                 "            append(({!r}, None if nones & {} else bool(booleans & {})))"
+                                 .format(key, content_bit, 1 << index)))
+
+    unpack_lines.append("    return items")
+
+    exec("\n".join(pack_lines), namespace)
+    exec("\n".join(unpack_lines), namespace)
+
+    codec = _codecs[schema] = namespace["pack"], namespace["unpack"]
+    return codec
+
+
+def compile_bit_codec(arguments):
+    """Create pack and unpack functions which bit-pack an ordered mapping of names to TypeFlags.
+
+    The functions are cached by schema. Packed format: contents mask, NoneType flag bit, NoneType mask (if any
+    NoneType values), data in schema order. Masks use one bit per field, and integers, booleans and handlers
+    with a bit representation are packed with their exact bit widths. Other values are packed as byte-aligned data.
+
+    :param arguments: ordered mapping of name to TypeFlag
+    :returns: pack, unpack functions
+    """
+    schema = tuple(arguments.items())
 
-        print()
-        for name, included, is_none, handler in zip(entry_names, content_bits, none_bits, entry_handlers):
-            if not included:
-                continue
+    try:
+        return _bit_codecs[schema]
 
-            print("{} : {}".format(name, "None" if is_none else handler.data_type.__name__))
+    except KeyError:
+        pass
 
-        print()
+    fields = []
+    for index, (key, type_flag) in enumerate(schema):
+        handler = get_bit_handler(type_flag)
+        is_mergeable = not hasattr(handler, "read_bits") and hasattr(handler, "unpack_merge")
+        fields.append((key, 1 << index, handler, is_mergeable))
 
-    def _read_contents(self, bytes_string, offset):
-        """Determine the included entries of the packed data
+    total_contents = len(fields)
 
-        :param bytes_string: packed data
-        """
-        contents_packer = self.contents_packer
-        contents_size = contents_packer.unpack_merge(self.content_bits, bytes_string, offset)
-        return contents_size
+    def pack(data):
+        contents = nones = 0
+        values = []
 
-    def _read_nonetype_values(self, bytes_string, offset):
-        """Determine the NoneType entries of the packed data
+        for key, bit, handler, _ in fields:
+            if key not in data:
+                continue
 
-        :param bytes_string: packed data
-        """
-        contents_packer = self.contents_packer
-        contents_size = contents_packer.unpack_merge(self.none_bits, bytes_string, offset)
-        return contents_size
+            contents |= bit
+            value = data[key]
 
-    def unpack(self, bytes_string, previous_values={}, offset=0):
-        """Unpack bytes into Python objects
+            if value is None:
+                nones |= bit
 
-        :param bytes_string: packed data
-        :param previous_values: previous packed values (optional)
-        """
-        # Get the contents header
-        offset += self._read_contents(bytes_string, offset)
-        content_values = list(self.content_bits)
+            else:
+                values.append((handler, value))
 
-        has_none_types = content_values[self.NONE_CONTENT_INDEX]
-        has_booleans = self.total_booleans and content_values[self.BOOL_CONTENT_INDEX]
+        writer = BitWriter()
+        writer.write(contents, total_contents)
 
-        # If there are NoneType values they will be first
-        if has_none_types:
-            offset += self._read_nonetype_values(bytes_string, offset)
+        if nones:
+            writer.write(1, 1)
+            writer.write(nones, total_contents)
 
-        # Ensure that the NoneType values are cleared
         else:
-            self.none_bits.clear()
+            writer.write(0, 1)
 
-        # Create list for faster successive iterations
-        none_values = list(self.none_bits)
+        write_value = writer.write_value
+        for handler, value in values:
+            write_value(handler, value)
 
-        # All values have an entry in the contents bitfield
-        for included, value_none, (key, handler) in zip(content_values, none_values, self.non_bool_handlers):
-            if not included:
-                continue
+        return writer.to_bytes()
 
-            # If this is a NONE value
-            if value_none:
-                value = None
+    def unpack(bytes_string, previous_values={}, offset=0):
+        reader = BitReader(bytes_string, offset)
 
-            else:
-                previous_value = previous_values.get(key)
-                if previous_value is not None and hasattr(handler, "unpack_merge"):
-                    # If we can't merge use default unpack
-                    value_size = handler.unpack_merge(previous_value, bytes_string, offset)
+        contents = reader.read(total_contents)
+        nones = reader.read(total_contents) if reader.read(1) else 0
 
-                # Otherwise ask for a new value
-                else:
-                    value, value_size = handler.unpack_from(bytes_string, offset)
+        items = []
+        append = items.append
 
-                # We have unpacked a value, so shift by its size
-                offset += value_size
+        for key, bit, handler, is_mergeable in fields:
+            if not contents & bit:
+                continue
 
-            yield (key, value)
+            if nones & bit:
+                append((key, None))
+                continue
 
-        # If there are Boolean values included in the data
-        if has_booleans:
-            # Read data from Boolean bitfields
-            # Increment offset by this return value if any later reading occurs
-            self.boolean_packer.unpack_merge(self.bool_bits, bytes_string, offset)
+            # Merge with existing values where possible
+            if is_mergeable:
+                previous_value = previous_values.get(key)
 
-            found_booleans = content_values[self.total_none_booleans:]
-            none_booleans = none_values[self.total_none_booleans:]
+                if previous_value is not None:
+                    reader.read_merge(handler, previous_value)
+                    append((key, previous_value))
+                    continue
 
-            boolean_info = zip(self.bool_bits, self.bool_args, found_booleans, none_booleans)
+            append((key, reader.read_value(handler)))
 
-            # Yield included boolean values
-            for (value, (key, _), found, none_value) in boolean_info:
-                if found:
-                    yield (key, None if none_value else value)
+        return items
 
-    def pack(self, data):
-        """Pack data into bytes
+    codec = _bit_codecs[schema] = pack, unpack
+    return codec
 
-        :param data: data to be packed
-        """
-        content_bits = self.content_bits
-        none_bits = self.none_bits
 
-        # Reset NoneType and contents Bitmasks
-        none_bits.clear()
-        content_bits.clear()
+class FlagSerialiser:
+    """Interface class for parsing/dumping data to bytes
+    Packed member order: Contents, Data, Booleans, Nones
+    """
 
-        # Create data_values list
-        data_values = []
-        append_value = data_values.append
+    def __init__(self, arguments, bit_packed=False):
+        """Accepts ordered dict as argument
 
-        # Iterate over non booleans
-        for index, (key, handler) in self.enumerated_non_bool_handlers:
-            if not key in data:
-                continue
+        :param arguments: ordered mapping of name to TypeFlag
+        :param bit_packed: if values are packed with exact bit widths (see :py:func:`compile_bit_codec`)
+        """
+        self.bool_args = [(key, value) for key, value in arguments.items() if value.data_type is bool]
+        self.non_bool_args = [(key, value) for key, value in arguments.items() if value.data_type is not bool]
+        self.non_bool_handlers = [(key, get_handler(value)) for key, value in self.non_bool_args]
 
-            value = data[key]
+        # Maintain count of data types
+        self.total_none_booleans = len(self.non_bool_args)
+        self.total_booleans = len(self.bool_args)
+        self.total_contents = self.total_none_booleans + self.total_booleans
 
-            if value is None:
-                none_bits[index] = True
+        self.contents_packer = get_handler(TypeFlag(int, max_bits=self.total_contents + 2))
+        self.none_packer = get_handler(TypeFlag(int, max_bits=self.total_contents))
 
-            else:
-                append_value(handler.pack(value))
+        self.bit_packed = bit_packed
 
-            # Mark attribute as included
-            content_bits[index] = True
+        # Specialised codec for these arguments
+        if bit_packed:
+            self.pack, self.unpack = compile_bit_codec(arguments)
 
-        # Any remaining data will be Boolean values
-        total_none_booleans = self.total_none_booleans
-        has_booleans = len(data_values) != len(data)
+        else:
+            self.pack, self.unpack = compile_codec(arguments)
 
-        if has_booleans:
-            # Reset booleans bitmask
-            boolean_bitmask = self.bool_bits
-            boolean_bitmask.clear()
+    def report_information(self, bytes_string, offset=0):
+        """Display the contents of a serialised stream
 
-            index_shift = total_none_booleans
-            for index, (key, _) in self.enumerated_bool_args:
-                if not key in data:
-                    continue
+        :param bytes_string: data to interpret
+        :param offset: offset from start of stream
+        """
+        # Bit packed streams have no byte-aligned header
+        if self.bit_packed:
+            print("Bit Packed Data: ", self.unpack(bytes_string, offset=offset))
+            return
 
-                # Account for shift due to previous data
-                content_index = index_shift + index
+        # Get header of packed data
+        contents, contents_size = self.contents_packer.unpack_from(bytes_string, offset)
+        offset += contents_size
 
-                # Register as included
-                value = data[key]
+        print("Header Data: ", bytes(bytes_string[:offset]))
+        entry_names, entry_handlers = zip(*(self.non_bool_args + self.bool_args))
 
-                # Either save None value
-                if value is None:
-                    none_bits[content_index] = True
+        # If there are NoneType values they will be first
+        if contents & (1 << (self.total_contents + 1)):
+            nones, none_size = self.none_packer.unpack_from(bytes_string, offset)
+            offset += none_size
 
-                # Or save a boolean value
-                else:
-                    boolean_bitmask[index] = value
+            print("NoneType Values Data: ", bytes(bytes_string[:offset]), bin(nones))
 
-                content_bits[content_index] = True
+        else:
+            nones = 0
 
-            # Mark Boolean values as included
-            append_value(self.boolean_packer.pack(boolean_bitmask))
-            content_bits[self.BOOL_CONTENT_INDEX] = True
+        print()
+        for index, (name, handler) in enumerate(zip(entry_names, entry_handlers)):
+            if not contents & (1 << index):
+                continue
 
-        # If NoneType values have been set, mark them as included
-        if none_bits:
-            none_value_bytes = self.contents_packer.pack(none_bits)
-            data_values.insert(0, none_value_bytes)
-            content_bits[self.NONE_CONTENT_INDEX] = True
+            print("{} : {}".format(name, "None" if nones & (1 << index) else handler.data_type.__name__))
 
-        return self.contents_packer.pack(content_bits) + b''.join(data_values)
\ No newline at end of file
+        print()
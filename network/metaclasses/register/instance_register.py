@@ -119,6 +119,8 @@ class InstanceRegister(TypeRegister, ContextMemberMeta):
     _id_generator = ContextMember(None)
     _id_generator.factory = lambda cls: RenewableGenerator(cls.get_available_ids)
 
+    _id_range = ContextMember(None)
+
     def __new__(metacls, name, parents, attrs):
         parents += (_ManagedInstanceBase,)
 
@@ -139,10 +141,22 @@ class InstanceRegister(TypeRegister, ContextMemberMeta):
     def get_id_range(cls):
         """Get iterable of all potential IDs
 
-        :returns: range object wider than the current range of IDs in use
+        :returns: reserved range of IDs if set, otherwise range object wider than the current range of IDs in use
         """
+        id_range = cls._id_range
+        if id_range is not None:
+            return id_range
+
         return range(len(cls._instances) + 1)
 
+    def set_id_range(cls, id_range):
+        """Reserve the IDs chosen for instances registered without an ID
+
+        :param id_range: iterable of IDs, or None to choose any free ID
+        """
+        cls._id_range = id_range
+        cls._id_generator.renew()
+
     def get_available_ids(cls):
         """Get iterator of available Instance IDs"""
         potential_ids = cls.get_id_range()
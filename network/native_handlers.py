@@ -2,13 +2,13 @@ from .bitfield import BitField
 from .type_flag import TypeFlag
 from .enums import IterableCompressionType, Roles
 from .handlers import *
-from .iterators import partition_iterable
 from .logger import logger
 from .replicable import Replicable
 from .encoding import RunLengthCodec
 from .serialiser import *
 from .world_info import WorldInfo
 
+from array import array
 from inspect import signature
 from itertools import chain
 
@@ -28,9 +28,10 @@ def iterable_description(iterable):
 def is_variable_sized(packer):
     size_func = packer.size
     size_signature = signature(size_func)
-    parameter_list = list(size_signature.parameters.keys())
-    bytes_arg = size_signature.parameters[parameter_list[-1]]
-    return bytes_arg.default is bytes_arg.empty
+
+    # Fixed size handlers do not require the packed bytes
+    bytes_arg = next(iter(size_signature.parameters.values()), None)
+    return bytes_arg is not None and bytes_arg.default is bytes_arg.empty
 
 
 class ReplicableTypeHandler:
@@ -100,6 +101,20 @@ class RolesHandler:
     def size(cls, bytes_string=None):
         return 2 * cls.packer.size()
 
+    # Bits required to pack a role
+    bits = (len(Roles.values) - 1).bit_length()
+
+    @classmethod
+    def write_bits(cls, writer, roles):
+        writer.write(roles.remote, cls.bits)
+        writer.write(roles.local, cls.bits)
+
+    @classmethod
+    def read_bits(cls, reader):
+        local_role = reader.read(cls.bits)
+        remote_role = reader.read(cls.bits)
+        return Roles(local_role, remote_role)
+
 
 class IterableHandler:
     iterable_cls = None
@@ -114,8 +129,12 @@ class IterableHandler:
         except KeyError as err:
             raise TypeError("Unable to pack iterable without full type information") from err
 
-        max_count = static_value.data.get("max_length", 255)
-        count_flag = TypeFlag(int, max_value=max_count)
+        # Unbounded iterables have variable length counts
+        if "max_length" in static_value.data:
+            count_flag = TypeFlag(int, max_value=static_value.data["max_length"])
+
+        else:
+            count_flag = TypeFlag(int, encoding="varint")
         variable_bitfield_flag = TypeFlag(BitField)
 
         self.element_type = element_flag.data_type
@@ -125,6 +144,9 @@ class IterableHandler:
 
         self.is_variable_sized = is_variable_sized(self.element_packer)
 
+        # Fixed size struct formats are packed with a single call for all elements
+        self.is_bulk_packed = getattr(self.element_packer, "struct_format", None) is not None
+
         compression_type = static_value.data.get("compression", IterableCompressionType.auto)
         supports_compression = not self.__class__.unique_members
 
@@ -147,6 +169,86 @@ class IterableHandler:
             self.unpack_from = self.uncompressed_unpack_from
             self.size = self.uncompressed_size
 
+    def create_iterable(self, elements):
+        """Return new iterable of unpacked elements
+
+        :param elements: sequence of elements
+        """
+        return self.iterable_cls(elements)
+
+    def pack_elements(self, elements):
+        """Pack sequence of elements, without a count
+
+        :param elements: sized sequence of elements
+        """
+        element_packer = self.element_packer
+
+        if self.is_bulk_packed:
+            return element_packer.pack_multiple(elements, len(elements))
+
+        element_pack = element_packer.pack
+        return b''.join([element_pack(x) for x in elements])
+
+    def unpack_elements(self, bytes_string, count, offset=0):
+        """Unpack sequence of elements, returning elements and their packed size
+
+        :param bytes_string: incoming bytes
+        :param count: number of elements
+        :param offset: offset of elements in bytes_string
+        """
+        if self.is_bulk_packed:
+            return self.element_packer.unpack_multiple(bytes_string, count, offset)
+
+        element_unpack = self.element_packer.unpack_from
+
+        elements = []
+        add_element = elements.append
+        original_offset = offset
+
+        for _ in range(count):
+            element, element_size = element_unpack(bytes_string, offset)
+            add_element(element)
+
+            offset += element_size
+
+        return elements, offset - original_offset
+
+    def elements_size(self, bytes_string, count):
+        """Determine size of a packed sequence of elements
+
+        :param bytes_string: incoming bytes offset to packed elements start
+        :param count: number of elements
+        """
+        element_get_size = self.element_packer.size
+
+        if not self.is_variable_sized:
+            return count * element_get_size()
+
+        # Account for variable sized elements
+        total_size = 0
+        for _ in range(count):
+            total_size += element_get_size(bytes_string[total_size:])
+
+        return total_size
+
+    def pack_multiple(self, iterables, count):
+        pack = self.pack
+        return b''.join([pack(x) for x in iterables])
+
+    def unpack_multiple(self, bytes_string, count, offset=0):
+        unpack_from = self.unpack_from
+
+        iterables = []
+        original_offset = offset
+
+        for _ in range(count):
+            iterable, iterable_size = unpack_from(bytes_string, offset)
+            iterables.append(iterable)
+
+            offset += iterable_size
+
+        return iterables, offset - original_offset
+
     def auto_pack(self, iterable):
         """Use smallest packing method to pack iterable in order to reduce data size
 
@@ -210,96 +312,82 @@ class IterableHandler:
         encoded_pairs = RunLengthCodec.encode(iterable)
         total_items = len(encoded_pairs)
 
-        pack_length = self.count_packer.pack
-        pack_key = self.element_packer.pack
+        count_packer = self.count_packer
+        packed_count = count_packer.pack(total_items)
 
-        # Unfortunate special boolean case
-        if self.element_type != bool:
-            # Encode all lengths first then elements
-            packed = [(pack_length(length), pack_key(key)) for length, key in encoded_pairs]
-            data = [x for y in zip(*packed) for x in y]
+        if not encoded_pairs:
+            return packed_count
 
-        else:
-            if encoded_pairs:
-                lengths, keys = zip(*encoded_pairs)
-                data = [pack_length(length) for length in lengths]
+        lengths, keys = zip(*encoded_pairs)
+        packed_lengths = count_packer.pack_multiple(lengths, total_items)
 
-                bitfield = BitField.from_iterable(keys)
-                data.insert(0, self.bitfield_packer.pack(bitfield))
-
-            else:
-                data = []
+        # Unfortunate special boolean case
+        if self.element_type is bool:
+            bitfield = BitField.from_iterable(keys)
+            return packed_count + self.bitfield_packer.pack(bitfield) + packed_lengths
 
-        return pack_length(total_items) + b''.join(data)
+        # Encode all lengths first then elements
+        return packed_count + packed_lengths + self.pack_elements(keys)
 
     def compressed_unpack_from(self, bytes_string, offset=0):
         """Unpack compressed iterable
 
         :param bytes_string: incoming bytes offset to packed_iterable start
         """
-        count_unpacker = self.count_packer.unpack_from
-        elements_count, count_size = count_unpacker(bytes_string, offset)
-        element_unpack = self.element_packer.unpack_from
-        count_multiple_unpacker = self.count_packer.unpack_multiple
+        count_packer = self.count_packer
+        elements_count, count_size = count_packer.unpack_from(bytes_string, offset)
+
+        if not elements_count:
+            return self.create_iterable(()), count_size
 
         original_offset = offset
         offset += count_size
 
-        element_list = []
-        extend_elements = element_list.extend
-
         if self.element_type is bool:
-            if elements_count:
-                bitfield, bitfield_size = self.bitfield_packer.unpack_from(bytes_string, offset)
-                offset += bitfield_size
+            bitfield, bitfield_size = self.bitfield_packer.unpack_from(bytes_string, offset)
+            offset += bitfield_size
 
-                element_counts, _offset = count_multiple_unpacker(bytes_string, elements_count, offset)
-                offset += _offset
+            element_counts, counts_size = count_packer.unpack_multiple(bytes_string, elements_count, offset)
+            offset += counts_size
 
-                elements = bitfield[:element_counts]
-                for repeat, element in zip(element_counts, elements):
-                    extend_elements([element] * repeat)
+            keys = bitfield[:]
 
         else:
-            element_counts, _offset = count_multiple_unpacker(bytes_string, elements_count, offset)
-            offset += _offset
-            # Todo all packers multiples
-            for repeat in element_counts:
-                element, element_size = element_unpack(bytes_string, offset)
-                offset += element_size
+            element_counts, counts_size = count_packer.unpack_multiple(bytes_string, elements_count, offset)
+            offset += counts_size
 
-                extend_elements([element] * repeat)
+            keys, keys_size = self.unpack_elements(bytes_string, elements_count, offset)
+            offset += keys_size
 
-        elements = self.iterable_cls(element_list)
-        return elements, offset - original_offset
+        element_list = []
+        extend_elements = element_list.extend
+
+        for repeat, element in zip(element_counts, keys):
+            extend_elements([element] * repeat)
+
+        return self.create_iterable(element_list), offset - original_offset
 
     def compressed_size(self, bytes_string):
         """Determine size of a compressed iterable
 
         :param bytes_string: incoming bytes offset to packed_iterable start
         """
-        elements_count, count_size = self.count_packer.unpack_from(bytes_string)
-        data = bytes_string[count_size:]
+        count_packer = self.count_packer
+        elements_count, count_size = count_packer.unpack_from(bytes_string)
+
+        if not elements_count:
+            return count_size
 
-        element_get_size = self.element_packer.size
         total_size = count_size
 
-        # Faster unpacking
         if self.element_type is bool:
-            if elements_count:
-                bitfield_size = self.bitfield_packer.size(data)
-                total_size += bitfield_size + count_size * elements_count
-
-        elif not self.is_variable_sized:
-            total_size += (element_get_size(None) + count_size) * elements_count
+            total_size += self.bitfield_packer.size(bytes_string[total_size:])
 
-        else:
-            for i in range(elements_count):
-                element_data = data[count_size:]
-                element_size = element_get_size(element_data)
-                data = element_data[element_size:]
+        _, counts_size = count_packer.unpack_multiple(bytes_string, elements_count, total_size)
+        total_size += counts_size
 
-                total_size += element_size + count_size
+        if self.element_type is not bool:
+            total_size += self.elements_size(bytes_string[total_size:], elements_count)
 
         return total_size
 
@@ -312,11 +400,8 @@ class IterableHandler:
             bitfield = BitField.from_iterable(iterable)
             return self.bitfield_packer.pack(bitfield)
 
-        element_pack = self.element_packer.pack
         element_count = self.count_packer.pack(len(iterable))
-        packed_elements = b''.join([element_pack(x) for x in iterable])
-
-        return element_count + packed_elements
+        return element_count + self.pack_elements(iterable)
 
     def uncompressed_unpack_from(self, bytes_string, offset=0):
         """Use simple header based count to unpack iterable elements
@@ -325,35 +410,12 @@ class IterableHandler:
         """
         if self.element_type is bool:
             bitfield, bitfield_size = self.bitfield_packer.unpack_from(bytes_string, offset)
-            return self.iterable_cls(bitfield), bitfield_size
+            return self.create_iterable(bitfield), bitfield_size
 
         element_count, count_size = self.count_packer.unpack_from(bytes_string, offset)
+        elements, elements_size = self.unpack_elements(bytes_string, element_count, offset + count_size)
 
-        element_get_size = self.element_packer.size
-        element_unpack = self.element_packer.unpack_from
-
-        original_offset = offset
-        offset += count_size
-
-        # Fixed length unpacking
-        if not self.is_variable_sized:
-            data = bytes_string[offset:]
-            element_size = element_get_size()
-            partitioned_iterable = partition_iterable(data, element_size, element_count)
-            elements = self.iterable_cls([element_unpack(x)[0] for x in partitioned_iterable])
-            return elements, count_size + element_count * element_size
-
-        # Variable length unpacking
-        add_element = self.__class__.iterable_add
-        elements = self.iterable_cls()
-
-        for _ in range(element_count):
-            element, element_size = element_unpack(bytes_string, offset)
-            add_element(elements, element)
-
-            offset += element_size
-
-        return elements, offset - original_offset
+        return self.create_iterable(elements), count_size + elements_size
 
     def unpack_merge(self, iterable, bytes_string, offset=0):
         """Merge unpacked iterable data with existing iterable object
@@ -370,20 +432,11 @@ class IterableHandler:
 
         :param bytes_string: incoming bytes offset to packed_iterable start
         """
-        number_elements, elements_size = self.count_packer.unpack_from(bytes_string)
-        data = bytes_string[elements_size:]
-        element_get_size = self.element_packer.size
-
-        if not self.is_variable_sized:
-            return (number_elements * element_get_size()) + elements_size
-
-        # Account for variable sized elements
-        for i in range(number_elements):
-            shift = element_get_size(data)
-            elements_size += shift
-            data = data[shift:]
+        if self.element_type is bool:
+            return self.bitfield_packer.size(bytes_string)
 
-        return elements_size
+        number_elements, count_size = self.count_packer.unpack_from(bytes_string)
+        return count_size + self.elements_size(bytes_string[count_size:], number_elements)
 
 
 class ListHandler(IterableHandler):
@@ -406,13 +459,52 @@ class SetHandler(IterableHandler):
         set_.update(data)
 
 
+class ArrayHandler(IterableHandler):
+    """Handler for packing arrays of numeric elements.
+
+    Elements are copied between packed data and the array buffer, without converting individual elements
+    """
+    iterable_cls = array
+    iterable_add = array.append
+
+    def __init__(self, static_value):
+        super().__init__(static_value)
+
+        typecode = getattr(self.element_packer, "array_typecode", None)
+
+        if typecode is None:
+            raise TypeError("Unable to pack array of {} elements".format(self.element_type))
+
+        self.typecode = typecode
+
+    def create_iterable(self, elements):
+        if type(elements) is array:
+            return elements
+
+        return array(self.typecode, elements)
+
+    def pack_elements(self, elements):
+        return self.element_packer.pack_array(elements)
+
+    def unpack_elements(self, bytes_string, count, offset=0):
+        return self.element_packer.unpack_array(bytes_string, count, offset)
+
+    def iterable_update(array_, data):  # @NoSelf
+        array_[:] = data
+
+
 class ReplicableBaseHandler:
     """Handler for packing replicable proxy
     Packs replicable references and unpacks to reference
     """
 
-    def __init__(self):
-        id_flag = TypeFlag(int, max_value=Replicable.MAXIMUM_REPLICABLES)
+    def __init__(self, id_flag=None):
+        """
+        :param id_flag: TypeFlag of instance IDs (e.g. TypeFlag(int, encoding="varint")), defaults to fixed width
+        """
+        if id_flag is None:
+            id_flag = TypeFlag(int, max_value=Replicable.MAXIMUM_REPLICABLES)
+
         self._packer = get_handler(id_flag)
 
     def pack(self, replicable):
@@ -473,7 +565,7 @@ class ReplicableBaseHandler:
         return replicables, offset
 
     def size(self, bytes_string=None):
-        return self._packer.size()
+        return self._packer.size(bytes_string)
 
 
 class StructHandler:
@@ -506,6 +598,7 @@ class StructHandler:
         return length_size + struct_size
 
     def unpack_multiple(self, bytes_string, count, offset=0):
+        original_offset = offset
         structs = []
         for _ in range(count):
             struct = self.struct_cls()
@@ -514,6 +607,8 @@ class StructHandler:
             struct.read_bytes(bytes_string, length_size + offset)
             offset += length_size + struct_size
 
+        return structs, offset - original_offset
+
     def size(self, bytes_string):
         struct_size, length_size = self.size_packer.unpack_from(bytes_string)
         return struct_size + length_size
@@ -538,8 +633,11 @@ class BitFieldHandler:
             self.pack = self.fixed_pack
             self.pack_multiple = self.fixed_pack_multiple
             self.unpack_from = self.fixed_unpack_from
-            self.unpack_multiple = self.fixed_pack_multiple
+            self.unpack_multiple = self.fixed_unpack_multiple
             self.size = self.fixed_size
+            self.unpack_merge = self.fixed_unpack_merge
+            self.write_bits = self.fixed_write_bits
+            self.read_bits = self.fixed_read_bits
             self._size = fields
             self._packer = handler_from_bit_length(fields)
             self._packed_size = BitField.calculate_footprint(fields)
@@ -555,12 +653,25 @@ class BitFieldHandler:
         return BitField.from_bytes(self._size, bytes_string, offset)
 
     def fixed_unpack_multiple(self, bytes_string, count, offset=0):
-        return [BitField.from_bytes(self._size, bytes_string, offset + i * self._size)
-                for i in range(count)], count * self._size
+        from_bytes = self.field_cls.from_bytes
+        packed_size = self._packed_size
+        return [from_bytes(self._size, bytes_string, offset + i * packed_size)[0]
+                for i in range(count)], count * packed_size
 
     def fixed_size(self, bytes_string=None):
         return self._packed_size
 
+    def fixed_unpack_merge(self, field, bytes_string, offset=0):
+        value, packer_size = self._packer.unpack_from(bytes_string, offset)
+        field.set_mask(value)
+        return packer_size
+
+    def fixed_write_bits(self, writer, field):
+        writer.write(field.to_int(), self._size)
+
+    def fixed_read_bits(self, reader):
+        return self.field_cls.from_int(self._size, reader.read(self._size))
+
     def variable_pack(self, field):
         packed_size = self._packer.pack(len(field))
 
@@ -580,6 +691,10 @@ class BitFieldHandler:
         field_bits, packer_size = self._packer.unpack_from(bytes_string, offset)
         offset += packer_size
 
+        # Empty fields are packed without data
+        if not field_bits:
+            return self.field_cls.from_iterable(()), packer_size
+
         field, field_size_bytes = self.field_cls.from_bytes(field_bits, bytes_string, offset)
         return field, field_size_bytes + packer_size
 
@@ -601,6 +716,10 @@ class BitFieldHandler:
 
     def variable_size(self, bytes_string):
         field_size, packed_size = self._packer.unpack_from(bytes_string)
+
+        if not field_size:
+            return packed_size
+
         return self.field_cls.calculate_footprint(field_size) + packed_size
 
 
@@ -614,6 +733,7 @@ register_handler(Struct, StructHandler, True)
 register_handler(Roles, RolesHandler)
 register_handler(list, ListHandler, True)
 register_handler(set, SetHandler, True)
+register_handler(array, ArrayHandler, True)
 
 ReplicableHandler = ReplicableBaseHandler()
 register_handler(Replicable, ReplicableHandler)
@@ -622,3 +742,4 @@ register_handler(type(Replicable), ReplicableTypeHandler)
 register_description(type(Replicable), class_type_description)
 register_description(list, iterable_description)
 register_description(set, iterable_description)
+register_description(array, iterable_description)
@@ -1,11 +1,49 @@
+from .capture import CaptureDirection, CaptureWriter
 from .connection import Connection
+from .containers import AttributeStorageContainer
+from .socket_backends import create_socket_backend
 
+from concurrent.futures import ProcessPoolExecutor
 from random import random
 from socket import (socket, AF_INET, SOCK_DGRAM, error as SOCK_ERROR, gethostname, gethostbyname, SOL_IP,
                     IP_MULTICAST_IF, IP_ADD_MEMBERSHIP, IP_MULTICAST_TTL, IP_DROP_MEMBERSHIP, inet_aton)
-from time import clock
+from time import clock, perf_counter
 
-__all__ = ['NonBlockingSocketUDP', 'UnreliableSocketWrapper', 'Network', 'NetworkMetrics']
+__all__ = ['NonBlockingSocketUDP', 'UnreliableSocketWrapper', 'Network', 'NetworkMetrics', 'send_connections']
+
+
+def send_connections(connections, full_update, executor=None):
+    """Return list of (data, address) pairs of datagrams sent by connections.
+
+    Packets are always pulled from connections sequentially, as streams may time out or disconnect connections (and
+    so deregister replicables). With an executor, only the datagrams of connections are written (and compressed)
+    concurrently, as zlib releases the GIL. Datagrams are ordered by connection, then by the order in which each
+    connection sent them, whether or not connections are written concurrently
+
+    :param connections: sequence of Connection instances
+    :param full_update: whether this is a full send call
+    :param executor: executor with which datagrams are written concurrently, or None to write sequentially
+    """
+    # Values are described at most once for all connections
+    AttributeStorageContainer.begin_replication_pass()
+
+    if executor is None:
+        sent_datagrams = [connection.send(full_update) for connection in connections]
+
+    else:
+        pulled_datagrams = [connection.pull_datagrams(full_update) for connection in connections]
+        sent_datagrams = executor.map(Connection.write_datagrams, connections, *zip(*pulled_datagrams))
+
+    datagrams = []
+
+    for connection, connection_datagrams in zip(connections, sent_datagrams):
+        address = connection.instance_id
+
+        # Connections may split their data across several datagrams
+        for data in connection_datagrams:
+            datagrams.append((data, address))
+
+    return datagrams
 
 
 class NonBlockingSocketUDP(socket):
@@ -84,6 +122,9 @@ class NetworkMetrics:
         self._received_bytes = 0
         self._sent_bytes = 0
 
+        self._receive_calls = 0
+        self._send_calls = 0
+
     @property
     def sent_bytes(self):
         return self._sent_bytes
@@ -92,6 +133,16 @@ class NetworkMetrics:
     def received_bytes(self):
         return self._received_bytes
 
+    @property
+    def receive_calls(self):
+        """Number of receive system calls made during the current tick"""
+        return self._receive_calls
+
+    @property
+    def send_calls(self):
+        """Number of send system calls made during the current tick"""
+        return self._send_calls
+
     @property
     def send_rate(self):
         return self._delta_sent / (clock() - self._delta_timestamp)
@@ -114,6 +165,18 @@ class NetworkMetrics:
         self._received_bytes += received_bytes
         self._delta_received += received_bytes
 
+    def on_receive_calls(self, calls):
+        """Update internal receive system call count"""
+        self._receive_calls += calls
+
+    def on_send_calls(self, calls):
+        """Update internal send system call count"""
+        self._send_calls += calls
+
+    def reset_tick_counters(self):
+        """Reset per-tick system call counts"""
+        self._receive_calls = self._send_calls = 0
+
     def reset_sample_window(self):
         """Reset data used to calculate metrics"""
         self._delta_timestamp = clock()
@@ -201,37 +264,100 @@ class MulticastDiscovery:
 class Network:
     """Network management class"""
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, socket_backend=None, executor=None):
+        """
+        :param address: address of socket
+        :param port: port of socket
+        :param socket_backend: socket backend of socket
+        :param executor: thread pool executor with which the datagrams of connections are written (and compressed)
+        concurrently, or None to write them sequentially
+        """
+        if socket_backend is None:
+            socket_backend = create_socket_backend()
+
+        # Connections are sent to in place, so cannot be copied to other processes
+        if isinstance(executor, ProcessPoolExecutor):
+            raise TypeError("Connections can only be sent to by executors which share memory with this process")
+
+        self.executor = executor
+
         self.socket = NonBlockingSocketUDP(address, port)
+        self.socket_backend = socket_backend
 
         self.address = address
         self.port = port
 
         self.metrics = NetworkMetrics()
         self.multicast = MulticastDiscovery()
-        self.receive_buffer_size = 63553
+
+        self.capture = None
 
     def __repr__(self):
         return "<Network Manager: {}:{}>".format(self.address, self.port)
 
+    @property
+    def receive_buffer_size(self):
+        """Maximum size of a received datagram"""
+        return self.socket_backend.buffer_size
+
+    @receive_buffer_size.setter
+    def receive_buffer_size(self, buffer_size):
+        self.socket_backend.allocate_buffers(buffer_size)
+
     @property
     def received_data(self):
-        """Return iterator over received data"""
-        buff_size = self.receive_buffer_size
+        """Return iterator over (payload, address) pairs of received datagrams.
+
+        Payloads are memoryviews into the reused receive buffers of the socket backend, rather than bytes. A payload
+        is only valid until the next receive, and may be overwritten sooner by later datagrams of the same receive
+        (once more datagrams are pending than the batch size of the backend). Payloads which are kept must be copied
+        with bytes()
+        """
+        socket_backend = self.socket_backend
         on_received_bytes = self.metrics.on_received_bytes
 
-        while True:
-            try:
-                data = self.socket.recvfrom(buff_size)
+        initial_calls = socket_backend.receive_calls
 
-            except SOCK_ERROR:
-                return
+        for data in socket_backend.receive_from(self.socket):
+            payload, address = data
+            on_received_bytes(len(payload))
 
-            payload, _ = data
-            on_received_bytes(len(data))
+            if self.capture is not None:
+                self.capture.write(perf_counter(), CaptureDirection.received, address, payload)
 
             yield data
 
+        self.metrics.on_receive_calls(socket_backend.receive_calls - initial_calls)
+
+    def start_capture(self, path):
+        """Write received and sent datagrams to a capture log
+
+        :param path: path of log file
+        """
+        if self.capture is not None:
+            raise TypeError("Datagrams are already being captured")
+
+        self.capture = CaptureWriter(path)
+
+    def stop_capture(self):
+        """Stop writing datagrams to capture log"""
+        if self.capture is None:
+            return
+
+        self.capture.close()
+        self.capture = None
+
+    def capture_sent(self, datagrams):
+        """Write sent datagrams to capture log
+
+        :param datagrams: sequence of (data, address) pairs
+        """
+        timestamp = perf_counter()
+        write = self.capture.write
+
+        for data, address in datagrams:
+            write(timestamp, CaptureDirection.sent, address, data)
+
     @staticmethod
     def connect_to(address, port):
         """Return connection interface to remote peer.
@@ -245,6 +371,9 @@ class Network:
 
     def receive(self):
         """Receive all data from socket"""
+        # Start a new tick sample
+        self.metrics.reset_tick_counters()
+
         # Receives all incoming data
         for data, address in self.received_data:
             # Find existing connection for address
@@ -267,16 +396,10 @@ class Network:
 
         :param full_update: whether this is a full send call
         """
-        send_func = self.send_to
+        datagrams = send_connections(list(Connection), full_update, self.executor)
 
-        # Send all queued data
-        for connection in list(Connection):
-            # Give the option to send nothing
-            data = connection.send(full_update)
-
-            # If returns data, send it
-            if data:
-                send_func(data, connection.instance_id)
+        if datagrams:
+            self.send_batch(datagrams)
 
     def send_to(self, data, address):
         """Send data to remote peer
@@ -284,8 +407,23 @@ class Network:
         :param data: data to send
         :param address: address of remote peer
         """
-        data_length = self.socket.sendto(data, address)
+        return self.send_batch(((data, address),))
+
+    def send_batch(self, datagrams):
+        """Send data to several remote peers
+
+        :param datagrams: sequence of (data, address) pairs
+        """
+        socket_backend = self.socket_backend
+        initial_calls = socket_backend.send_calls
+
+        data_length = socket_backend.send_to(self.socket, datagrams)
+
+        if self.capture is not None:
+            self.capture_sent(datagrams)
+
         self.metrics.on_sent_bytes(data_length)
+        self.metrics.on_send_calls(socket_backend.send_calls - initial_calls)
 
         return data_length
 
@@ -303,7 +441,8 @@ class Network:
         self.send_to(b'', multicast_host)
 
     def stop(self):
-        """Close network socket"""
+        """Close network socket and capture log"""
         self.socket.close()
+        self.stop_capture()
 
         self.multicast.stop()
@@ -1,9 +1,56 @@
 from .handlers import get_handler
 from .type_flag import TypeFlag
 
-from functools import lru_cache
+__all__ = ['PacketCollection', 'Packet', 'PacketPool', 'PacketWriter']
 
-__all__ = ['PacketCollection', 'Packet']
+
+class PacketWriter:
+    """Writes packets into a reusable buffer.
+
+    The buffer grows to the size of the largest write, and is reused after each reset
+    """
+
+    __slots__ = "buffer", "offset"
+
+    def __init__(self, size=0):
+        """
+        :param size: initial size of buffer
+        """
+        self.buffer = bytearray(size)
+        self.offset = 0
+
+    def reset(self):
+        """Discard written data, retaining the buffer"""
+        self.offset = 0
+
+    def write(self, bytes_string):
+        """Write bytes at the current offset
+
+        :param bytes_string: bytes-like object
+        """
+        offset = self.offset
+        end = offset + len(bytes_string)
+
+        self.buffer[offset: end] = bytes_string
+        self.offset = end
+
+    def write_value(self, handler, value):
+        """Pack value at the current offset, directly into the buffer if the handler supports pack_into
+
+        :param handler: data handler
+        :param value: value to pack
+        """
+        pack_into = getattr(handler, "pack_into", None)
+
+        if pack_into is None:
+            self.write(handler.pack(value))
+
+        else:
+            self.offset += pack_into(self.buffer, self.offset, value)
+
+    def to_bytes(self):
+        """Return copy of written data"""
+        return bytes(memoryview(self.buffer)[:self.offset])
 
 
 class PacketCollection:
@@ -35,7 +82,7 @@ class PacketCollection:
 
     @property
     def size(self):
-        return len(self.to_bytes())
+        return sum(m.size for m in self.members)
 
     def to_reliable(self):
         """Create PacketCollection of reliable members
@@ -65,27 +112,42 @@ class PacketCollection:
         """Writes collection contents to bytes""" 
         return b''.join([m.to_bytes() for m in self.members])
 
+    def write_to(self, writer):
+        """Write collection contents to a PacketWriter
+
+        :param writer: PacketWriter instance
+        """
+        for member in self.members:
+            member.write_to(writer)
+
     @classmethod
-    def iter_bytes(cls, bytes_string, callback):
-        """Iterates over packets within a byte stream
+    def iter_bytes(cls, bytes_string, callback, offset=0):
+        """Iterates over packets within a byte stream.
+
+        Packet payloads are views into the byte stream, and must be copied if they are kept
 
         :param bytes_string: byte stream
-        :param callback: callable object to handle created packets"""
-        while bytes_string:
+        :param callback: callable object to handle created packets
+        :param offset: offset of first packet in byte stream"""
+        bytes_string = memoryview(bytes_string)
+        end_index = len(bytes_string)
+
+        while offset < end_index:
             packet = Packet()
-            bytes_string = packet.take_from(bytes_string)
+            offset = packet.take_from(bytes_string, offset)
             callback(packet)
 
     @classmethod
-    def from_bytes(cls, bytes_string):
+    def from_bytes(cls, bytes_string, offset=0):
         """Creates PacketCollection instance
         Populates with packets in byte stream
 
         :param bytes_string: bytes stream
+        :param offset: offset of first packet in byte stream
         :rtype: :py:class:`network.packet.PacketCollection`
         """
         collection = cls()
-        cls.iter_bytes(bytes_string, collection.members.append)
+        cls.iter_bytes(bytes_string, collection.members.append, offset)
 
         return collection
 
@@ -110,10 +172,13 @@ class Packet:
 
     Supports protocol and length header
     """
-    __slots__ = "protocol", "payload", "reliable", "on_success", "on_failure"
+    __slots__ = "protocol", "payload", "reliable", "on_success", "on_failure", "pool", "_bytes"
 
-    _protocol_handler = get_handler(TypeFlag(int))
-    _size_handler = get_handler(TypeFlag(int, max_value=1000))
+    _protocol_handler = get_handler(TypeFlag(int, encoding="varint"))
+    _size_handler = get_handler(TypeFlag(int, encoding="varint"))
+
+    # Packed protocol headers, by protocol
+    _packed_protocols = {}
 
     def __init__(self, protocol=None, payload=b'', *, reliable=False,
                  on_success=None, on_failure=None):
@@ -127,24 +192,43 @@ class Packet:
         self.payload = payload
         self.reliable = reliable
 
+        # Pool to which packet is returned once released
+        self.pool = None
+        self._bytes = None
+
     @property
     def members(self):
         """Returns self as a member of a list"""
         return [self]
 
+    @property
+    def packed_protocol(self):
+        """Packed protocol header"""
+        protocol = self.protocol
+
+        try:
+            return self._packed_protocols[protocol]
+
+        except KeyError:
+            packed_protocol = self._packed_protocols[protocol] = self._protocol_handler.pack(protocol)
+            return packed_protocol
+
     @property
     def size(self):
         """Length of packet when reduced to bytes"""
-        return len(self.to_bytes())
+        data_size = len(self.packed_protocol) + len(self.payload)
+        return len(self._size_handler.pack(data_size)) + data_size
 
     def on_ack(self):
         """Called when packet is acknowledged.
 
-        Invokes on_success callback
+        Invokes on_success callback, then releases packet
         """
         if callable(self.on_success):
             self.on_success(self)
 
+        self.release()
+
     def on_not_ack(self):
         """Called when packet is considered dropped.
 
@@ -153,14 +237,47 @@ class Packet:
         if callable(self.on_failure):
             self.on_failure(self)
 
-    @lru_cache()
+    def release(self):
+        """Called when packet is no longer sent.
+
+        Releases encoded bytes. Pooled packets are returned to their pool, and must not be used afterwards
+        """
+        self._bytes = None
+
+        pool = self.pool
+        if pool is not None:
+            self.pool = None
+            pool.release(self)
+
     def to_bytes(self):
-        """Reduces packet into bytes
+        """Reduces packet into bytes, which are kept until the packet is released
 
         :rtype: bytes
         """
-        data = self._protocol_handler.pack(self.protocol) + self.payload
-        return self._size_handler.pack(len(data)) + data
+        packed_bytes = self._bytes
+
+        if packed_bytes is None:
+            data = self.packed_protocol + self.payload
+            packed_bytes = self._bytes = self._size_handler.pack(len(data)) + data
+
+        return packed_bytes
+
+    def write_to(self, writer):
+        """Write packet to a PacketWriter
+
+        :param writer: PacketWriter instance
+        """
+        # Reliable packets are kept until acknowledged, and may be redelivered
+        if self.reliable or self._bytes is not None:
+            writer.write(self.to_bytes())
+            return
+
+        packed_protocol = self.packed_protocol
+        payload = self.payload
+
+        writer.write_value(self._size_handler, len(packed_protocol) + len(payload))
+        writer.write(packed_protocol)
+        writer.write(payload)
 
     @classmethod
     def from_bytes(cls, bytes_string):
@@ -173,32 +290,33 @@ class Packet:
         packet.take_from(bytes_string)
         return packet
 
-    def take_from(self, bytes_string):
+    def take_from(self, bytes_string, offset=0):
         """Populates packet instance with data.
 
-        Offsets returned bytes by length of packet
+        Returns offset of the end of this packet
 
         :param bytes_string: bytes stream
-        :rtype: bytes
+        :param offset: offset of packet in bytes stream
+        :rtype: int
         """
         length_handler = self._size_handler
         protocol_handler = self._protocol_handler
 
         # Read packet length (excluding length character size)
-        length, length_size = length_handler.unpack_from(bytes_string)
-        bytes_string = bytes_string[length_size:]
+        length, length_size = length_handler.unpack_from(bytes_string, offset)
+        offset += length_size
 
         # Read packet protocol
-        self.protocol, protocol_size = protocol_handler.unpack_from(bytes_string)
-        bytes_string = bytes_string[protocol_size:]
+        self.protocol, protocol_size = protocol_handler.unpack_from(bytes_string, offset)
 
         # Determine the slice index of this payload
-        end_index = length - protocol_size
+        end_index = offset + length
 
-        self.payload = bytes_string[:end_index]
+        self.payload = bytes_string[offset + protocol_size: end_index]
         self.reliable = False
+        self._bytes = None
 
-        return bytes_string[end_index:]
+        return end_index
 
     def __add__(self, other):
         """Concatenates two Packets
@@ -220,3 +338,60 @@ class Packet:
 
     __radd__ = __add__
     __bytes__ = to_bytes
+
+
+class PacketPool:
+    """Free list of Packet instances.
+
+    Packets created by the pool are returned to it when they are released (on acknowledgement, or when an unreliable
+    packet is dropped), and reused by later calls to create
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        :param max_size: maximum number of free packets retained
+        """
+        self.max_size = max_size
+        self.free = []
+
+        # Metrics
+        self.allocated_count = 0
+        self.reused_count = 0
+
+    def create(self, protocol=None, payload=b'', *, reliable=False, on_success=None, on_failure=None):
+        """Return packet from the free list, or a new packet if it is empty
+
+        :param protocol: packet protocol
+        :param payload: packet payload
+        :param reliable: if packet is reliable
+        :param on_success: callback invoked when packet is acknowledged
+        :param on_failure: callback invoked when packet is dropped
+        """
+        try:
+            packet = self.free.pop()
+
+        except IndexError:
+            packet = Packet(protocol, payload, reliable=reliable, on_success=on_success, on_failure=on_failure)
+            self.allocated_count += 1
+
+        else:
+            packet.protocol = protocol
+            packet.payload = payload
+            packet.reliable = reliable or bool(on_success or on_failure)
+            packet.on_success = on_success
+            packet.on_failure = on_failure
+            self.reused_count += 1
+
+        packet.pool = self
+        return packet
+
+    def release(self, packet):
+        """Clear released packet, and retain it if the free list is not full
+
+        :param packet: Packet instance
+        """
+        packet.payload = b''
+        packet.on_success = packet.on_failure = None
+
+        if len(self.free) < self.max_size:
+            self.free.append(packet)
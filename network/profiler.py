@@ -21,6 +21,15 @@ class ProfileManager:
 
     def __init__(self):
         self._profiles = defaultdict(ContextProfile)
+        self._counters = defaultdict(int)
+
+    def count(self, name, value=1):
+        """Increment named counter
+
+        :param name: name of counter
+        :param value: value to add to counter
+        """
+        self._counters[name] += value
 
     def decorate(self, func):
         """Profile decorated function
@@ -37,9 +46,17 @@ class ProfileManager:
 
         return wrapper
 
+    def get_counters(self):
+        """Create dictionary of counter name: value for each counter"""
+        return dict(self._counters)
+
     def get_stats(self):
         """Create dictionary of profile name: Stats object for each profile"""
         return {profile_name: Stats(profile) for profile_name, profile in self._profiles.items()}
 
+    def reset_counters(self):
+        """Reset all counters to zero"""
+        self._counters.clear()
+
 
 profiler = ProfileManager()
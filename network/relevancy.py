@@ -0,0 +1,114 @@
+from collections import defaultdict
+from math import ceil, floor
+
+__all__ = ['RelevancyGrid']
+
+
+class RelevancyGrid:
+    """Uniform grid spatial index for replication relevancy.
+
+    Tracks the positions of replicables, and returns those which are near to a viewpoint
+    """
+
+    def __init__(self, cell_size=25.0, view_distance=100.0):
+        """
+        :param cell_size: size of each (cubic) grid cell
+        :param view_distance: default distance from viewpoint within which replicables are relevant
+        """
+        self.cell_size = cell_size
+        self.view_distance = view_distance
+
+        self._cells = defaultdict(set)
+        self._replicable_cells = {}
+
+    def __contains__(self, replicable):
+        return replicable in self._replicable_cells
+
+    def __len__(self):
+        return len(self._replicable_cells)
+
+    def get_cell(self, position):
+        """Return index of cell containing position
+
+        :param position: (x, y, z) position
+        """
+        cell_size = self.cell_size
+        x, y, z = position
+        return floor(x / cell_size), floor(y / cell_size), floor(z / cell_size)
+
+    def update(self, replicable, position):
+        """Update the tracked position of a replicable
+
+        :param replicable: replicable instance
+        :param position: (x, y, z) position
+        """
+        cell = self.get_cell(position)
+        replicable_cells = self._replicable_cells
+
+        previous_cell = replicable_cells.get(replicable)
+        if previous_cell == cell:
+            return
+
+        cells = self._cells
+
+        if previous_cell is not None:
+            previous_members = cells[previous_cell]
+            previous_members.discard(replicable)
+
+            if not previous_members:
+                del cells[previous_cell]
+
+        cells[cell].add(replicable)
+        replicable_cells[replicable] = cell
+
+    def remove(self, replicable):
+        """Stop tracking the position of a replicable
+
+        :param replicable: replicable instance
+        """
+        cell = self._replicable_cells.pop(replicable, None)
+
+        if cell is None:
+            return
+
+        cells = self._cells
+        members = cells[cell]
+        members.discard(replicable)
+
+        if not members:
+            del cells[cell]
+
+    def query(self, position, view_distance=None):
+        """Return set of tracked replicables in cells within view distance of position
+
+        Replicables are included by cell, so every replicable within the view distance is included, as well as some
+        which lie beyond it (in cells which are only partly within range, up to their far corners)
+
+        :param position: (x, y, z) viewpoint
+        :param view_distance: distance from viewpoint (defaults to view_distance)
+        """
+        if view_distance is None:
+            view_distance = self.view_distance
+
+        cells = self._cells
+        cell_x, cell_y, cell_z = self.get_cell(position)
+        cell_range = ceil(view_distance / self.cell_size)
+
+        # Visit the smaller of the occupied cells and the cells in range
+        if len(cells) < (2 * cell_range + 1) ** 3:
+            return set().union(*[members for (x, y, z), members in cells.items()
+                                 if abs(x - cell_x) <= cell_range and abs(y - cell_y) <= cell_range
+                                 and abs(z - cell_z) <= cell_range])
+
+        relevant = set()
+        offsets = range(-cell_range, cell_range + 1)
+
+        for x in offsets:
+            for y in offsets:
+                for z in offsets:
+                    members = cells.get((cell_x + x, cell_y + y, cell_z + z))
+
+                    if members:
+                        relevant.update(members)
+
+        return relevant
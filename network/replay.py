@@ -0,0 +1,137 @@
+from .capture import CaptureDirection
+from .connection import Connection
+from .network import send_connections
+
+from time import perf_counter, sleep
+
+__all__ = ['CaptureReplay', 'ReplayMetrics']
+
+
+class ReplayMetrics:
+    """Throughput of a capture replay"""
+
+    def __init__(self):
+        self.received_datagrams = 0
+        self.received_bytes = 0
+        self.sent_datagrams = 0
+        self.sent_bytes = 0
+        self.updates = 0
+
+        # Time spent in Connection.receive and in sending to connections
+        self.receive_time = 0.0
+        self.send_time = 0.0
+        self.elapsed_time = 0.0
+
+    def __repr__(self):
+        return "<ReplayMetrics: {} datagrams received in {:.3f}s, {} sent in {:.3f}s, {} updates in {:.3f}s>"\
+            .format(self.received_datagrams, self.receive_time, self.sent_datagrams, self.send_time, self.updates,
+                    self.elapsed_time)
+
+
+class CaptureReplay:
+    """Replays datagrams received by a captured server into a headless server, which has no socket.
+
+    Captured time is divided into updates at the update rate. Each update delivers the datagrams captured before its
+    end to their connections, then sends to all connections, so that datagrams are always delivered in the same
+    updates whatever the replay speed. Replay is paced in wall time, as captures are timestamped. Sent datagrams are
+    counted and discarded.
+
+    The netmode and world of the server must be set up before replaying
+    """
+
+    def __init__(self, reader, speed=1.0, update_rate=1/60, executor=None):
+        """
+        :param reader: CaptureReader of captured log
+        :param speed: multiple of captured speed at which to replay, or None to replay as fast as possible
+        :param update_rate: interval between updates, in captured seconds
+        :param executor: thread pool executor with which the datagrams of connections are written (and compressed)
+        concurrently, or None to write them sequentially
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("Replay speed must be positive")
+
+        self.reader = reader
+        self.speed = speed
+        self.update_rate = update_rate
+        self.executor = executor
+
+        self.metrics = ReplayMetrics()
+
+    def receive(self, data, address):
+        """Dispatch captured datagram to the connection for its address
+
+        :param data: datagram data
+        :param address: address of remote peer
+        """
+        try:
+            connection = Connection[address]
+
+        # Create a new interface to handle connection
+        except KeyError:
+            connection = Connection(address)
+
+        connection.receive(data)
+
+    def send(self, full_update):
+        """Send to all connections and return sent datagrams
+
+        :param full_update: whether this is a full send call
+        """
+        return send_connections(list(Connection), full_update, self.executor)
+
+    def run(self, on_update=None):
+        """Replay captured log and return metrics
+
+        :param on_update: function called each update before sending, which returns whether this is a full update
+        """
+        reader = self.reader
+        metrics = self.metrics = ReplayMetrics()
+
+        records = [record for record in reader if record.direction == CaptureDirection.received]
+        if not records:
+            return metrics
+
+        speed = self.speed
+        update_rate = self.update_rate
+
+        captured_started = records[0].timestamp
+        started = perf_counter()
+
+        update_time = captured_started
+        index = 0
+
+        while index < len(records):
+            update_time += update_rate
+
+            receive_started = perf_counter()
+
+            while index < len(records):
+                record = records[index]
+                if record.timestamp >= update_time:
+                    break
+
+                self.receive(record.data, record.address)
+
+                metrics.received_datagrams += 1
+                metrics.received_bytes += len(record.data)
+                index += 1
+
+            send_started = perf_counter()
+            metrics.receive_time += send_started - receive_started
+
+            full_update = True if on_update is None else on_update()
+            datagrams = self.send(full_update)
+
+            metrics.send_time += perf_counter() - send_started
+            metrics.sent_datagrams += len(datagrams)
+            metrics.sent_bytes += sum(len(data) for data, _ in datagrams)
+            metrics.updates += 1
+
+            # Sleep until the replayed time of the next update
+            if speed is not None:
+                remaining_time = started + (update_time - captured_started) / speed - perf_counter()
+                if remaining_time > 0:
+                    sleep(remaining_time)
+
+        metrics.elapsed_time = perf_counter() - started
+        return metrics
@@ -4,6 +4,9 @@ __all__ = ['ReplicationRulesBase']
 class ReplicationRulesBase:
     """Base class for replication rules"""
 
+    # Optional RelevancyGrid, which determines the relevancy of the replicables it tracks
+    relevancy_grid = None
+
     def pre_initialise(self, addr, netmode):
         raise NotImplementedError
 
@@ -15,3 +18,28 @@ class ReplicationRulesBase:
 
     def is_relevant(self, conn, replicable):
         raise NotImplementedError
+
+    def get_viewpoint(self, conn):
+        """Return position from which a connection views the world, or None if it has no viewpoint
+
+        :param conn: connection replicable
+        """
+        return None
+
+    def get_relevant_replicables(self, conn):
+        """Return set of replicables relevant to a connection, from those tracked by the relevancy grid.
+
+        Returns None if there is no relevancy grid, or the connection has no viewpoint, in which case
+        :py:meth:`is_relevant` is used instead
+
+        :param conn: connection replicable
+        """
+        relevancy_grid = self.relevancy_grid
+        if relevancy_grid is None:
+            return None
+
+        viewpoint = self.get_viewpoint(conn)
+        if viewpoint is None:
+            return None
+
+        return relevancy_grid.query(viewpoint)
@@ -1,9 +1,16 @@
-"""Provides interfaces to serialise native types to bytes"""
+"""Provides interfaces to serialise native types to bytes.
 
-USE_NUMPY = False
+The NumPy backend is selected by setting USE_NUMPY, or the NETWORK_USE_NUMPY environment variable to 1. Both backends
+produce the same data
+"""
+from os import environ
+
+USE_NUMPY = environ.get("NETWORK_USE_NUMPY", "0") == "1"
 
 if USE_NUMPY:
     from .numpy_serialiser import *
+    from .numpy_serialiser import register_handlers as _register_handlers
+    _register_handlers()
 
 else:
-    from .serialiser import *
\ No newline at end of file
+    from .serialiser import *
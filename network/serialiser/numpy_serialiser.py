@@ -1,151 +1,151 @@
-from numpy import uint8, uint16, uint32, uint64, float32, float64, fromstring
-from math import ceil
+"""NumPy backed handlers, which pack multiple values and columns of values as arrays.
 
-from .handlers import register_handler
+Single values are packed by the struct handlers of the pure Python serialiser, so that both backends produce the same
+data. Handlers are registered by the serialiser package when USE_NUMPY is set
+"""
+from numpy import asarray, dtype, frombuffer, ndarray
 
-__all__ = ['NumpyStruct', 'UInt16', 'UInt32', 'UInt64', 'UInt8', 'Float32', 'Float64', 'bits_to_bytes',
-           'handler_from_bit_length', 'handler_from_int', 'handler_from_byte_length', 'StringHandler',
-           'BytesHandler', 'int_selector', 'next_or_equal_power_of_two', 'BoolHandler']
+from . import serialiser
+from .serialiser import *
+from ..handlers import register_handler
 
+__all__ = serialiser.__all__ + ['NumpyStruct']
 
-class NumpyStruct:
-
-    def __init__(self, numpy_obj, size):
-        self._numpy_obj = numpy_obj
-        self._size = size
-
-    def size(self, bytes_string=None):
-        return self._size
-
-    def unpack_from(self, bytes_string):
-        size = self._size
-        value = fromstring(bytes_string[:size], dtype=self._numpy_obj)[0]
-        return value, size
-
-    def pack(self, value):
-        obj = self._numpy_obj(value)
-        return obj.tostring()
-
-    def __str__(self):
-        return "<{} Byte Handler>"
-
-
-UInt8 = NumpyStruct(uint8, 1)
-UInt16 = NumpyStruct(uint16, 2)
-UInt32 = NumpyStruct(uint32, 4)
-UInt64 = NumpyStruct(uint64, 8)
-Float32 = NumpyStruct(float32, 4)
-Float64 = NumpyStruct(float64, 8)
 
+class NumpyStruct:
+    """Handler for fixed size numeric values, which packs multiple values with NumPy"""
 
-int_packers = [UInt8, UInt16, UInt32, UInt64]
-int_sized = {x.size(): x for x in int_packers}
-
+    def __init__(self, handler, type_code):
+        """
+        :param handler: struct handler of the pure Python serialiser
+        :param type_code: big-endian NumPy type code with the same format as the handler
+        """
+        self.handler = handler
+        self.dtype = dtype(type_code)
 
-def bits_to_bytes(bits):
-    return ceil(bits / 8)
+        if self.dtype.itemsize != handler.size():
+            raise ValueError("NumPy type {} does not match handler {}".format(type_code, handler.__name__))
 
+        # Single values and arrays are packed by the struct handler
+        self.pack = handler.pack
+        self.pack_into = handler.pack_into
+        self.unpack_from = handler.unpack_from
+        self.size = handler.size
+        self.struct_format = handler.struct_format
+        self.array_typecode = handler.array_typecode
 
-def next_or_equal_power_of_two(value):
-    """Return next power of 2 greater than or equal to value
+        if self.array_typecode is not None:
+            self.pack_array = handler.pack_array
+            self.unpack_array = handler.unpack_array
 
-    :param value: value to round
-    """
-    if value > 0:
-        value -= 1
-    else:
-        value = 1
-    shift = 1
-    while (value + 1) & value:
-        value |= value >> shift
-        shift *= 2
-    return value + 1
+    def pack_multiple(self, values, count):
+        # Converting sequences to arrays is slower than packing them with struct
+        if not isinstance(values, ndarray):
+            return self.handler.pack_multiple(values, count)
 
+        return asarray(values, dtype=self.dtype).tobytes()
 
-def float_selector(type_flag):
-    return Float64 if type_flag.data.get("max_precision") else Float32
-
-
-def handler_from_bit_length(total_bits):
-    total_bytes = bits_to_bytes(total_bits)
-    return handler_from_byte_length(total_bytes)
+    def unpack_multiple(self, bytes_string, count, offset=0):
+        if not count:
+            return [], 0
 
+        values = frombuffer(bytes_string, dtype=self.dtype, count=count, offset=offset)
+        return values.tolist(), values.nbytes
 
-def handler_from_byte_length(total_bytes):
-    """Find the smallest handler needed to pack a number of bytes
+    def pack_column(self, values):
+        """Pack array of values of any shape, in row-major order
 
-    :param total_bytes: number of bytes needed to pack
-    :rtype: :py:class:`network.serialiser.IDataHandler`"""
-    rounded_bytes = next_or_equal_power_of_two(total_bytes)
+        :param values: array-like of values, e.g. float32[N, 3] positions of N actors
+        """
+        return asarray(values, dtype=self.dtype).tobytes()
 
-    try:
-        return int_sized[rounded_bytes]
+    def unpack_column(self, bytes_string, shape, offset=0):
+        """Return read-only array view of packed values, and its packed size
 
-    except KeyError as err:
-        raise ValueError("Integer too large to pack: {} bytes".format(total_bytes)) from err
+        :param bytes_string: packed data
+        :param shape: shape of array (or number of values)
+        :param offset: offset of values in packed data
+        """
+        values = frombuffer(bytes_string, dtype=self.dtype, count=_shape_count(shape), offset=offset)
+        return values.reshape(shape), values.nbytes
 
-    return packer
+    def __repr__(self):
+        return "<NumpyStruct {}>".format(self.dtype)
 
 
-def handler_from_int(value):
-    return handler_from_bit_length(value.bit_length())
+def _shape_count(shape):
+    if isinstance(shape, int):
+        return shape
 
+    count = 1
+    for dimension in shape:
+        count *= dimension
 
-def int_selector(type_flag):
-    if "max_value" in type_flag.data:
-        return handler_from_int(type_flag.data["max_value"])
+    return count
 
-    return handler_from_bit_length(type_flag.data.get('max_bits', 8))
 
+UInt8 = NumpyStruct(serialiser.UInt8, ">u1")
+UInt16 = NumpyStruct(serialiser.UInt16, ">u2")
+UInt32 = NumpyStruct(serialiser.UInt32, ">u4")
+UInt64 = NumpyStruct(serialiser.UInt64, ">u8")
+Int8 = NumpyStruct(serialiser.Int8, ">i1")
+Int16 = NumpyStruct(serialiser.Int16, ">i2")
+Int32 = NumpyStruct(serialiser.Int32, ">i4")
+Int64 = NumpyStruct(serialiser.Int64, ">i8")
+Float32 = NumpyStruct(serialiser.Float32, ">f4")
+Float64 = NumpyStruct(serialiser.Float64, ">f8")
 
-class BoolHandler:
-    unpacker = UInt8.unpack_from
+# NumPy handlers, by struct handler
+numpy_handlers = {handler.handler: handler for handler in (UInt8, UInt16, UInt32, UInt64, Int8, Int16, Int32, Int64,
+                                                           Float32, Float64)}
 
-    @classmethod
-    def unpack_from(cls, bytes_string):
-        value, size = cls.unpacker(bytes_string)
-        return bool(value), size
 
-    size = UInt8.size
-    pack = UInt8.pack
+def handler_from_bit_length(total_bits):
+    """Return the correct integer handler for a given number of bits
 
+    :param total_bits: total number of bits required
+    """
+    handler = serialiser.handler_from_bit_length(total_bits)
+    return numpy_handlers.get(handler, handler)
 
-class BytesHandler:
 
-    def __init__(self, type_flag):
-        header_max_value = type_flag.data.get("max_length", 255)
-        self.packer = handler_from_int(header_max_value)
+def handler_from_byte_length(total_bytes):
+    """Return the smallest handler needed to pack a number of bytes
 
-    def pack(self, bytes_string):
-        return self.packer.pack(len(bytes_string)) + bytes_string
+    :param total_bytes: number of bytes needed to pack
+    """
+    handler = serialiser.handler_from_byte_length(total_bytes)
+    return numpy_handlers.get(handler, handler)
 
-    def size(self, bytes_string):
-        length, length_size = self.packer.unpack_from(bytes_string)
-        return length + length_size
 
-    def unpack_from(self, bytes_string):
-        length, length_size = self.packer.unpack_from(bytes_string)
+def handler_from_int(value):
+    """Return the smallest integer packer capable of packing a given integer
 
-        end_index = length + length_size
-        value = bytes_string[length_size: end_index]
+    :param value: integer value
+    """
+    handler = serialiser.handler_from_int(value)
+    return numpy_handlers.get(handler, handler)
 
-        return value, end_index
 
+def int_selector(type_flag):
+    """Return the correct integer handler using meta information from a given type_flag
 
-class StringHandler(BytesHandler):
+    :param type_flag: type flag for integer value
+    """
+    handler = serialiser.int_selector(type_flag)
+    return numpy_handlers.get(handler, handler)
 
-    def pack(self, str_):
-        return super().pack(str_.encode())
 
-    def unpack_from(self, bytes_string):
-        encoded_string, size = super().unpack_from(bytes_string)
+def float_selector(type_flag):
+    """Return the correct float handler using meta information from a given type_flag
 
-        return encoded_string.decode(), size
+    :param type_flag: type flag for float value
+    """
+    handler = serialiser.float_selector(type_flag)
+    return numpy_handlers.get(handler, handler)
 
 
-# Register handlers for native types
-register_handler(bool, BoolHandler)
-register_handler(str, StringHandler, is_callable=True)
-register_handler(bytes, BytesHandler, is_callable=True)
-register_handler(int, int_selector, is_callable=True)
-register_handler(float, float_selector, is_callable=True)
+def register_handlers():
+    """Register NumPy handlers for native numeric types, in place of the pure Python handlers"""
+    register_handler(int, int_selector, is_callable=True)
+    register_handler(float, float_selector, is_callable=True)
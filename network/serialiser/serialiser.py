@@ -1,11 +1,33 @@
+from array import array
 from math import ceil
 from struct import Struct, pack, unpack_from
+from sys import byteorder
 
 from ..handlers import register_handler
 
-__all__ = ['UInt16', 'UInt32', 'UInt64', 'UInt8', 'Float32', 'Float64', 'bits_to_bytes', 'handler_from_bit_length',
+__all__ = ['UInt16', 'UInt32', 'UInt64', 'UInt8', 'UInt128', 'Float32', 'Float64', 'bits_to_bytes', 'handler_from_bit_length',
            'handler_from_int', 'handler_from_byte_length', 'string_handler_builder', 'build_bytes_handler',
-           'int_selector', 'next_or_equal_power_of_two', 'BoolHandler', 'Int8', 'Int16', 'Int32', 'Int64']
+           'int_selector', 'next_or_equal_power_of_two', 'BoolHandler', 'Int8', 'Int16', 'Int32', 'Int64',
+           'QuantisedFloat', 'get_quantised_float', 'VarUInt', 'VarInt', 'get_array_typecode']
+
+
+# Packed data is big-endian, so arrays must be byte swapped on little-endian hosts
+SWAP_ARRAY_BYTES = byteorder == "little"
+
+
+def get_array_typecode(character_format, size):
+    """Return array typecode with the same item size as a struct format character, or None if there is none
+
+    :param character_format: struct format character
+    :param size: size of struct format
+    """
+    try:
+        item_size = array(character_format).itemsize
+
+    except ValueError:
+        return None
+
+    return character_format if item_size == size else None
 
 
 def build_function(function_string, locals_dict):
@@ -40,13 +62,14 @@ def build_struct_handler(name, character_format, order_format="!"):
     struct_obj = Struct(order_format + character_format)
     format_size = struct_obj.size
 
+    # Multiple values are packed with a single repeated format
     methods = ("""def unpack_from(bytes_string, offset=0, unpacker=struct_obj.unpack_from):\n\t
                return unpacker(bytes_string, offset)[0], {format_size}""",
                """def size(bytes_string=None):\n\treturn {format_size}""",
-               """def pack_multiple(value, count, pack=pack, character_format=character_format):\n\t"""
-               """return pack('{order_format}' + '{character_format}' * count, *value)""",
+               """def pack_multiple(value, count, pack=pack):\n\t"""
+               """return pack('{order_format}%d{character_format}' % count, *value)""",
                """def unpack_multiple(bytes_string, count, offset=0, unpack_from=unpack_from):\n\t"""
-               """data = unpack_from('{order_format}' + '{character_format}' * count, bytes_string, offset)\n\t"""
+               """data = unpack_from('{order_format}%d{character_format}' % count, bytes_string, offset)\n\t"""
                """return data, {format_size} * count""",
                """pack=struct_obj.pack""")
 
@@ -57,6 +80,71 @@ def build_struct_handler(name, character_format, order_format="!"):
 
         cls_dict[func.__name__] = func
 
+    # Allow consumers to merge formats of successive handlers
+    cls_dict['struct_format'] = order_format + character_format
+
+    def pack_into(buffer, offset, value, pack_into=struct_obj.pack_into):
+        """Pack value into bytearray at offset, extending it if required, and return packed size
+
+        :param buffer: bytearray to pack into
+        :param offset: offset at which to pack value
+        :param value: value to pack
+        """
+        end = offset + format_size
+
+        if len(buffer) < end:
+            buffer.extend(bytes(end - len(buffer)))
+
+        pack_into(buffer, offset, value)
+        return format_size
+
+    cls_dict['pack_into'] = staticmethod(pack_into)
+
+    # Numeric formats can be packed from, and unpacked into, arrays without per-element conversion
+    typecode = cls_dict['array_typecode'] = get_array_typecode(character_format, format_size)
+
+    if typecode is not None:
+        swap_bytes = SWAP_ARRAY_BYTES and order_format in "!>"
+
+        def pack_array(values):
+            """Pack array (or sequence) of values
+
+            :param values: array of values
+            """
+            if isinstance(values, array) and values.typecode == typecode:
+                if not swap_bytes:
+                    return values.tobytes()
+
+                # Copy the buffer rather than converting each element
+                values = values[:]
+
+            else:
+                values = array(typecode, values)
+
+            if swap_bytes:
+                values.byteswap()
+
+            return values.tobytes()
+
+        def unpack_array(bytes_string, count, offset=0):
+            """Unpack values into new array
+
+            :param bytes_string: packed data
+            :param count: number of values
+            :param offset: offset of values in packed data
+            """
+            size = format_size * count
+            values = array(typecode)
+            values.frombytes(memoryview(bytes_string)[offset: offset + size])
+
+            if swap_bytes:
+                values.byteswap()
+
+            return values, size
+
+        cls_dict['pack_array'] = staticmethod(pack_array)
+        cls_dict['unpack_array'] = staticmethod(unpack_array)
+
     return type(name, (), cls_dict)
 
 
@@ -72,7 +160,34 @@ Float32 = build_struct_handler("Float32", "f")
 Float64 = build_struct_handler("Float64", "d")
 
 
-int_handlers = [UInt8, UInt16, UInt32, UInt64]
+class UInt128:
+    """Handler for 128 bit unsigned integers, which are too large for struct formats"""
+
+    struct_format = None
+
+    @staticmethod
+    def pack(value):
+        return value.to_bytes(16, 'big')
+
+    @staticmethod
+    def pack_multiple(value, count):
+        return b''.join([x.to_bytes(16, 'big') for x in value])
+
+    @staticmethod
+    def unpack_from(bytes_string, offset=0):
+        return int.from_bytes(bytes_string[offset: offset + 16], 'big'), 16
+
+    @staticmethod
+    def unpack_multiple(bytes_string, count, offset=0):
+        return [int.from_bytes(bytes_string[i: i + 16], 'big') for i in range(offset, offset + count * 16, 16)], \
+            count * 16
+
+    @staticmethod
+    def size(bytes_string=None):
+        return 16
+
+
+int_handlers = [UInt8, UInt16, UInt32, UInt64, UInt128]
 size_to_int_handler = {packer.size(): packer for packer in int_handlers}
 
 
@@ -101,12 +216,133 @@ def next_or_equal_power_of_two(value):
     return value + 1
 
 
+class QuantisedFloat:
+    """Handler for float values quantised to a precision within a range.
+
+    Values are clamped to the range, and packed into the fewest whole bytes. Multiple values are bit-packed together
+    """
+
+    # Unpacked values are converted, so cannot be merged with other formats
+    struct_format = None
+
+    def __init__(self, minimum, maximum, precision):
+        """
+        :param minimum: minimum value
+        :param maximum: maximum value
+        :param precision: maximum difference between quantised values
+        """
+        if not maximum > minimum:
+            raise ValueError("Quantised float range is empty: {} to {}".format(minimum, maximum))
+
+        if not precision > 0:
+            raise ValueError("Quantised float precision must be positive: {}".format(precision))
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.precision = precision
+
+        self.max_step = ceil((maximum - minimum) / precision)
+        self.bits = self.max_step.bit_length()
+        self.byte_length = bits_to_bytes(self.bits)
+
+    def quantise(self, value):
+        """Return integer step of value within range
+
+        :param value: float value
+        """
+        step = round((value - self.minimum) / self.precision)
+
+        if step < 0:
+            return 0
+
+        max_step = self.max_step
+        return max_step if step > max_step else step
+
+    def dequantise(self, step):
+        """Return float value of integer step within range
+
+        :param step: quantised step
+        """
+        value = self.minimum + step * self.precision
+        return self.maximum if value > self.maximum else value
+
+    def pack(self, value):
+        return self.quantise(value).to_bytes(self.byte_length, 'big')
+
+    def pack_multiple(self, values, count):
+        bits = self.bits
+        quantise = self.quantise
+
+        packed = 0
+        for value in values:
+            packed = (packed << bits) | quantise(value)
+
+        return packed.to_bytes(bits_to_bytes(bits * count), 'big')
+
+    def unpack_from(self, bytes_string, offset=0):
+        byte_length = self.byte_length
+        step = int.from_bytes(bytes_string[offset: offset + byte_length], 'big')
+        return self.dequantise(step), byte_length
+
+    def unpack_multiple(self, bytes_string, count, offset=0):
+        bits = self.bits
+        dequantise = self.dequantise
+        size = bits_to_bytes(bits * count)
+
+        packed = int.from_bytes(bytes_string[offset: offset + size], 'big')
+        mask = (1 << bits) - 1
+
+        values = [dequantise((packed >> (bits * index)) & mask) for index in reversed(range(count))]
+        return values, size
+
+    def size(self, bytes_string=None):
+        return self.byte_length
+
+    def write_bits(self, writer, value):
+        writer.write(self.quantise(value), self.bits)
+
+    def read_bits(self, reader):
+        return self.dequantise(reader.read(self.bits))
+
+
+# Quantised float handlers, by range and precision
+_quantised_floats = {}
+
+
+def get_quantised_float(minimum, maximum, precision):
+    """Return quantised float handler for a range and precision
+
+    :param minimum: minimum value
+    :param maximum: maximum value
+    :param precision: maximum difference between quantised values
+    """
+    key = minimum, maximum, precision
+
+    try:
+        return _quantised_floats[key]
+
+    except KeyError:
+        handler = _quantised_floats[key] = QuantisedFloat(minimum, maximum, precision)
+        return handler
+
+
 def float_selector(type_flag):
     """Return the correct float handler using meta information from a given type_flag
 
+    Floats with a precision are quantised within the range given by min and max
+
     :param type_flag: type flag for float value
     """
-    return Float64 if type_flag.data.get("max_precision") else Float32
+    data = type_flag.data
+
+    if "precision" in data:
+        try:
+            return get_quantised_float(data["min"], data["max"], data["precision"])
+
+        except KeyError as err:
+            raise ValueError("Quantised floats require a min and max value") from err
+
+    return Float64 if data.get("max_precision") else Float32
 
 
 def handler_from_bit_length(total_bits):
@@ -143,11 +379,212 @@ def handler_from_int(value):
     return handler_from_bit_length(value.bit_length())
 
 
+class VarUInt:
+    """Handler for unsigned integers of any size, packed as LEB128 variable length integers.
+
+    Each byte holds seven bits of the value, least significant first, with the high bit set if more bytes follow.
+    Values below 128 are packed in a single byte
+    """
+
+    # Variable length values cannot be merged with other formats
+    struct_format = None
+
+    @staticmethod
+    def pack(value):
+        if 0 <= value < 0x80:
+            return bytes((value,))
+
+        if value < 0:
+            raise ValueError("Cannot pack negative value as unsigned varint: {}".format(value))
+
+        data = bytearray()
+        append = data.append
+
+        while value >= 0x80:
+            append((value & 0x7f) | 0x80)
+            value >>= 7
+
+        append(value)
+        return bytes(data)
+
+    @classmethod
+    def pack_into(cls, buffer, offset, value):
+        if 0 <= value < 0x80 and offset < len(buffer):
+            buffer[offset] = value
+            return 1
+
+        data = cls.pack(value)
+        buffer[offset: offset + len(data)] = data
+        return len(data)
+
+    @staticmethod
+    def pack_multiple(values, count):
+        data = bytearray()
+        append = data.append
+
+        for value in values:
+            if value < 0:
+                raise ValueError("Cannot pack negative value as unsigned varint: {}".format(value))
+
+            while value >= 0x80:
+                append((value & 0x7f) | 0x80)
+                value >>= 7
+
+            append(value)
+
+        return bytes(data)
+
+    @staticmethod
+    def unpack_from(bytes_string, offset=0):
+        byte = bytes_string[offset]
+
+        if byte < 0x80:
+            return byte, 1
+
+        value = byte & 0x7f
+        shift = 7
+        index = offset + 1
+
+        while True:
+            byte = bytes_string[index]
+            index += 1
+
+            value |= (byte & 0x7f) << shift
+
+            if byte < 0x80:
+                return value, index - offset
+
+            shift += 7
+
+    @staticmethod
+    def unpack_multiple(bytes_string, count, offset=0):
+        values = []
+        append = values.append
+        index = offset
+
+        for _ in range(count):
+            value = shift = 0
+
+            while True:
+                byte = bytes_string[index]
+                index += 1
+
+                value |= (byte & 0x7f) << shift
+
+                if byte < 0x80:
+                    break
+
+                shift += 7
+
+            append(value)
+
+        return values, index - offset
+
+    @staticmethod
+    def size(bytes_string):
+        index = 0
+
+        while bytes_string[index] & 0x80:
+            index += 1
+
+        return index + 1
+
+    @staticmethod
+    def write_bits(writer, value):
+        if value < 0:
+            raise ValueError("Cannot pack negative value as unsigned varint: {}".format(value))
+
+        while value >= 0x80:
+            writer.write((value & 0x7f) | 0x80, 8)
+            value >>= 7
+
+        writer.write(value, 8)
+
+    @staticmethod
+    def read_bits(reader):
+        value = shift = 0
+
+        while True:
+            byte = reader.read(8)
+            value |= (byte & 0x7f) << shift
+
+            if byte < 0x80:
+                return value
+
+            shift += 7
+
+
+class VarInt:
+    """Handler for signed integers of any size, ZigZag encoded as LEB128 variable length integers.
+
+    Values between -64 and 63 are packed in a single byte
+    """
+
+    # Variable length values cannot be merged with other formats
+    struct_format = None
+
+    @staticmethod
+    def encode(value):
+        """Return ZigZag encoding of value, mapping signed integers to unsigned integers"""
+        return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+    @staticmethod
+    def decode(value):
+        """Return signed integer of ZigZag encoded value"""
+        return (value >> 1) ^ -(value & 1)
+
+    @classmethod
+    def pack(cls, value):
+        return VarUInt.pack(cls.encode(value))
+
+    @classmethod
+    def pack_into(cls, buffer, offset, value):
+        return VarUInt.pack_into(buffer, offset, cls.encode(value))
+
+    @classmethod
+    def pack_multiple(cls, values, count):
+        encode = cls.encode
+        return VarUInt.pack_multiple([encode(value) for value in values], count)
+
+    @classmethod
+    def unpack_from(cls, bytes_string, offset=0):
+        value, size = VarUInt.unpack_from(bytes_string, offset)
+        return cls.decode(value), size
+
+    @classmethod
+    def unpack_multiple(cls, bytes_string, count, offset=0):
+        values, size = VarUInt.unpack_multiple(bytes_string, count, offset)
+        decode = cls.decode
+        return [decode(value) for value in values], size
+
+    @staticmethod
+    def size(bytes_string):
+        return VarUInt.size(bytes_string)
+
+    @classmethod
+    def write_bits(cls, writer, value):
+        VarUInt.write_bits(writer, cls.encode(value))
+
+    @classmethod
+    def read_bits(cls, reader):
+        return cls.decode(VarUInt.read_bits(reader))
+
+
 def int_selector(type_flag):
     """Return the correct integer handler using meta information from a given type_flag
 
+    Integers with encoding="varint" are packed as variable length integers (ZigZag encoded if signed=True)
+
     :param type_flag: type flag for integer value
     """
+    encoding = type_flag.data.get("encoding")
+
+    if encoding == "varint":
+        return VarInt if type_flag.data.get("signed") else VarUInt
+
+    if encoding is not None:
+        raise ValueError("Unknown integer encoding: {}".format(encoding))
+
     if "max_value" in type_flag.data:
         return handler_from_int(type_flag.data["max_value"])
 
@@ -157,6 +594,10 @@ def int_selector(type_flag):
 class BoolHandler(UInt8):
     """Handler for boolean type"""
 
+    # Unpacked values are converted, so cannot be merged with other formats
+    struct_format = None
+    array_typecode = None
+
     @classmethod
     def unpack_from(cls, bytes_string, offset=0, unpack_from=UInt8.unpack_from):
         value, size = unpack_from(bytes_string, offset)
@@ -164,22 +605,35 @@ class BoolHandler(UInt8):
 
     @classmethod
     def unpack_multiple(cls, bytes_string, count, offset=0, unpack_multiple=UInt8.unpack_multiple):
-        value, size = cls.unpack_multiple(bytes_string, count, offset)
+        value, size = unpack_multiple(bytes_string, count, offset)
         return [bool(x) for x in value], size
 
 
+# Built handlers, by maximum length
+_bytes_handlers = {}
+_string_handlers = {}
+
+
 def build_bytes_handler(type_flag):
     """Builds an optimised handler for a bytes type
 
     :param type_flag: type flag for bytes value
     """
     header_max_value = type_flag.data.get("max_length", 255)
+
+    # Handlers only differ by their length header, so are built once for each
+    try:
+        return _bytes_handlers[header_max_value]
+
+    except KeyError:
+        pass
+
     packer = handler_from_int(header_max_value)
 
     methods = ("""def unpack_from(bytes_string, offset=0, *, unpacker=packer.unpack_from):\n\t"""
                """length, length_size = unpacker(bytes_string, offset)\n\t"""
                """end_index = length + length_size\n\t"""
-               """value = bytes_string[length_size + offset: end_index + offset]\n\t"""
+               """value = bytes(bytes_string[length_size + offset: end_index + offset])\n\t"""
                """return value, end_index""",
                """def pack_multiple(value, count, pack_lengths=packer.pack_multiple):\n\t"""
                """lengths = [len(x) for x in value]\n\tpacked_lengths = pack_lengths(lengths, len(lengths))\n\t"""
@@ -187,7 +641,7 @@ def build_bytes_handler(type_flag):
                """def unpack_multiple(bytes_string, count, offset=0, unpack_lengths=packer.unpack_multiple, """
                """unpack_from=unpack_from):\n\t_offset=offset\n\tlengths, length_offset=unpack_lengths(bytes_string, """
                """count, offset)\n\toffset += length_offset\n\tdata = []\n\tfor length in lengths:\n\t\t"""
-               """data.append(bytes_string[offset: offset+length])\n\t\toffset += length\n\t"""
+               """data.append(bytes(bytes_string[offset: offset+length]))\n\t\toffset += length\n\t"""
                """return data, offset - _offset""",
                """def size(bytes_string, unpacker=packer.unpack_from):\n\t"""
                """length, length_size = unpacker(bytes_string)\n\treturn length + length_size""",
@@ -201,7 +655,8 @@ def build_bytes_handler(type_flag):
         wrapped_string = register_string.format(method_string)
         exec(wrapped_string)
 
-    return type("BytesHandler", (), cls_dict)
+    handler = _bytes_handlers[header_max_value] = type("BytesHandler", (), cls_dict)
+    return handler
 
 
 def string_handler_builder(type_flag):
@@ -210,13 +665,20 @@ def string_handler_builder(type_flag):
     :param type_flag: type flag for string value
     """
     header_max_value = type_flag.data.get("max_length", 255)
+
+    try:
+        return _string_handlers[header_max_value]
+
+    except KeyError:
+        pass
+
     packer = handler_from_int(header_max_value)
 
     methods = ("""def unpack_from(bytes_string, offset=0, *, unpacker=packer.unpack_from):
                 length, length_size = unpacker(bytes_string, offset)\n\t
                 end_index = length + length_size\n\t
                 value = bytes_string[length_size + offset: end_index + offset]\n\t
-                return value.decode(), end_index""",
+                return str(value, 'utf-8'), end_index""",
                """def pack(string_, packer=packer.pack):\n\treturn packer(len(string_)) + string_.encode()""",
                """def pack_multiple(value, count, pack_lengths=packer.pack_multiple):\n\t"""
                """lengths = [len(x) for x in value]\n\tpacked_lengths = pack_lengths(lengths, len(lengths))\n\t"""
@@ -224,7 +686,8 @@ def string_handler_builder(type_flag):
                """def unpack_multiple(bytes_string, count, offset=0, unpack_lengths=packer.unpack_multiple, """
                """unpack_from=unpack_from):\n\t_offset=offset\n\tlengths, length_offset=unpack_lengths(bytes_string, count, offset)\n\t"""
                """offset += length_offset\n\tdata = []\n\tfor length in lengths:\n\t\t"""
-               """data.append(bytes_string[offset: offset+length].decode())\n\t\toffset += length\n\treturn data, offset - _offset""",)
+               """data.append(str(bytes_string[offset: offset+length], 'utf-8'))\n\t\toffset += length\n\t"""
+               """return data, offset - _offset""",)
 
     register_string = """local_dict = dict();local_dict=locals().copy()\n{}\nfunc_name = next(iter(set(locals())
                          .difference(local_dict)));cls_dict[func_name] = locals()[func_name]"""
@@ -235,7 +698,8 @@ def string_handler_builder(type_flag):
         exec(wrapped_string)
 
     bytes_cls = build_bytes_handler(type_flag)
-    return type("StringHandler", (bytes_cls,), cls_dict)
+    handler = _string_handlers[header_max_value] = type("StringHandler", (bytes_cls,), cls_dict)
+    return handler
 
 
 # Register handlers for native types
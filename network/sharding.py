@@ -0,0 +1,699 @@
+"""Sharded server, which partitions connections across worker processes.
+
+A front process owns the UDP socket, and routes received datagrams by address to worker processes through shared
+memory rings. Each worker runs the connection and replication stack for its own connections. The state of the
+front's authoritative replicables is published to all workers as a snapshot each tick, and the datagrams which the
+workers send are collected from their rings by the front.
+
+Replicables created by the front and by the workers are given instance ids from disjoint ranges, so that replicas of
+the front's replicables do not conflict with those created by a worker (such as by the rules on connect).
+
+Worker processes are spawned, so the setup function given to :py:class:`ShardedNetwork` must be importable. It is
+called in each worker to set the netmode, rules and import the replicable classes of the game
+"""
+from .connection import Connection
+from .enums import Roles
+from .flag_serialiser import FlagSerialiser
+from .handlers import get_handler
+from .network import Network, send_connections
+from .replicable import Replicable
+from .type_flag import TypeFlag
+
+from mmap import mmap
+from multiprocessing import get_context
+from os import close as close_file, ftruncate, open as open_file, path, unlink, O_RDWR
+from struct import Struct as PackStruct
+from tempfile import mkstemp
+
+__all__ = ['SharedMemoryRing', 'WorldSnapshotCodec', 'WorldSnapshotWriter', 'WorldSnapshotReader', 'ShardWorker',
+           'ShardProcess', 'ShardedNetwork', 'run_shard_worker', 'pack_address', 'unpack_address',
+           'get_front_id_range', 'get_worker_id_range']
+
+
+class SharedMemoryRing:
+    """Ring buffer of byte records in shared memory, for a single producer and a single consumer.
+
+    The ring is a memory mapped file, in memory backed storage where available. Records are written before the write
+    position is published, so the consumer never reads a partial record
+    """
+
+    # Directory of created rings, if it exists
+    memory_directory = "/dev/shm"
+
+    # Capacity, write position, read position
+    header_struct = PackStruct("!QQQ")
+    position_struct = PackStruct("!Q")
+    write_position_offset = 8
+    read_position_offset = 16
+
+    length_struct = PackStruct("!I")
+
+    # Length of record which marks unused space before the end of the buffer
+    wrap_marker = 0xFFFFFFFF
+
+    def __init__(self, name=None, capacity=2 ** 20):
+        """
+        :param name: name of existing ring to attach to, or None to create a ring
+        :param capacity: capacity of created ring, in bytes
+        """
+        header_size = self.header_struct.size
+
+        if name is None:
+            capacity = (capacity + 3) & ~3
+
+            directory = self.memory_directory if path.isdir(self.memory_directory) else None
+            file_descriptor, name = mkstemp(prefix="network-ring-", dir=directory)
+            ftruncate(file_descriptor, header_size + capacity)
+
+            self.memory = mmap(file_descriptor, header_size + capacity)
+            self.header_struct.pack_into(self.memory, 0, capacity, 0, 0)
+            self.is_owner = True
+
+        else:
+            file_descriptor = open_file(name, O_RDWR)
+
+            self.memory = mmap(file_descriptor, 0)
+            capacity, _, _ = self.header_struct.unpack_from(self.memory)
+            self.is_owner = False
+
+        self.name = name
+        self.capacity = capacity
+
+        self._file_descriptor = file_descriptor
+        self._memory_view = memoryview(self.memory)
+        self.buffer = self._memory_view[header_size: header_size + capacity]
+
+    def __len__(self):
+        """Number of bytes which are written and not yet read"""
+        _, write_position, read_position = self.header_struct.unpack_from(self.memory)
+        return write_position - read_position
+
+    def push(self, data):
+        """Write record, returning False if there is not enough free space
+
+        :param data: bytes-like record
+        """
+        capacity = self.capacity
+        size = len(data)
+        record_size = (self.length_struct.size + size + 3) & ~3
+
+        _, write_position, read_position = self.header_struct.unpack_from(self.memory)
+
+        offset = write_position % capacity
+        remaining_size = capacity - offset
+
+        # Records are contiguous, so skip the remaining space if the record does not fit
+        skipped_size = remaining_size if record_size > remaining_size else 0
+
+        if write_position + skipped_size + record_size - read_position > capacity:
+            return False
+
+        buffer = self.buffer
+
+        if skipped_size:
+            self.length_struct.pack_into(buffer, offset, self.wrap_marker)
+            write_position += skipped_size
+            offset = 0
+
+        self.length_struct.pack_into(buffer, offset, size)
+        start = offset + self.length_struct.size
+        buffer[start: start + size] = data
+
+        # Publish the record, only the producer writes the write position
+        self.position_struct.pack_into(self.memory, self.write_position_offset, write_position + record_size)
+        return True
+
+    def pop(self):
+        """Read the oldest record, or None if there are no records"""
+        memory = self.memory
+        capacity, write_position, read_position = self.header_struct.unpack_from(memory)
+
+        if read_position == write_position:
+            return None
+
+        buffer = self.buffer
+        offset = read_position % capacity
+        size, = self.length_struct.unpack_from(buffer, offset)
+
+        if size == self.wrap_marker:
+            read_position += capacity - offset
+            offset = 0
+            size, = self.length_struct.unpack_from(buffer, offset)
+
+        start = offset + self.length_struct.size
+        data = bytes(buffer[start: start + size])
+
+        # Only the consumer writes the read position
+        read_position += (self.length_struct.size + size + 3) & ~3
+        self.position_struct.pack_into(memory, self.read_position_offset, read_position)
+
+        return data
+
+    def pop_all(self):
+        """Read all records"""
+        records = []
+        pop = self.pop
+
+        record = pop()
+        while record is not None:
+            records.append(record)
+            record = pop()
+
+        return records
+
+    def close(self):
+        """Detach from ring, destroying it if this ring created it"""
+        self.buffer.release()
+        self._memory_view.release()
+        self.memory.close()
+
+        close_file(self._file_descriptor)
+
+        if self.is_owner:
+            unlink(self.name)
+
+
+class WorldSnapshotCodec:
+    """Base class for snapshots of the attributes of authoritative replicables.
+
+    Snapshot format: full snapshot flag, removed instance ids, then for each changed replicable its instance id,
+    type name and packed changed attributes.
+    A full snapshot contains every replicable, and removes those which it does not contain
+    """
+
+    def __init__(self):
+        self.bool_packer = get_handler(TypeFlag(bool))
+        self.count_packer = get_handler(TypeFlag(int, encoding="varint"))
+        self.string_packer = get_handler(TypeFlag(str))
+        self.replicable_packer = get_handler(TypeFlag(Replicable))
+
+        self._serialisers = {}
+
+    def get_serialiser(self, replicable_cls, attribute_storage):
+        """Return serialiser for attributes of a replicable class
+
+        :param replicable_cls: Replicable subclass
+        :param attribute_storage: attribute storage container of an instance of the class
+        """
+        try:
+            return self._serialisers[replicable_cls]
+
+        except KeyError:
+            serialiser = self._serialisers[replicable_cls] = FlagSerialiser(attribute_storage._ordered_mapping)
+            return serialiser
+
+
+class WorldSnapshotWriter(WorldSnapshotCodec):
+    """Writes snapshots of the attributes of authoritative replicables which changed since the previous snapshot"""
+
+    def __init__(self):
+        super().__init__()
+
+        # Versions of attributes written to the last snapshot, by replicable
+        self.sent_versions = {}
+
+    @staticmethod
+    def get_authoritative_replicables():
+        """Return list of replicables which are authoritative in this process"""
+        authority = Roles.authority
+        return [replicable for replicable in Replicable if replicable.roles.local == authority]
+
+    def write(self, replicables, full=False):
+        """Return snapshot of replicables.
+
+        Snapshots which are not full contain the values changed since the previous (not full) snapshot
+
+        :param replicables: authoritative replicables
+        :param full: if all values of all replicables are written
+        """
+        sent_versions = self.sent_versions
+        pack_count = self.count_packer.pack
+        pack_id = self.replicable_packer.pack_id
+        pack_string = self.string_packer.pack
+
+        entries = []
+
+        for replicable in replicables:
+            attribute_storage = replicable._attribute_container
+            versions = attribute_storage.get_versions()
+            contextual_attributes = attribute_storage.contextual_attributes
+
+            try:
+                last_versions = sent_versions[replicable]
+
+            except KeyError:
+                last_versions = None
+
+            if full or last_versions is None:
+                changed_attributes = attribute_storage.data
+
+            # Contextual attributes are not versioned, so are always written
+            else:
+                changed_attributes = [attribute for attribute, version in versions.items()
+                                      if attribute in contextual_attributes or version != last_versions[attribute]]
+
+                if len(changed_attributes) == len(contextual_attributes):
+                    changed_attributes = ()
+
+            if not full:
+                sent_versions[replicable] = versions.copy()
+
+            if not changed_attributes:
+                continue
+
+            data = attribute_storage.data
+            serialiser = self.get_serialiser(replicable.__class__, attribute_storage)
+            packed_attributes = serialiser.pack({attribute.name: data[attribute] for attribute in changed_attributes})
+
+            entries.append(pack_id(replicable.instance_id) + pack_string(replicable.__class__.type_name) +
+                           pack_count(len(packed_attributes)) + packed_attributes)
+
+        if full:
+            removed_ids = []
+
+        else:
+            current_replicables = set(replicables)
+            removed_replicables = [r for r in sent_versions if r not in current_replicables]
+
+            for replicable in removed_replicables:
+                del sent_versions[replicable]
+
+            removed_ids = [replicable.instance_id for replicable in removed_replicables]
+
+        return b''.join([self.bool_packer.pack(full), pack_count(len(removed_ids))] +
+                        [pack_id(instance_id) for instance_id in removed_ids] +
+                        [pack_count(len(entries))] + entries)
+
+
+class WorldSnapshotReader(WorldSnapshotCodec):
+    """Applies snapshots to replicas of authoritative replicables"""
+
+    def __init__(self):
+        super().__init__()
+
+        # Replicas, by instance id
+        self.replicables = {}
+
+    def remove(self, instance_id):
+        """Remove replica
+
+        :param instance_id: instance id of replica
+        """
+        replicable = self.replicables.pop(instance_id, None)
+
+        if replicable is not None and replicable.registered:
+            replicable.deregister()
+
+    def get_replica(self, instance_id, type_name):
+        """Return replica for instance id, creating it if it does not exist
+
+        :param instance_id: instance id of authoritative replicable
+        :param type_name: type name of authoritative replicable
+        """
+        replicable = self.replicables.get(instance_id)
+
+        # Static replicables (such as WorldInfo) are created by every process
+        if replicable is None and instance_id in Replicable:
+            replicable = Replicable[instance_id]
+
+            # Replicables created by this process must not be re-assigned an id
+            if not replicable.is_static:
+                raise ValueError("Instance id {} of snapshot is in use by {}".format(instance_id, replicable))
+
+            self.replicables[instance_id] = replicable
+
+        if replicable is not None and replicable.registered and replicable.__class__.type_name == type_name:
+            return replicable
+
+        if replicable is not None:
+            self.remove(instance_id)
+
+        replicable_cls = Replicable.from_type_name(type_name)
+        replicable = self.replicables[instance_id] = replicable_cls(instance_id=instance_id, static=False)
+
+        return replicable
+
+    def read(self, bytes_string, offset=0):
+        """Apply snapshot to replicas
+
+        :param bytes_string: snapshot data
+        :param offset: offset of snapshot in data
+        """
+        unpack_count = self.count_packer.unpack_from
+        unpack_id = self.replicable_packer.unpack_id
+        unpack_string = self.string_packer.unpack_from
+
+        is_full, size = self.bool_packer.unpack_from(bytes_string, offset)
+        offset += size
+
+        removed_count, size = unpack_count(bytes_string, offset)
+        offset += size
+
+        for _ in range(removed_count):
+            instance_id, size = unpack_id(bytes_string, offset)
+            offset += size
+
+            self.remove(instance_id)
+
+        entry_count, size = unpack_count(bytes_string, offset)
+        offset += size
+
+        entries = []
+
+        for _ in range(entry_count):
+            instance_id, size = unpack_id(bytes_string, offset)
+            offset += size
+
+            type_name, size = unpack_string(bytes_string, offset)
+            offset += size
+
+            attributes_size, size = unpack_count(bytes_string, offset)
+            offset += size
+
+            entries.append((instance_id, type_name, offset))
+            offset += attributes_size
+
+        if is_full:
+            instance_ids = {instance_id for instance_id, _, _ in entries}
+
+            for instance_id in [i for i in self.replicables if i not in instance_ids]:
+                self.remove(instance_id)
+
+        # Create all replicas before values are unpacked, as they may reference each other
+        replicas = [(self.get_replica(instance_id, type_name), attributes_offset)
+                    for instance_id, type_name, attributes_offset in entries]
+
+        for replicable, attributes_offset in replicas:
+            attribute_storage = replicable._attribute_container
+            get_attribute = attribute_storage.get_member_by_name
+            set_value = attribute_storage.set_value
+
+            serialiser = self.get_serialiser(replicable.__class__, attribute_storage)
+
+            for name, value in serialiser.unpack(bytes_string, attribute_storage.data, offset=attributes_offset):
+                set_value(get_attribute(name), value)
+
+
+class ShardWorker:
+    """Runs the connections of a worker process.
+
+    Datagrams are received from the front process through the inbound ring, and each tick record applies a
+    snapshot and sends to the connections, writing their datagrams to the outbound ring
+    """
+
+    # Kinds of inbound records
+    datagram_record = 0
+    tick_record = 1
+
+    def __init__(self, inbound_ring, outbound_ring):
+        """
+        :param inbound_ring: SharedMemoryRing of records from the front process
+        :param outbound_ring: SharedMemoryRing of datagrams to the front process
+        """
+        self.inbound_ring = inbound_ring
+        self.outbound_ring = outbound_ring
+
+        self.snapshot_reader = WorldSnapshotReader()
+
+        # Metrics
+        self.dropped_datagrams = 0
+
+    def handle_datagram(self, record, offset):
+        """Dispatch received datagram to the connection for its address
+
+        :param record: inbound record
+        :param offset: offset of address in record
+        """
+        address, size = unpack_address(record, offset)
+
+        try:
+            connection = Connection[address]
+
+        # Create a new interface to handle connection
+        except KeyError:
+            connection = Connection(address)
+
+        connection.receive(record[offset + size:])
+
+    def send(self, full_update):
+        """Send all connection data to the outbound ring
+
+        :param full_update: whether this is a full send call
+        """
+        push = self.outbound_ring.push
+
+        for data, address in send_connections(list(Connection), full_update):
+            # Lost datagrams are redelivered by the reliability layer
+            if not push(pack_address(address) + data):
+                self.dropped_datagrams += 1
+
+    def update(self):
+        """Handle all inbound records, returning True if a tick was handled"""
+        full_update = None
+
+        for record in self.inbound_ring.pop_all():
+            record = memoryview(record)
+
+            if record[0] == self.datagram_record:
+                self.handle_datagram(record, 1)
+
+            else:
+                full_update = bool(record[1])
+                self.snapshot_reader.read(record, 2)
+
+        if full_update is None:
+            return False
+
+        self.send(full_update)
+        return True
+
+
+def get_front_id_range(worker_id_count):
+    """Return range of instance ids of replicables created by the front process
+
+    :param worker_id_count: number of instance ids reserved for replicables created by each worker
+    """
+    return range(Replicable.MAXIMUM_REPLICABLES - worker_id_count)
+
+
+def get_worker_id_range(worker_id_count):
+    """Return range of instance ids of replicables created by a worker process.
+
+    Workers do not share replicables, so all workers use the same range
+
+    :param worker_id_count: number of instance ids reserved for replicables created by each worker
+    """
+    return range(Replicable.MAXIMUM_REPLICABLES - worker_id_count, Replicable.MAXIMUM_REPLICABLES)
+
+
+def run_shard_worker(setup, inbound_name, outbound_name, tick_event, stop_event, worker_id_count):
+    """Run worker process until stopped
+
+    :param setup: function called before running, which sets up the netmode and rules of the process
+    :param inbound_name: name of inbound SharedMemoryRing
+    :param outbound_name: name of outbound SharedMemoryRing
+    :param tick_event: event set by the front process when a tick is published
+    :param stop_event: event set by the front process to stop the worker
+    :param worker_id_count: number of instance ids reserved for replicables created by the worker
+    """
+    Replicable.set_id_range(get_worker_id_range(worker_id_count))
+    setup()
+
+    inbound_ring = SharedMemoryRing(inbound_name)
+    outbound_ring = SharedMemoryRing(outbound_name)
+    worker = ShardWorker(inbound_ring, outbound_ring)
+
+    try:
+        while not stop_event.is_set():
+            if not tick_event.wait(0.1):
+                continue
+
+            tick_event.clear()
+            worker.update()
+
+    finally:
+        inbound_ring.close()
+        outbound_ring.close()
+
+
+_address_host_packer = get_handler(TypeFlag(str))
+_address_port_packer = get_handler(TypeFlag(int, max_value=2 ** 16 - 1))
+
+
+def pack_address(address):
+    """Pack (host, port) address
+
+    :param address: address tuple
+    """
+    host, port = address
+    return _address_host_packer.pack(host) + _address_port_packer.pack(port)
+
+
+def unpack_address(bytes_string, offset=0):
+    """Unpack (host, port) address, and its packed size
+
+    :param bytes_string: packed address
+    :param offset: offset of address
+    """
+    host, host_size = _address_host_packer.unpack_from(bytes_string, offset)
+    port, port_size = _address_port_packer.unpack_from(bytes_string, offset + host_size)
+    return (host, port), host_size + port_size
+
+
+class ShardProcess:
+    """Front process interface to a worker process"""
+
+    def __init__(self, context, setup, ring_capacity, worker_id_count):
+        """
+        :param context: multiprocessing context
+        :param setup: setup function of worker process
+        :param ring_capacity: capacity of each ring, in bytes
+        :param worker_id_count: number of instance ids reserved for replicables created by the worker
+        """
+        self.inbound_ring = SharedMemoryRing(capacity=ring_capacity)
+        self.outbound_ring = SharedMemoryRing(capacity=ring_capacity)
+
+        self.tick_event = context.Event()
+        self.stop_event = context.Event()
+
+        self.process = context.Process(target=run_shard_worker, daemon=True,
+                                       args=(setup, self.inbound_ring.name, self.outbound_ring.name, self.tick_event,
+                                             self.stop_event, worker_id_count))
+
+        # Number of addresses routed to the worker
+        self.address_count = 0
+
+        # If the last snapshot could not be published, so the next must be full
+        self.requires_full_snapshot = True
+
+    def start(self):
+        self.process.start()
+
+    def stop(self, timeout=1.0):
+        """Stop worker process and destroy rings
+
+        :param timeout: time to wait for the worker to stop
+        """
+        self.stop_event.set()
+        self.process.join(timeout)
+
+        if self.process.is_alive():
+            self.process.terminate()
+
+        self.inbound_ring.close()
+        self.outbound_ring.close()
+
+
+class ShardedNetwork(Network):
+    """Network which partitions connections across worker processes.
+
+    Received datagrams are routed to workers by address, and the authoritative world state is published to all
+    workers each send. Datagrams sent by workers are sent on the following send
+    """
+
+    def __init__(self, address, port, setup, worker_count=2, ring_capacity=2 ** 22, worker_id_count=64,
+                 socket_backend=None):
+        """
+        :param address: address of socket
+        :param port: port of socket
+        :param setup: importable function called by each worker process before running
+        :param worker_count: number of worker processes
+        :param ring_capacity: capacity of each shared memory ring, in bytes
+        :param worker_id_count: number of instance ids reserved for replicables created by each worker
+        :param socket_backend: socket backend of socket
+        """
+        super().__init__(address, port, socket_backend)
+
+        # Replicables created by the front must not use the ids of those created by workers
+        Replicable.set_id_range(get_front_id_range(worker_id_count))
+
+        context = get_context("spawn")
+        self.workers = [ShardProcess(context, setup, ring_capacity, worker_id_count) for _ in range(worker_count)]
+
+        for worker in self.workers:
+            worker.start()
+
+        self.worker_by_address = {}
+        self.snapshot_writer = WorldSnapshotWriter()
+
+        # Metrics
+        self.dropped_datagrams = 0
+
+    def get_worker(self, address):
+        """Return worker of address, routing new addresses to the worker with the fewest addresses
+
+        :param address: address of remote peer
+        """
+        try:
+            return self.worker_by_address[address]
+
+        except KeyError:
+            worker = self.worker_by_address[address] = min(self.workers, key=lambda w: w.address_count)
+            worker.address_count += 1
+            return worker
+
+    def receive(self):
+        """Route all data from socket to workers"""
+        # Start a new tick sample
+        self.metrics.reset_tick_counters()
+
+        datagram_record = bytes((ShardWorker.datagram_record,))
+
+        for data, address in self.received_data:
+            record = datagram_record + pack_address(address) + data
+
+            if not self.get_worker(address).inbound_ring.push(record):
+                self.dropped_datagrams += 1
+
+        # Update multi-cast listeners
+        self.multicast.receive()
+
+    def publish_snapshot(self, full_update):
+        """Publish tick record with snapshot of authoritative replicables to all workers
+
+        :param full_update: whether this is a full send call
+        """
+        writer = self.snapshot_writer
+        replicables = writer.get_authoritative_replicables()
+
+        header = bytes((ShardWorker.tick_record, full_update))
+        snapshot = header + writer.write(replicables)
+        full_snapshot = None
+
+        for worker in self.workers:
+            if worker.requires_full_snapshot:
+                if full_snapshot is None:
+                    full_snapshot = header + writer.write(replicables, full=True)
+
+                record = full_snapshot
+
+            else:
+                record = snapshot
+
+            # Workers which miss a snapshot require the next to be full
+            worker.requires_full_snapshot = not worker.inbound_ring.push(record)
+            worker.tick_event.set()
+
+    def send(self, full_update):
+        """Publish world state to workers, and send datagrams written by workers
+
+        :param full_update: whether this is a full send call
+        """
+        self.publish_snapshot(full_update)
+
+        datagrams = []
+
+        for worker in self.workers:
+            for record in worker.outbound_ring.pop_all():
+                address, size = unpack_address(record)
+                datagrams.append((record[size:], address))
+
+        if datagrams:
+            self.send_batch(datagrams)
+
+    def stop(self):
+        """Stop worker processes and close network socket"""
+        for worker in self.workers:
+            worker.stop()
+
+        super().stop()
@@ -4,7 +4,7 @@ from .connection import Connection
 from .world_info import WorldInfo
 from .signals import Signal
 
-from time import clock
+from time import perf_counter, sleep
 
 __all__ = ["SimpleNetwork", "respect_interval"]
 
@@ -21,7 +21,7 @@ class SimpleNetwork(Network):
         Replicable.clear_graph()
         Signal.clear_graph()
 
-        WorldInfo.register(instance_id=WorldInfo.instance_id)
+        WorldInfo.register()
 
     def on_update(self):
         return True
@@ -36,12 +36,22 @@ class SimpleNetwork(Network):
         self.send(full_update)
 
     def run(self, timeout=None, update_rate=1/60):
-        started = clock()
+        """Step the network at the update rate (in wall time), until there are no connections and the timeout has
+        elapsed
+
+        :param timeout: time after which to stop once there are no connections, or None to run indefinitely
+        :param update_rate: minimum interval between steps
+        """
+        started = perf_counter()
         last_time = started
 
         while True:
-            current_time = clock()
-            if (current_time - last_time) < update_rate:
+            current_time = perf_counter()
+            remaining_time = update_rate - (current_time - last_time)
+
+            # Sleep until the next update
+            if remaining_time > 0:
+                sleep(remaining_time)
                 continue
 
             last_time = current_time
@@ -63,22 +73,28 @@ class SimpleNetwork(Network):
 
 
 def respect_interval(interval, function):
-    """Decorator to ensure function is only called after a minimum interval
+    """Decorator to ensure function is only called after a minimum interval.
+
+    Each call sleeps until the interval (in wall time) has elapsed since the function was last called, rather than
+    polling the clock
 
     :param interval: minimum interval between successive calls
     :param function: function to call
     """
     def wrapper():
-        last_called = clock()
+        last_called = perf_counter()
 
         while True:
-            now = clock()
-            dt = now - last_called
+            remaining_time = interval - (perf_counter() - last_called)
+
+            # Sleep until the next call
+            if remaining_time > 0:
+                sleep(remaining_time)
 
-            if dt >= interval:
-                function()
-                last_called = now
+            # Skip calls which were missed
+            last_called = max(last_called + interval, perf_counter())
+            function()
 
             yield
 
-    return wrapper().__next__
\ No newline at end of file
+    return wrapper().__next__
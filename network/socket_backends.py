@@ -0,0 +1,303 @@
+from ctypes import (CDLL, POINTER, Structure, addressof, byref, c_char, c_char_p, c_int, c_size_t, c_uint,
+                    c_uint32, c_void_p, cast, get_errno, pointer, sizeof)
+from ctypes.util import find_library
+from os import strerror
+from socket import socket, AF_INET, error as SOCK_ERROR, gethostbyname, inet_aton, inet_ntoa
+from struct import pack
+
+__all__ = ['SocketBackend', 'BatchedSocketBackend', 'create_socket_backend']
+
+
+DEFAULT_BUFFER_SIZE = 63553
+DEFAULT_BATCH_SIZE = 32
+
+MSG_DONTWAIT = 0x40
+SOCKADDR_IN_SIZE = 16
+
+
+class _IOVec(Structure):
+    _fields_ = [("iov_base", c_void_p), ("iov_len", c_size_t)]
+
+
+class _MessageHeader(Structure):
+    _fields_ = [("msg_name", c_void_p), ("msg_namelen", c_uint32), ("msg_iov", POINTER(_IOVec)),
+                ("msg_iovlen", c_size_t), ("msg_control", c_void_p), ("msg_controllen", c_size_t),
+                ("msg_flags", c_int)]
+
+
+class _MultipleMessageHeader(Structure):
+    _fields_ = [("msg_hdr", _MessageHeader), ("msg_len", c_uint)]
+
+
+def _load_libc():
+    """Load the C library if it provides the batched datagram system calls"""
+    try:
+        libc = CDLL(find_library("c"), use_errno=True)
+
+    except OSError:
+        return None
+
+    if not (hasattr(libc, "recvmmsg") and hasattr(libc, "sendmmsg")):
+        return None
+
+    return libc
+
+
+_libc = _load_libc()
+
+
+class SocketBackend:
+    """Socket I/O backend which performs a system call per datagram.
+
+    Receives into a preallocated ring of buffers. Received payloads are views into the ring, which are overwritten
+    once batch_size further datagrams have been received
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+        # System call counters
+        self.receive_calls = 0
+        self.send_calls = 0
+
+        self.allocate_buffers(buffer_size)
+
+    def __repr__(self):
+        return "<{}: {} x {} bytes>".format(self.__class__.__name__, self.batch_size, self.buffer_size)
+
+    def allocate_buffers(self, buffer_size):
+        """Allocate the receive buffer ring
+
+        :param buffer_size: maximum size of a received datagram
+        """
+        batch_size = self.batch_size
+        buffer = bytearray(buffer_size * batch_size)
+        buffer_view = memoryview(buffer)
+
+        self.buffer_size = buffer_size
+
+        self._buffer = buffer
+        self._buffer_views = [buffer_view[i * buffer_size: (i + 1) * buffer_size] for i in range(batch_size)]
+        self._ring_index = 0
+
+    def receive_from(self, socket_):
+        """Return iterator over (payload, address) pairs for all pending datagrams
+
+        :param socket_: socket to receive from
+        """
+        buffer_views = self._buffer_views
+        batch_size = self.batch_size
+        recvfrom_into = socket_.recvfrom_into
+
+        while True:
+            buffer_view = buffer_views[self._ring_index]
+            self.receive_calls += 1
+
+            try:
+                payload_size, address = recvfrom_into(buffer_view)
+
+            except SOCK_ERROR:
+                return
+
+            self._ring_index = (self._ring_index + 1) % batch_size
+
+            yield buffer_view[:payload_size], address
+
+    def send_to(self, socket_, datagrams):
+        """Send datagrams to remote peers, returning number of bytes sent
+
+        :param socket_: socket to send from
+        :param datagrams: sequence of (payload, address) pairs
+        """
+        sendto = socket_.sendto
+        sent_bytes = 0
+
+        for payload, address in datagrams:
+            self.send_calls += 1
+            sent_bytes += sendto(payload, address)
+
+        return sent_bytes
+
+
+class BatchedSocketBackend(SocketBackend):
+    """Socket I/O backend which drains and flushes datagrams in batches.
+
+    Uses the recvmmsg and sendmmsg system calls, falling back to the per-datagram path for sockets which do not
+    expose a file descriptor (such as wrapped sockets). Each batch is received from the start of the buffer ring, so
+    received payloads are overwritten when the next batch is received
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+        if not self.is_supported():
+            raise TypeError("Batched socket I/O is not supported on this platform")
+
+        self._address_cache = {}
+
+        super().__init__(buffer_size, batch_size)
+
+    @staticmethod
+    def is_supported():
+        """Return True if the recvmmsg and sendmmsg system calls are available"""
+        return _libc is not None
+
+    def allocate_buffers(self, buffer_size):
+        """Allocate the receive buffer ring, and the message headers which refer to it
+
+        :param buffer_size: maximum size of a received datagram
+        """
+        super().allocate_buffers(buffer_size)
+
+        batch_size = self.batch_size
+
+        # Share the ring memory with the C structures
+        c_buffer = (c_char * len(self._buffer)).from_buffer(self._buffer)
+        address_buffer = bytearray(SOCKADDR_IN_SIZE * batch_size)
+        c_address_buffer = (c_char * len(address_buffer)).from_buffer(address_buffer)
+        address_view = memoryview(address_buffer)
+
+        io_vectors = (_IOVec * batch_size)()
+        receive_headers = (_MultipleMessageHeader * batch_size)()
+
+        buffer_address = addressof(c_buffer)
+        name_address = addressof(c_address_buffer)
+
+        for index in range(batch_size):
+            io_vector = io_vectors[index]
+            io_vector.iov_base = buffer_address + index * buffer_size
+            io_vector.iov_len = buffer_size
+
+            header = receive_headers[index].msg_hdr
+            header.msg_name = name_address + index * SOCKADDR_IN_SIZE
+            header.msg_iov = pointer(io_vectors[index])
+            header.msg_iovlen = 1
+
+        self._c_buffers = c_buffer, c_address_buffer
+        self._io_vectors = io_vectors
+        self._receive_headers = receive_headers
+        self._address_views = [address_view[i * SOCKADDR_IN_SIZE: (i + 1) * SOCKADDR_IN_SIZE]
+                               for i in range(batch_size)]
+
+    def _get_packed_address(self, address):
+        """Return C sockaddr_in structure for an address
+
+        Host names are resolved (as by socket.sendto) when the address is first packed
+
+        :param address: (host, port) pair
+        """
+        try:
+            return self._address_cache[address]
+
+        except KeyError:
+            host, port = address
+            packed = pack("=H", AF_INET) + pack("!H", port) + inet_aton(gethostbyname(host)) + bytes(8)
+            packed_address = self._address_cache[address] = (c_char * SOCKADDR_IN_SIZE).from_buffer_copy(packed)
+            return packed_address
+
+    def receive_from(self, socket_):
+        """Return iterator over (payload, address) pairs for all pending datagrams
+
+        :param socket_: socket to receive from
+        """
+        if not isinstance(socket_, socket):
+            yield from super().receive_from(socket_)
+            return
+
+        file_descriptor = socket_.fileno()
+        batch_size = self.batch_size
+        headers = self._receive_headers
+        buffer_views = self._buffer_views
+        address_views = self._address_views
+        recvmmsg = _libc.recvmmsg
+
+        while True:
+            for header in headers:
+                header.msg_hdr.msg_namelen = SOCKADDR_IN_SIZE
+
+            self.receive_calls += 1
+            received_count = recvmmsg(file_descriptor, headers, batch_size, MSG_DONTWAIT, None)
+
+            # No data (EAGAIN) or socket error
+            if received_count < 1:
+                return
+
+            for index in range(received_count):
+                name = address_views[index]
+                address = inet_ntoa(name[4:8]), (name[2] << 8) | name[3]
+
+                yield buffer_views[index][:headers[index].msg_len], address
+
+            # Socket was drained
+            if received_count < batch_size:
+                return
+
+    def send_to(self, socket_, datagrams):
+        """Send datagrams to remote peers, returning number of bytes sent
+
+        :param socket_: socket to send from
+        :param datagrams: sequence of (payload, address) pairs
+        """
+        if not isinstance(socket_, socket):
+            return super().send_to(socket_, datagrams)
+
+        file_descriptor = socket_.fileno()
+        batch_size = self.batch_size
+        get_packed_address = self._get_packed_address
+        sendmmsg = _libc.sendmmsg
+
+        datagrams = list(datagrams)
+        sent_bytes = 0
+
+        for batch_start in range(0, len(datagrams), batch_size):
+            batch = datagrams[batch_start: batch_start + batch_size]
+            batch_count = len(batch)
+
+            io_vectors = (_IOVec * batch_count)()
+            headers = (_MultipleMessageHeader * batch_count)()
+
+            # Keep payloads alive until sent
+            payloads = []
+
+            for index, (payload, address) in enumerate(batch):
+                if not isinstance(payload, bytes):
+                    payload = bytes(payload)
+
+                payloads.append(payload)
+
+                io_vector = io_vectors[index]
+                io_vector.iov_base = cast(c_char_p(payload), c_void_p)
+                io_vector.iov_len = len(payload)
+
+                header = headers[index].msg_hdr
+                header.msg_name = addressof(get_packed_address(address))
+                header.msg_namelen = SOCKADDR_IN_SIZE
+                header.msg_iov = pointer(io_vectors[index])
+                header.msg_iovlen = 1
+
+            # The kernel may send only part of the batch
+            sent_count = 0
+            while sent_count < batch_count:
+                self.send_calls += 1
+                result = sendmmsg(file_descriptor, byref(headers, sent_count * sizeof(_MultipleMessageHeader)),
+                                  batch_count - sent_count, 0)
+
+                if result < 0:
+                    error_number = get_errno()
+                    raise OSError(error_number, strerror(error_number))
+
+                sent_count += result
+
+            sent_bytes += sum(header.msg_len for header in headers)
+
+        return sent_bytes
+
+
+def create_socket_backend(buffer_size=DEFAULT_BUFFER_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """Return the most efficient socket backend supported by this platform
+
+    :param buffer_size: maximum size of a received datagram
+    :param batch_size: number of datagrams received per system call
+    """
+    if BatchedSocketBackend.is_supported():
+        return BatchedSocketBackend(buffer_size, batch_size)
+
+    return SocketBackend(buffer_size, batch_size)
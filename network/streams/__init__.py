@@ -1,4 +1,7 @@
+from .compression import *
+from .fragmentation import *
 from .latency_calculator import *
 from .handshake import *
 from .replication import *
+from .scheduler import *
 from .streams import *
\ No newline at end of file
@@ -0,0 +1,72 @@
+from ..compression import PacketCompressor
+from ..enums import ConnectionProtocols
+from ..packet import Packet, PacketCollection
+
+__all__ = ['CompressionStream']
+
+
+class CompressionStream:
+    """Compresses the packets of datagrams sent to peers which agreed to compression, and expands received
+    compressed packets.
+
+    Compression is negotiated by the handshake streams, and both peers must use the same preset dictionary
+    """
+
+    # Whether compression is offered to (and accepted from) peers
+    enabled = False
+
+    # Preset dictionary (see :py:func:`network.compression.train_dictionary`)
+    dictionary = b''
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.compressor = PacketCompressor(self.dictionary)
+
+        # If the peer agreed to receive compressed packets
+        self.is_negotiated = False
+
+        # Metrics
+        self.decompression_failures = 0
+
+    @property
+    def dictionary_id(self):
+        """Identifier of preset dictionary"""
+        return self.compressor.dictionary_id
+
+    def compress_packets(self, bytes_string):
+        """Return compressed packet containing packed packets, or None if they are not compressed
+
+        :param bytes_string: packed packets
+        """
+        if not self.is_negotiated:
+            return None
+
+        compressed = self.compressor.compress(bytes_string)
+        if compressed is None:
+            return None
+
+        return Packet(protocol=ConnectionProtocols.compressed, payload=compressed)
+
+    def handle_packets(self, packet_collection):
+        """Expand compressed packets, and dispatch their contents
+
+        :param packet_collection: PacketCollection instance
+        """
+        compressed_protocol = ConnectionProtocols.compressed
+
+        for packet in packet_collection:
+            if packet.protocol != compressed_protocol:
+                continue
+
+            bytes_string = self.compressor.decompress(packet.payload)
+
+            if bytes_string is None:
+                self.decompression_failures += 1
+                continue
+
+            self.dispatcher.handle_packets(PacketCollection.from_bytes(bytes_string))
+
+    @staticmethod
+    def pull_packets(network_tick, bandwidth):
+        """Non functional packet pulling method, packets are compressed when they are written to datagrams"""
+        return None
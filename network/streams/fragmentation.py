@@ -0,0 +1,222 @@
+from collections import OrderedDict
+
+from ..enums import ConnectionProtocols
+from ..handlers import get_handler
+from ..packet import Packet, PacketCollection
+from ..type_flag import TypeFlag
+
+__all__ = ['FragmentStream']
+
+
+class FragmentStream:
+    """Splits packet collections into datagram sized collections, fragmenting oversized packets.
+
+    Fragments are reassembled by the receiving stream, and the original packet dispatched once all have arrived
+    """
+
+    # Number of incomplete fragment groups retained before the oldest is discarded
+    max_pending_groups = 64
+
+    # Number of completed fragment groups remembered, to ignore duplicated fragments
+    max_completed_groups = 1024
+
+    # Number of fragments a packet may be split into
+    max_fragments = 2 ** 16 - 1
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.packet_pool = dispatcher.packet_pool
+
+        self.protocol_handler = get_handler(TypeFlag(int, encoding="varint"))
+        self.fragment_handler = get_handler(TypeFlag(int, max_value=2 ** 16 - 1))
+
+        # Fragment header is the group id, fragment index and fragment count
+        self.fragment_header_size = 3 * self.fragment_handler.size()
+
+        self.group_id = 0
+
+        self.pending_groups = OrderedDict()
+        self.completed_groups = OrderedDict()
+
+        # Metrics
+        self.packets_fragmented = 0
+        self.fragments_sent = 0
+        self.fragments_received = 0
+        self.packets_reassembled = 0
+        self.groups_discarded = 0
+
+    def fragment_packet(self, packet, fragment_size):
+        """Return list of fragment packets for packet
+
+        :param packet: Packet instance
+        :param fragment_size: maximum size of fragment packets
+        """
+        body = self.protocol_handler.pack(packet.protocol) + packet.payload
+
+        # Packet header is the length (which is less than the fragment size) and protocol
+        packet_header_size = len(Packet._size_handler.pack(fragment_size)) + \
+            len(Packet._protocol_handler.pack(ConnectionProtocols.fragment))
+        chunk_size = fragment_size - packet_header_size - self.fragment_header_size
+
+        if chunk_size <= 0:
+            raise ValueError("Fragment size is too small to fragment packets: {}".format(fragment_size))
+
+        chunks = [body[i: i + chunk_size] for i in range(0, len(body), chunk_size)]
+        fragment_count = len(chunks)
+
+        if fragment_count > self.max_fragments:
+            raise ValueError("Packet is too large to fragment: {} bytes".format(len(body)))
+
+        group_id = self.group_id
+        self.group_id = (group_id + 1) % (2 ** 16)
+
+        on_success = on_failure = None
+
+        # Inform the original packet once all fragments are received, or whenever one is dropped
+        if packet.on_success or packet.on_failure:
+            remaining_fragments = [fragment_count]
+
+            def on_success(fragment):
+                remaining_fragments[0] -= 1
+
+                if not remaining_fragments[0]:
+                    packet.on_ack()
+
+            def on_failure(fragment):
+                packet.on_not_ack()
+
+        pack = self.fragment_handler.pack
+        create_packet = self.packet_pool.create
+        fragment_protocol = ConnectionProtocols.fragment
+        reliable = packet.reliable
+
+        fragments = [create_packet(protocol=fragment_protocol, payload=pack(group_id) + pack(index) +
+                                   pack(fragment_count) + chunk, reliable=reliable, on_success=on_success,
+                                   on_failure=on_failure)
+                     for index, chunk in enumerate(chunks)]
+
+        # Original packet is only needed to inform it of the fragments' delivery
+        if on_success is None:
+            packet.release()
+
+        self.packets_fragmented += 1
+        self.fragments_sent += fragment_count
+
+        return fragments
+
+    def split_packets(self, packet_collection, max_size):
+        """Return list of packet collections whose members pack to no more than max_size bytes.
+
+        Packets which are larger than max_size are fragmented. At least one (possibly empty) collection is returned
+
+        :param packet_collection: PacketCollection instance
+        :param max_size: maximum size of packed collection
+        """
+        collections = []
+        members = []
+        size = 0
+
+        for packet in packet_collection:
+            if packet.size > max_size:
+                packets = self.fragment_packet(packet, max_size)
+
+            else:
+                packets = packet,
+
+            for packet in packets:
+                packet_size = packet.size
+
+                if size + packet_size > max_size:
+                    collections.append(PacketCollection(members))
+                    members = []
+                    size = 0
+
+                members.append(packet)
+                size += packet_size
+
+        if members or not collections:
+            collections.append(PacketCollection(members))
+
+        return collections
+
+    def handle_fragment(self, payload):
+        """Store received fragment, returning reassembled packet if this fragment completes its group
+
+        :param payload: fragment packet payload
+        """
+        unpack_from = self.fragment_handler.unpack_from
+
+        group_id, offset = unpack_from(payload)
+        index, index_size = unpack_from(payload, offset)
+        offset += index_size
+        fragment_count, count_size = unpack_from(payload, offset)
+        offset += count_size
+
+        self.fragments_received += 1
+
+        # Ignore duplicated fragments of complete groups
+        if group_id in self.completed_groups:
+            return None
+
+        pending_groups = self.pending_groups
+
+        try:
+            chunks = pending_groups[group_id]
+
+        except KeyError:
+            chunks = pending_groups[group_id] = [None] * fragment_count
+
+            # Discard the oldest incomplete group
+            if len(pending_groups) > self.max_pending_groups:
+                pending_groups.popitem(last=False)
+                self.groups_discarded += 1
+
+        # Group id was reused before the previous group completed
+        if len(chunks) != fragment_count:
+            chunks = pending_groups[group_id] = [None] * fragment_count
+
+        # Payloads may be views into the received datagram
+        chunks[index] = bytes(payload[offset:])
+
+        if None in chunks:
+            return None
+
+        del pending_groups[group_id]
+
+        completed_groups = self.completed_groups
+        completed_groups[group_id] = True
+
+        if len(completed_groups) > self.max_completed_groups:
+            completed_groups.popitem(last=False)
+
+        body = b''.join(chunks)
+        protocol, protocol_size = self.protocol_handler.unpack_from(body)
+
+        self.packets_reassembled += 1
+
+        return Packet(protocol=protocol, payload=body[protocol_size:])
+
+    def handle_packets(self, packet_collection):
+        """Reassemble fragmented packets, and dispatch them once complete
+
+        :param packet_collection: PacketCollection instance
+        """
+        fragment_protocol = ConnectionProtocols.fragment
+        reassembled = []
+
+        for packet in packet_collection:
+            if packet.protocol != fragment_protocol:
+                continue
+
+            packet = self.handle_fragment(packet.payload)
+
+            if packet is not None:
+                reassembled.append(packet)
+
+        if reassembled:
+            self.dispatcher.handle_packets(PacketCollection(reassembled))
+
+    @staticmethod
+    def pull_packets(network_tick, bandwidth):
+        """Non functional packet pulling method, packets are fragmented when they are split into datagrams"""
+        return None
@@ -27,6 +27,7 @@ class HandshakeStream(ProtocolHandler, StatusDispatcher, DelegateByNetmode):
         self.dispatcher = dispatcher
 
         self.replication_stream = None
+        self.compression_stream = None
         self.connection_info = None
         self.remove_connection = None
 
@@ -36,6 +37,14 @@ class HandshakeStream(ProtocolHandler, StatusDispatcher, DelegateByNetmode):
         # Additional data
         self.netmode_packer = get_handler(TypeFlag(int))
         self.string_packer = get_handler(TypeFlag(str))
+        self.bool_packer = get_handler(TypeFlag(bool))
+        self.dictionary_id_packer = get_handler(TypeFlag(int, max_bits=32))
+
+    @property
+    def compression_enabled(self):
+        """If compression is offered to (and accepted from) the peer"""
+        compression_stream = self.compression_stream
+        return compression_stream is not None and compression_stream.enabled
 
     @property
     def timed_out(self):
@@ -76,6 +85,7 @@ class ServerHandshakeStream(HandshakeStream):
 
         self.handshake_error = None
         self.replication_stream = None
+        self.compression_accepted = False
 
     def on_ack_handshake_failed(self, packet):
         self._cleanup()
@@ -97,6 +107,14 @@ class ServerHandshakeStream(HandshakeStream):
         netmode, netmode_size = self.netmode_packer.unpack_from(data)
         connection_info = self.connection_info
 
+        # Accept compression if the client offers it with the same dictionary
+        if len(data) > netmode_size and self.compression_enabled:
+            compression_offered, offered_size = self.bool_packer.unpack_from(data, netmode_size)
+
+            if compression_offered:
+                dictionary_id, _ = self.dictionary_id_packer.unpack_from(data, netmode_size + offered_size)
+                self.compression_accepted = dictionary_id == self.compression_stream.dictionary_id
+
         try:
             WorldInfo.rules.pre_initialise(connection_info, netmode)
 
@@ -131,8 +149,13 @@ class ServerHandshakeStream(HandshakeStream):
             self.state = ConnectionState.connected
             ConnectionSuccessSignal.invoke(target=self)
 
+            # Client may receive compressed packets before the result, as it offered to decompress them
+            if self.compression_accepted:
+                self.compression_stream.is_negotiated = True
+
             # Send result
-            return Packet(protocol=ConnectionProtocols.handshake_success)
+            return Packet(protocol=ConnectionProtocols.handshake_success,
+                          payload=self.bool_packer.pack(self.compression_accepted))
 
     @send_state(ConnectionState.pending)
     def invoke_handshake(self, network_tick, bandwidth):
@@ -152,7 +175,16 @@ class ClientHandshakeStream(HandshakeStream):
         self.state = ConnectionState.handshake
 
         netmode_data = self.netmode_packer.pack(WorldInfo.netmode)
-        return Packet(protocol=ConnectionProtocols.request_handshake, payload=netmode_data)
+
+        # Offer compression with the dictionary of the compression stream
+        if self.compression_enabled:
+            compression_data = self.bool_packer.pack(True) + \
+                self.dictionary_id_packer.pack(self.compression_stream.dictionary_id)
+
+        else:
+            compression_data = self.bool_packer.pack(False)
+
+        return Packet(protocol=ConnectionProtocols.request_handshake, payload=netmode_data + compression_data)
 
     @response_protocol(ConnectionProtocols.handshake_success)
     def receive_handshake_success(self, data):
@@ -162,6 +194,11 @@ class ClientHandshakeStream(HandshakeStream):
         self.state = ConnectionState.connected
         self.replication_stream = self.dispatcher.create_stream(ReplicationStream)
 
+        # Server accepted compression
+        if data and self.compression_enabled:
+            compression_accepted, _ = self.bool_packer.unpack_from(data)
+            self.compression_stream.is_negotiated = compression_accepted
+
         ConnectionSuccessSignal.invoke(target=self)
 
     @response_protocol(ConnectionProtocols.invoke_handshake)
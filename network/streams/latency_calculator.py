@@ -47,7 +47,7 @@ class LatencyCalculator:
         :param sample_id: ID of sample
         """
         end_time = clock()
-        start_time = self._pending_samples[sample_id]
+        start_time = self._pending_samples.pop(sample_id)
 
         round_trip = end_time - start_time
         self._samples.append(round_trip)
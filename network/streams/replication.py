@@ -1,12 +1,13 @@
 from .streams import response_protocol, ProtocolHandler
 from .latency_calculator import LatencyCalculator
+from .scheduler import PriorityScheduler
 
 from ..channel import Channel
 from ..decorators import with_tag
 from ..enums import ConnectionProtocols, Netmodes, Roles
 from ..handlers import get_handler
 from ..logger import logger
-from ..packet import Packet, PacketCollection
+from ..packet import PacketCollection
 from ..replicable import Replicable
 from ..signals import (Signal, SignalListener, ReplicableRegisteredSignal, ReplicableUnregisteredSignal,
                        LatencyUpdatedSignal)
@@ -24,6 +25,9 @@ __all__ = "ReplicationStream", "ServerReplicationStream", "ClientReplicationStre
 class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
     subclasses = {}
 
+    # Whether attribute updates are bit packed (must match the remote peer)
+    bit_packed = False
+
     def __init__(self, dispatcher):
         self.channels = {}
         self.replicable = None
@@ -33,6 +37,7 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
         self.bool_packer = get_handler(TypeFlag(bool))
         self.replicable_packer = get_handler(TypeFlag(Replicable))
 
+        self.packet_pool = dispatcher.packet_pool
         self.method_queue = []
 
         self.load_existing_replicables()
@@ -42,14 +47,34 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
     @property
     def prioritised_channels(self):
+        """Returns a generator for replicables
+        with a remote role != Roles.none, in order of replication priority
+
+        :yield: replicable, (is_owner and relevant_to_owner), channel
+        """
+        return self.get_replicated_channels(sorted(self.channels.values(), reverse=True,
+                                                   key=attrgetter("replication_priority")))
+
+    @property
+    def replicated_channels(self):
+        """Returns a generator for replicables
+        with a remote role != Roles.none
+
+        :yield: replicable, (is_owner and relevant_to_owner), channel
+        """
+        return self.get_replicated_channels(self.channels.values())
+
+    @staticmethod
+    def get_replicated_channels(channels):
         """Returns a generator for replicables
         with a remote role != Roles.none
 
+        :param channels: iterable of channels
         :yield: replicable, (is_owner and relevant_to_owner), channel
         """
         no_role = Roles.none  # @UndefinedVariable
 
-        for channel in sorted(self.channels.values(), reverse=True, key=attrgetter("replication_priority")):
+        for channel in channels:
             replicable = channel.replicable
 
             # Check if remote role is permitted
@@ -111,7 +136,8 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
     def write_method_calls(self, channel):
         packed_id = channel.packed_id
         method_invoke_protocol = ConnectionProtocols.invoke_method
-        packets = [Packet(protocol=method_invoke_protocol, payload=packed_id + rpc_call, reliable=reliable)
+        create_packet = self.packet_pool.create
+        packets = [create_packet(protocol=method_invoke_protocol, payload=packed_id + rpc_call, reliable=reliable)
                    for rpc_call, reliable in channel.take_rpc_calls()]
 
         self.method_queue.extend(packets)
@@ -134,6 +160,8 @@ class ServerReplicationStream(ReplicationStream):
         self.latency_calculator = LatencyCalculator()
         self.latency_calculator.on_updated = partial(LatencyUpdatedSignal.invoke, target=self.replicable)
 
+        self.scheduler = PriorityScheduler()
+
     def get_ack_latency_wrapper(self, callback):
         """Wraps callback with latency calculator callback
 
@@ -166,41 +194,70 @@ class ServerReplicationStream(ReplicationStream):
         super().notify_unregistered(target)
 
     def send_attributes(self, replicables, available_bandwidth):
-        """Creates a packet collection of replicated function calls and attributes
+        """Write replicated attributes of relevant replicables, in order of priority until bandwidth is spent
 
         :param available_bandwidth: estimated available bandwidth
-        :returns: PacketCollection instance
+        :yield: items for replicables which were replicated
         """
-        is_relevant = WorldInfo.rules.is_relevant
+        rules = WorldInfo.rules
+        is_relevant = rules.is_relevant
         connection_replicable = self.replicable
 
+        # Query spatial relevancy once for this connection
+        get_relevant_replicables = getattr(rules, "get_relevant_replicables", None)
+        relevant_replicables = None if get_relevant_replicables is None else \
+            get_relevant_replicables(connection_replicable)
+
+        due_items = []
+
         for item in replicables:
             channel, is_and_relevant_to_owner = item
 
             # Get replicable
             replicable = channel.replicable
 
-            # Only send attributes if relevant
-            if not (channel.awaiting_replication and (is_and_relevant_to_owner or
-                                                      is_relevant(connection_replicable, replicable))):
+            if not channel.awaiting_replication:
                 continue
 
-            # If we've never replicated to this channel
-            if channel.is_initial:
-                # Pack the class name
-                self.write_creation(channel)
+            # Only send attributes if relevant
+            if not is_and_relevant_to_owner:
+                if relevant_replicables is None or replicable not in rules.relevancy_grid:
+                    if not is_relevant(connection_replicable, replicable):
+                        continue
+
+                elif not (replicable.always_relevant or replicable in relevant_replicables):
+                    continue
+
+            due_items.append(item)
+
+        # Remaining items are deferred to later ticks
+        yield from self.scheduler.schedule(due_items, available_bandwidth, self.write_replication)
+
+    def write_replication(self, item):
+        """Write creation (if initial) and attribute packets for a replicable, returning number of bytes written
+
+        :param item: channel, (is_owner and relevant_to_owner) pair
+        """
+        channel, is_and_relevant_to_owner = item
+        replicable = channel.replicable
+        written_bytes = 0
 
-            # Send changed attributes
-            self.write_attributes(channel, is_and_relevant_to_owner)
+        # If we've never replicated to this channel
+        if channel.is_initial:
+            # Pack the class name
+            written_bytes += self.write_creation(channel)
 
-            # If a temporary replicable remove from channels (but don't delete)
-            if replicable.replicate_temporarily:
-                self.channels.pop(replicable.instance_id)
+        # Send changed attributes
+        written_bytes += self.write_attributes(channel, is_and_relevant_to_owner)
 
-            yield item
+        # If a temporary replicable remove from channels (but don't delete)
+        if replicable.replicate_temporarily:
+            self.channels.pop(replicable.instance_id)
+
+        return written_bytes
 
     def pull_packets(self, network_tick, bandwidth):
-        replicables = self.prioritised_channels
+        replicables = self.replicated_channels
 
         if network_tick:
             replicables = self.send_attributes(replicables, bandwidth)
@@ -231,12 +288,17 @@ class ServerReplicationStream(ReplicationStream):
 
         # If they have changed
         if not attributes:
-            return
+            return 0
 
         update_payload = channel.packed_id + attributes
-        packet = Packet(protocol=ConnectionProtocols.attribute_update, payload=update_payload, reliable=True)
+
+        # Delta encoded attributes are acknowledged to provide new baselines
+        packet = self.packet_pool.create(protocol=ConnectionProtocols.attribute_update, payload=update_payload,
+                                         reliable=True, on_success=channel.take_ack_callback())
         self.attribute_queue.append(packet)
 
+        return len(update_payload)
+
     def write_creation(self, channel):
         replicable = channel.replicable
 
@@ -245,11 +307,14 @@ class ServerReplicationStream(ReplicationStream):
 
         # Send the protocol, class name and owner status to client
         payload = channel.packed_id + packed_class + packed_is_host
-        packet = Packet(protocol=ConnectionProtocols.replication_init, payload=payload, reliable=True)
+        packet = self.packet_pool.create(protocol=ConnectionProtocols.replication_init, payload=payload, reliable=True)
         self.creation_queue.append(packet)
 
+        return len(payload)
+
     def write_removal(self, channel):
-        packet = Packet(protocol=ConnectionProtocols.replication_del, payload=channel.packed_id, reliable=True)
+        packet = self.packet_pool.create(protocol=ConnectionProtocols.replication_del, payload=channel.packed_id,
+                                         reliable=True)
         self.removal_queue.append(packet)
 
 
@@ -0,0 +1,71 @@
+from heapq import heapify, heappop
+
+__all__ = ['PriorityScheduler']
+
+
+class PriorityScheduler:
+    """Bandwidth-budgeted scheduler for replication channels.
+
+    Channels accumulate their replication priority each tick they are due, and are sent in order of accumulated
+    priority until the available bandwidth is spent. The remainder are deferred to later ticks, keeping their
+    accumulated priority so that neglected channels rise above the rest
+    """
+
+    def __init__(self, starvation_threshold=10):
+        """
+        :param starvation_threshold: number of consecutive deferred ticks after which a channel is starved
+        """
+        self.starvation_threshold = starvation_threshold
+
+        self.accumulated_priorities = {}
+        self.deferred_ticks = {}
+
+        # Metrics
+        self.bytes_sent = 0
+        self.deferred_count = 0
+        self.starved_count = 0
+        self.max_deferred_ticks = 0
+
+    def schedule(self, items, available_bandwidth, send):
+        """Send items in order of accumulated priority, until bandwidth is spent
+
+        At least one item is sent each call.
+
+        :param items: sequence of (channel, ...) items due for replication
+        :param available_bandwidth: number of bytes which may be sent
+        :param send: callback to send an item, returning the number of bytes written
+        :yield: sent items
+        """
+        # Only retain state of channels which are still due
+        previous_priorities = self.accumulated_priorities
+        previous_deferred_ticks = self.deferred_ticks
+
+        accumulated_priorities = self.accumulated_priorities = {}
+        deferred_ticks = self.deferred_ticks = {}
+
+        queue = []
+        for index, item in enumerate(items):
+            priority = previous_priorities.get(item[0], 0.0) + item[0].replication_priority
+            queue.append((-priority, index, item))
+
+        heapify(queue)
+
+        bytes_sent = 0
+        while queue and (bytes_sent < available_bandwidth or not bytes_sent):
+            _, _, item = heappop(queue)
+            bytes_sent += send(item)
+            yield item
+
+        # Defer remaining items
+        for negative_priority, _, item in queue:
+            channel = item[0]
+
+            accumulated_priorities[channel] = -negative_priority
+            deferred_ticks[channel] = previous_deferred_ticks.get(channel, 0) + 1
+
+        self.bytes_sent += bytes_sent
+        self.deferred_count += len(queue)
+
+        starvation_threshold = self.starvation_threshold
+        self.starved_count = sum(1 for ticks in deferred_ticks.values() if ticks >= starvation_threshold)
+        self.max_deferred_ticks = max(deferred_ticks.values(), default=0)
@@ -3,7 +3,7 @@ from inspect import getmembers
 from ..conditions import is_annotatable
 from ..decorators import get_annotation, set_annotation
 from ..metaclasses.register import TypeRegister
-from ..packet import PacketCollection
+from ..packet import PacketCollection, PacketPool
 
 
 __all__ = 'Dispatcher', 'InjectorStream', 'ProtocolHandler', 'StatusDispatcher', 'response_protocol', 'send_state'
@@ -18,6 +18,9 @@ class Dispatcher:
     def __init__(self):
         self.streams = []
 
+        # Pool of packets sent by streams
+        self.packet_pool = PacketPool()
+
     def create_stream(self, stream_cls):
         stream = stream_cls(self)
         self.streams.append(stream)
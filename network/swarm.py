@@ -0,0 +1,407 @@
+"""Headless load generator, which simulates a swarm of clients of a server.
+
+Each simulated client has its own socket, and a client connection (with the client handshake and replication streams)
+which is registered by the local address of its socket, so that many clients can run in one process. Replicables
+are shared by the clients of a process, whilst RPCs are only sent by the connection which owns their replicable.
+
+Clients may be spread across several spawned processes, so the setup and update functions given to
+:py:func:`run_swarm` must be importable. The setup function is called in each process to import the replicable classes
+of the game; the netmode is set to client by the swarm
+"""
+from .connection import Connection
+from .enums import ConnectionState, Netmodes
+from .network import NonBlockingSocketUDP
+from .socket_backends import create_socket_backend
+from .utilities import mean, percentile
+from .world_info import WorldInfo
+
+from argparse import ArgumentParser
+from importlib import import_module
+from multiprocessing import get_context
+from socket import gethostbyname
+from time import perf_counter, sleep
+
+try:
+    from os import sysconf
+
+except ImportError:
+    sysconf = None
+
+__all__ = ['SwarmClient', 'ClientSwarm', 'SwarmReport', 'run_swarm', 'run_swarm_process', 'get_process_cpu_time',
+           'import_function']
+
+
+def get_process_cpu_time(pid):
+    """Return CPU time (user and system) of a process in seconds, or None if it cannot be read on this platform
+
+    :param pid: process ID
+    """
+    if sysconf is None:
+        return None
+
+    try:
+        with open("/proc/{}/stat".format(pid)) as file:
+            stat = file.read()
+
+    except OSError:
+        return None
+
+    # Fields following the parenthesised command name, which may contain spaces
+    fields = stat[stat.rindex(")") + 2:].split()
+    user_ticks, system_ticks = int(fields[11]), int(fields[12])
+
+    return (user_ticks + system_ticks) / sysconf("SC_CLK_TCK")
+
+
+class SwarmReport:
+    """Results of a swarm run"""
+
+    percentiles = 0.5, 0.9, 0.99
+
+    def __init__(self, client_count=0, connected_count=0, duration=0.0, sent_bytes=0, received_bytes=0,
+                 latency_samples=None, server_cpu_time=None):
+        """
+        :param client_count: number of simulated clients
+        :param connected_count: number of clients which completed the handshake
+        :param duration: duration of run, in seconds
+        :param sent_bytes: bytes sent by all clients
+        :param received_bytes: bytes received by all clients
+        :param latency_samples: replication latency samples, in seconds
+        :param server_cpu_time: CPU time of server process during run, in seconds
+        """
+        if latency_samples is None:
+            latency_samples = []
+
+        self.client_count = client_count
+        self.connected_count = connected_count
+        self.duration = duration
+        self.sent_bytes = sent_bytes
+        self.received_bytes = received_bytes
+        self.latency_samples = latency_samples
+        self.server_cpu_time = server_cpu_time
+
+    def __repr__(self):
+        return "<SwarmReport: {}/{} clients connected, {:.0f} bytes sent and {:.0f} received per client>"\
+            .format(self.connected_count, self.client_count, self.sent_bytes_per_client,
+                    self.received_bytes_per_client)
+
+    @property
+    def sent_bytes_per_client(self):
+        return self.sent_bytes / max(self.client_count, 1)
+
+    @property
+    def received_bytes_per_client(self):
+        return self.received_bytes / max(self.client_count, 1)
+
+    @property
+    def server_cpu_per_client(self):
+        """Fraction of a CPU used by the server per connected client, or None if not measured"""
+        if self.server_cpu_time is None or not self.connected_count or not self.duration:
+            return None
+
+        return self.server_cpu_time / self.duration / self.connected_count
+
+    @property
+    def latency_percentiles(self):
+        """Return mapping from fraction to percentile of replication latency"""
+        samples = self.latency_samples
+        if not samples:
+            return {}
+
+        return {fraction: percentile(samples, fraction) for fraction in self.percentiles}
+
+    def merge(self, other):
+        """Add results of another run which ran concurrently (e.g. in another process)
+
+        :param other: SwarmReport instance
+        """
+        self.client_count += other.client_count
+        self.connected_count += other.connected_count
+        self.duration = max(self.duration, other.duration)
+        self.sent_bytes += other.sent_bytes
+        self.received_bytes += other.received_bytes
+        self.latency_samples.extend(other.latency_samples)
+
+    def format(self):
+        """Return human readable summary of results"""
+        lines = ["Clients: {} connected of {}".format(self.connected_count, self.client_count),
+                 "Bytes per client: {:.0f} sent, {:.0f} received".format(self.sent_bytes_per_client,
+                                                                          self.received_bytes_per_client)]
+
+        server_cpu_per_client = self.server_cpu_per_client
+        if server_cpu_per_client is not None:
+            lines.append("Server CPU per client: {:.3%}".format(server_cpu_per_client))
+
+        samples = self.latency_samples
+        if samples:
+            percentiles = ", ".join("p{:g} {:.1f}ms".format(fraction * 100, value * 1000)
+                                    for fraction, value in sorted(self.latency_percentiles.items()))
+            lines.append("Replication latency: mean {:.1f}ms, {}".format(mean(samples) * 1000, percentiles))
+
+        return "\n".join(lines)
+
+
+class SwarmClient:
+    """Simulated client, with its own socket and connection.
+
+    Replication latency is sampled as the time from sending a datagram until the first datagram from the server which
+    acknowledges it, so it includes the time waiting for the next server update
+    """
+
+    def __init__(self, server_address, socket_backend):
+        """
+        :param server_address: (host, port) address of server
+        :param socket_backend: socket backend of socket
+        """
+        self.server_address = server_address
+        self.socket_backend = socket_backend
+
+        self.socket = NonBlockingSocketUDP("", 0)
+
+        # Client connections are identified by the local address, as all clients share the same remote peer
+        self.connection = Connection(self.socket.getsockname())
+
+        self.sent_times = {}
+        self.latency_samples = []
+
+        # Metrics
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    @property
+    def is_connected(self):
+        """If the handshake with the server succeeded, and the connection has not since timed out"""
+        return bool(self.connection) and self.connection.handshake.state == ConnectionState.connected
+
+    @property
+    def replicable(self):
+        """Return replicable of this client's connection (e.g. player controller), or None if not replicating"""
+        replication_stream = self.connection.handshake.replication_stream
+        return getattr(replication_stream, "replicable", None)
+
+    def receive(self):
+        """Receive all data from socket"""
+        connection = self.connection
+        sequence_handler = connection.sequence_handler
+        sent_times = self.sent_times
+
+        for data, _ in self.socket_backend.receive_from(self.socket):
+            self.received_bytes += len(data)
+
+            # Sample latency of the acknowledged datagram
+            _, sequence_size = sequence_handler.unpack_from(data)
+            ack_base, _ = sequence_handler.unpack_from(data, offset=sequence_size)
+
+            sent_time = sent_times.pop(ack_base, None)
+            if sent_time is not None:
+                self.latency_samples.append(perf_counter() - sent_time)
+
+            connection.receive(data)
+
+    def send(self, full_update):
+        """Send connection data to server
+
+        :param full_update: whether this is a full send call
+        """
+        connection = self.connection
+        datagrams = connection.send(full_update)
+
+        if not datagrams:
+            return
+
+        # Remember when each sequence was sent, forgetting sequences which are never acknowledged
+        sent_times = self.sent_times
+        sent_time = perf_counter()
+        sequence_size = connection.sequence_max_size + 1
+
+        for index in range(len(datagrams)):
+            sent_times[(connection.local_sequence - index) % sequence_size] = sent_time
+
+        while len(sent_times) > connection.sent_window:
+            del sent_times[next(iter(sent_times))]
+
+        address = self.server_address
+        self.sent_bytes += self.socket_backend.send_to(self.socket, [(data, address) for data in datagrams])
+
+    def stop(self):
+        """Close connection and socket"""
+        if self.connection:
+            self.connection.deregister()
+
+        self.socket.close()
+
+
+class ClientSwarm:
+    """Swarm of simulated clients in this process.
+
+    The netmode of the process must be set to client before the swarm is created
+    """
+
+    def __init__(self, address, port, client_count, on_update=None, socket_backend=None):
+        """
+        :param address: address of server
+        :param port: port of server
+        :param client_count: number of simulated clients
+        :param on_update: function called with each connected client each update (e.g. to invoke RPCs)
+        :param socket_backend: socket backend shared by the sockets of all clients
+        """
+        if socket_backend is None:
+            socket_backend = create_socket_backend()
+
+        self.server_address = gethostbyname(address), port
+        self.on_update = on_update
+
+        self.clients = [SwarmClient(self.server_address, socket_backend) for _ in range(client_count)]
+
+    def step(self, full_update=True):
+        """Receive data, update connected clients and send data for all clients
+
+        :param full_update: whether this is a full send call
+        """
+        for client in self.clients:
+            client.receive()
+
+        if self.on_update is not None:
+            for client in self.clients:
+                if client.is_connected:
+                    self.on_update(client)
+
+        for client in self.clients:
+            if client.connection:
+                client.send(full_update)
+
+    def run(self, duration, update_rate=1/60):
+        """Update clients at the update rate for a duration, and return report of results
+
+        :param duration: duration of run, in seconds
+        :param update_rate: interval between updates, in seconds
+        """
+        started = perf_counter()
+        next_update = started
+
+        while perf_counter() - started < duration:
+            self.step()
+
+            # Skip updates which were missed
+            next_update = max(next_update + update_rate, perf_counter())
+            remaining_time = next_update - perf_counter()
+            if remaining_time > 0:
+                sleep(remaining_time)
+
+        clients = self.clients
+        report = SwarmReport(client_count=len(clients),
+                             connected_count=sum(client.is_connected for client in clients),
+                             duration=perf_counter() - started,
+                             sent_bytes=sum(client.sent_bytes for client in clients),
+                             received_bytes=sum(client.received_bytes for client in clients),
+                             latency_samples=[sample for client in clients for sample in client.latency_samples])
+        return report
+
+    def stop(self):
+        """Close all clients"""
+        for client in self.clients:
+            client.stop()
+
+
+def run_swarm_process(setup, address, port, client_count, duration, update_rate, on_update, report_queue):
+    """Run swarm in this process and put its report on a queue
+
+    :param setup: function called before running, which imports the replicable classes of the game
+    :param address: address of server
+    :param port: port of server
+    :param client_count: number of simulated clients
+    :param duration: duration of run, in seconds
+    :param update_rate: interval between updates, in seconds
+    :param on_update: function called with each connected client each update
+    :param report_queue: queue on which the SwarmReport is put
+    """
+    if setup is not None:
+        setup()
+
+    WorldInfo.netmode = Netmodes.client
+
+    swarm = ClientSwarm(address, port, client_count, on_update)
+
+    try:
+        report = swarm.run(duration, update_rate)
+
+    finally:
+        swarm.stop()
+
+    report_queue.put(report)
+
+
+def run_swarm(address, port, client_count, duration, process_count=1, setup=None, on_update=None,
+              update_rate=1/60, server_pid=None):
+    """Run swarm of simulated clients, spread across spawned processes, and return report of results
+
+    :param address: address of server
+    :param port: port of server
+    :param client_count: total number of simulated clients
+    :param duration: duration of run, in seconds
+    :param process_count: number of processes which run clients
+    :param setup: importable function called by each process, which imports the replicable classes of the game
+    :param on_update: importable function called with each connected client each update
+    :param update_rate: interval between updates, in seconds
+    :param server_pid: process ID of server, whose CPU time is measured if given
+    """
+    context = get_context("spawn")
+    report_queue = context.Queue()
+
+    # Spread clients evenly over processes
+    client_counts = [client_count // process_count + (index < client_count % process_count)
+                     for index in range(process_count)]
+
+    processes = [context.Process(target=run_swarm_process, daemon=True,
+                                 args=(setup, address, port, count, duration, update_rate, on_update, report_queue))
+                 for count in client_counts if count]
+
+    server_cpu_time = None if server_pid is None else get_process_cpu_time(server_pid)
+
+    for process in processes:
+        process.start()
+
+    # Allow time for processes to start and stop
+    timeout = duration + 60
+
+    report = SwarmReport()
+    for _ in processes:
+        report.merge(report_queue.get(timeout=timeout))
+
+    if server_cpu_time is not None:
+        report.server_cpu_time = get_process_cpu_time(server_pid) - server_cpu_time
+
+    for process in processes:
+        process.join()
+
+    return report
+
+
+def import_function(path):
+    """Return function from "module:function" path
+
+    :param path: path of function
+    """
+    module_name, function_name = path.split(":")
+    return getattr(import_module(module_name), function_name)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Simulate a swarm of clients of a server")
+    parser.add_argument("address", help="address of server")
+    parser.add_argument("port", type=int, help="port of server")
+    parser.add_argument("--clients", type=int, default=100, help="number of simulated clients")
+    parser.add_argument("--processes", type=int, default=1, help="number of processes which run clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="duration of run, in seconds")
+    parser.add_argument("--update-rate", type=float, default=1/60, help="interval between updates, in seconds")
+    parser.add_argument("--setup", help="module:function which imports the replicable classes of the game")
+    parser.add_argument("--update", help="module:function called with each connected client each update")
+    parser.add_argument("--server-pid", type=int, help="process ID of server, whose CPU time is measured")
+    arguments = parser.parse_args()
+
+    report = run_swarm(arguments.address, arguments.port, arguments.clients, arguments.duration,
+                       process_count=arguments.processes,
+                       setup=arguments.setup and import_function(arguments.setup),
+                       on_update=arguments.update and import_function(arguments.update),
+                       update_rate=arguments.update_rate, server_pid=arguments.server_pid)
+    print(report.format())
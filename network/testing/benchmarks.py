@@ -0,0 +1,582 @@
+"""Micro-benchmarks for the network package.
+
+Run with ``python -m network.testing.benchmarks``
+"""
+from array import array
+from timeit import default_timer
+from tracemalloc import get_traced_memory, start as start_tracing, stop as stop_tracing
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from random import Random
+
+from ..bitfield import BitField
+from ..compression import PacketCompressor, train_dictionary
+from ..connection import Connection
+from ..delta import DeltaDecoder, DeltaEncoder
+from ..descriptors import Attribute
+from ..enums import ConnectionProtocols, IterableCompressionType
+from ..flag_serialiser import FlagSerialiser
+from ..handlers import get_handler
+from ..network import send_connections
+from ..packet import Packet, PacketCollection, PacketPool, PacketWriter
+from ..struct import Struct
+from ..type_flag import TypeFlag
+
+try:
+    from ..serialiser import numpy_serialiser
+
+except ImportError:
+    numpy_serialiser = None
+
+__all__ = ['measure_allocations', 'measure_retained', 'measure_time', 'benchmark_packet_parsing',
+           'benchmark_flag_serialiser', 'benchmark_ack_window', 'benchmark_delta_compression',
+           'benchmark_quantised_floats', 'benchmark_float_lists', 'benchmark_numpy_columns', 'benchmark_packet_pool',
+           'benchmark_parallel_send', 'benchmark_compression', 'run_benchmarks']
+
+
+def measure_allocations(func, *args, **kwargs):
+    """Return peak number of bytes allocated by a function call
+
+    :param func: function to call
+    """
+    start_tracing()
+
+    try:
+        func(*args, **kwargs)
+        _, peak = get_traced_memory()
+
+    finally:
+        stop_tracing()
+
+    return peak
+
+
+def measure_retained(func, *args, **kwargs):
+    """Return peak number of bytes allocated by a function call, and number of bytes still allocated when it returns
+
+    :param func: function to call
+    """
+    start_tracing()
+
+    try:
+        result = func(*args, **kwargs)
+        retained, peak = get_traced_memory()
+
+    finally:
+        stop_tracing()
+
+    return peak, retained
+
+
+def measure_time(func, iterations, *args, **kwargs):
+    """Return mean duration of a function call
+
+    :param func: function to call
+    :param iterations: number of calls to average over
+    """
+    started = default_timer()
+
+    for _ in range(iterations):
+        func(*args, **kwargs)
+
+    return (default_timer() - started) / iterations
+
+
+def benchmark_packet_parsing(packet_count=64, payload_size=128, iterations=1000):
+    """Measure bytes allocated and time taken to parse a received datagram
+
+    :param packet_count: number of packets in the datagram
+    :param payload_size: size of each packet payload
+    :param iterations: number of parses to time
+    """
+    packets = [Packet(protocol=ConnectionProtocols.attribute_update, payload=bytes(payload_size))
+               for _ in range(packet_count)]
+    datagram = bytes(PacketCollection(packets).to_bytes())
+
+    # Received datagrams are views into the socket receive buffer
+    receive_buffer = memoryview(bytearray(datagram))
+    parse = PacketCollection.from_bytes
+
+    return {"datagram_size": len(datagram),
+            "allocated_bytes": measure_allocations(parse, receive_buffer),
+            "parse_time": measure_time(parse, iterations, receive_buffer)}
+
+
+def benchmark_flag_serialiser(iterations=10000):
+    """Measure time taken to pack and unpack a typical attribute update
+
+    :param iterations: number of calls to time
+    """
+    arguments = OrderedDict([("health", TypeFlag(int)), ("x", TypeFlag(float)), ("y", TypeFlag(float)),
+                             ("z", TypeFlag(float)), ("name", TypeFlag(str)), ("visible", TypeFlag(bool))])
+    data = {"health": 100, "x": 1.0, "y": 2.0, "z": 3.0, "name": "Player", "visible": True}
+
+    serialiser = FlagSerialiser(arguments)
+    packed = serialiser.pack(data)
+
+    return {"packed_size": len(packed),
+            "pack_time": measure_time(serialiser.pack, iterations, data),
+            "unpack_time": measure_time(serialiser.unpack, iterations, packed)}
+
+
+class _LegacyAckWindow:
+    """Reference implementation of dictionary and deque based ack tracking, for comparison"""
+
+    def __init__(self, ack_window):
+        self.ack_window = ack_window
+        self.requested_ack = {}
+        self.received_window = deque(maxlen=ack_window)
+        self.ack_bitfield = BitField(ack_window)
+
+    def register_sent(self, sequence, packet_collection):
+        self.requested_ack[sequence] = packet_collection
+
+    def register_received(self, sequence):
+        self.received_window.append(sequence)
+
+    def get_reliable_information(self, remote_sequence):
+        ack_bitfield = self.ack_bitfield
+
+        for index in range(self.ack_window):
+            packet_sqn = remote_sequence - (index + 1)
+
+            if packet_sqn < 0:
+                continue
+
+            ack_bitfield[index] = packet_sqn in self.received_window
+
+        return ack_bitfield
+
+    def handle_reliable_information(self, ack_base, ack_bitfield):
+        requested_ack = self.requested_ack
+
+        for relative_sequence in range(self.ack_window):
+            absolute_sequence = ack_base - (relative_sequence + 1)
+
+            if ack_bitfield[relative_sequence] and absolute_sequence in requested_ack:
+                requested_ack.pop(absolute_sequence).on_ack()
+
+        if ack_base in requested_ack:
+            requested_ack.pop(ack_base).on_ack()
+
+        for absolute_sequence in [s for s in requested_ack if (ack_base - s) >= self.ack_window]:
+            requested_ack.pop(absolute_sequence).to_reliable().on_not_ack()
+
+
+def _exchange_acks(sender, receiver, latency, iterations):
+    """Send packets from sender to receiver, acknowledging them after a fixed latency
+
+    :param sender: ack tracker of sending peer
+    :param receiver: ack tracker of receiving peer
+    :param latency: number of sent packets in flight
+    :param iterations: number of packets to send
+    """
+    packet_collection = PacketCollection()
+
+    for sequence in range(1, iterations + 1):
+        sender.local_sequence = sequence
+        sender.register_sent(sequence, packet_collection)
+
+        received_sequence = sequence - latency
+        if received_sequence < 1:
+            continue
+
+        receiver.register_received(received_sequence)
+        sender.handle_reliable_information(received_sequence, receiver.get_reliable_information(received_sequence))
+
+
+def benchmark_ack_window(ack_window=32, latency=8, iterations=10000):
+    """Measure time taken to track acknowledgements per sent packet, against the legacy implementation
+
+    :param ack_window: number of packets acknowledged per packet
+    :param latency: number of sent packets in flight
+    :param iterations: number of packets to send
+    """
+    legacy_time = measure_time(_exchange_acks, 1, _LegacyAckWindow(ack_window), _LegacyAckWindow(ack_window),
+                               latency, iterations)
+
+    default_ack_window, Connection.ack_window = Connection.ack_window, ack_window
+
+    try:
+        sender = Connection(("benchmark", 0))
+        receiver = Connection(("benchmark", 1))
+
+    finally:
+        Connection.ack_window = default_ack_window
+
+    try:
+        ring_time = measure_time(_exchange_acks, 1, sender, receiver, latency, iterations)
+
+    finally:
+        sender.deregister()
+        receiver.deregister()
+
+    return {"legacy_time": legacy_time / iterations,
+            "ring_time": ring_time / iterations}
+
+
+class _PhysicsState(Struct):
+    """Rigid body state of scalar fields, for benchmarks independent of the game system"""
+    position_x = Attribute(0.0)
+    position_y = Attribute(0.0)
+    position_z = Attribute(0.0)
+    velocity_x = Attribute(0.0)
+    velocity_y = Attribute(0.0)
+    velocity_z = Attribute(0.0)
+    angular_x = Attribute(0.0)
+    angular_y = Attribute(0.0)
+    angular_z = Attribute(0.0)
+    orientation_x = Attribute(0.0)
+    orientation_y = Attribute(0.0)
+    orientation_z = Attribute(0.0)
+
+    collision_group = Attribute(0)
+    collision_mask = Attribute(0)
+
+
+def benchmark_delta_compression(latency=4, iterations=1000):
+    """Measure bytes sent and time taken to pack and unpack a moving rigid body state, against full state updates
+
+    :param latency: number of updates sent before an update is acknowledged
+    :param iterations: number of updates to send
+    """
+    state = _PhysicsState()
+    state_flag = TypeFlag(_PhysicsState, delta=True)
+    handler = get_handler(state_flag)
+
+    encoder = DeltaEncoder(state_flag)
+    decoder = DeltaDecoder(state_flag)
+    received_state = _PhysicsState()
+
+    full_bytes = delta_bytes = 0
+    full_time = delta_time = 0.0
+    in_flight = deque()
+
+    for tick in range(iterations):
+        state.position_x += 0.16
+        state.position_z -= 0.05
+        state.velocity_x = 9.6 + (tick % 7) * 0.01
+        state.orientation_z += 0.02
+
+        started = default_timer()
+        packed = handler.pack(state)
+        handler.unpack_merge(received_state, packed)
+        full_time += default_timer() - started
+        full_bytes += len(packed)
+
+        started = default_timer()
+        payload, snapshot_id = encoder.encode(state)
+        decoder.decode(payload, received_state)
+        delta_time += default_timer() - started
+        delta_bytes += len(payload)
+
+        in_flight.append(snapshot_id)
+        if len(in_flight) > latency:
+            encoder.on_ack(in_flight.popleft())
+
+    return {"full_bytes": full_bytes / iterations,
+            "delta_bytes": delta_bytes / iterations,
+            "full_time": full_time / iterations,
+            "delta_time": delta_time / iterations}
+
+
+class _QuantisedPhysicsState(Struct):
+    """Rigid body state of quantised scalar fields, for benchmarks independent of the game system"""
+    position_x = Attribute(0.0, min=-1000.0, max=1000.0, precision=0.01)
+    position_y = Attribute(0.0, min=-1000.0, max=1000.0, precision=0.01)
+    position_z = Attribute(0.0, min=-1000.0, max=1000.0, precision=0.01)
+    velocity_x = Attribute(0.0, min=-100.0, max=100.0, precision=0.01)
+    velocity_y = Attribute(0.0, min=-100.0, max=100.0, precision=0.01)
+    velocity_z = Attribute(0.0, min=-100.0, max=100.0, precision=0.01)
+    angular_x = Attribute(0.0, min=-50.0, max=50.0, precision=0.01)
+    angular_y = Attribute(0.0, min=-50.0, max=50.0, precision=0.01)
+    angular_z = Attribute(0.0, min=-50.0, max=50.0, precision=0.01)
+    orientation_x = Attribute(0.0, min=-3.1416, max=3.1416, precision=0.001)
+    orientation_y = Attribute(0.0, min=-3.1416, max=3.1416, precision=0.001)
+    orientation_z = Attribute(0.0, min=-3.1416, max=3.1416, precision=0.001)
+
+    collision_group = Attribute(0)
+    collision_mask = Attribute(0)
+
+
+def benchmark_quantised_floats(actors=100, iterations=100):
+    """Measure bytes per actor and time taken to pack and unpack rigid body states, against unquantised floats
+
+    :param actors: number of actor states to pack
+    :param iterations: number of times to pack all states
+    """
+    results = {}
+
+    for name, state_cls in (("float", _PhysicsState), ("quantised", _QuantisedPhysicsState)):
+        handler = get_handler(TypeFlag(state_cls))
+        states = []
+
+        for index in range(actors):
+            state = state_cls()
+            state.position_x = index * 1.5
+            state.velocity_y = -9.81
+            state.orientation_z = index * 0.01
+            states.append(state)
+
+        packed_states = [handler.pack(state) for state in states]
+
+        def unpack_states():
+            for packed_state in packed_states:
+                handler.unpack_from(packed_state)
+
+        results[name + "_bytes_per_actor"] = sum(len(p) for p in packed_states) / actors
+        results[name + "_pack_time"] = measure_time(lambda: [handler.pack(s) for s in states], iterations) / actors
+        results[name + "_unpack_time"] = measure_time(unpack_states, iterations) / actors
+
+    return results
+
+
+def benchmark_float_lists(length=1000, iterations=1000):
+    """Measure time taken to pack and unpack float lists and arrays, against packing each element individually
+
+    :param length: number of elements
+    :param iterations: number of times to pack and unpack
+    """
+    no_compress = IterableCompressionType.no_compress
+    element_handler = get_handler(TypeFlag(float))
+    list_handler = get_handler(TypeFlag(list, element_flag=TypeFlag(float), compression=no_compress))
+    array_handler = get_handler(TypeFlag(array, element_flag=TypeFlag(float), compression=no_compress))
+
+    values = [index * 0.5 for index in range(length)]
+    array_values = array(array_handler.typecode, values)
+    packed_values = list_handler.pack(values)
+
+    def pack_elements():
+        return b''.join([element_handler.pack(value) for value in values])
+
+    element_size = element_handler.size()
+    elements_offset = len(packed_values) - length * element_size
+
+    def unpack_elements():
+        unpack_from = element_handler.unpack_from
+        return [unpack_from(packed_values, offset)[0]
+                for offset in range(elements_offset, len(packed_values), element_size)]
+
+    return {"element_pack_time": measure_time(pack_elements, iterations),
+            "element_unpack_time": measure_time(unpack_elements, iterations),
+            "list_pack_time": measure_time(list_handler.pack, iterations, values),
+            "list_unpack_time": measure_time(list_handler.unpack_from, iterations, packed_values),
+            "array_pack_time": measure_time(array_handler.pack, iterations, array_values),
+            "array_unpack_time": measure_time(array_handler.unpack_from, iterations, packed_values)}
+
+
+def benchmark_numpy_columns(actors=1000, iterations=1000):
+    """Measure time taken to pack and unpack the positions of many actors as one float32[N, 3] column, against the
+    struct handler. Returns no results if NumPy is not installed
+
+    :param actors: number of actor positions
+    :param iterations: number of times to pack and unpack
+    """
+    if numpy_serialiser is None:
+        return {}
+
+    numpy_handler = numpy_serialiser.Float32
+    struct_handler = numpy_handler.handler
+
+    count = actors * 3
+    values = [index * 0.5 for index in range(count)]
+    packed_values = struct_handler.pack_multiple(values, count)
+    positions, _ = numpy_handler.unpack_column(packed_values, (actors, 3))
+
+    return {"struct_pack_time": measure_time(struct_handler.pack_multiple, iterations, values, count),
+            "struct_unpack_time": measure_time(struct_handler.unpack_multiple, iterations, packed_values, count),
+            "numpy_pack_time": measure_time(numpy_handler.pack_multiple, iterations, values, count),
+            "numpy_unpack_time": measure_time(numpy_handler.unpack_multiple, iterations, packed_values, count),
+            "column_pack_time": measure_time(numpy_handler.pack_column, iterations, positions),
+            "column_unpack_time": measure_time(numpy_handler.unpack_column, iterations, packed_values,
+                                               (actors, 3))}
+
+
+class _LegacyPacket(Packet):
+    """Reference implementation of packet with a lru_cache on to_bytes, for comparison"""
+
+    __slots__ = ()
+
+    @lru_cache()
+    def to_bytes(self):
+        data = self.packed_protocol + self.payload
+        return self._size_handler.pack(len(data)) + data
+
+
+def _send_reliable_packets(create_packet, ticks, packet_count, payload_size, latency):
+    """Send reliable packets each tick, acknowledging them after a fixed latency
+
+    :param create_packet: packet factory
+    :param ticks: number of ticks to send
+    :param packet_count: number of packets sent each tick
+    :param payload_size: size of each packet payload
+    :param latency: number of ticks in flight
+    """
+    protocol = ConnectionProtocols.attribute_update
+    writer = PacketWriter(Connection.mtu)
+    in_flight = deque()
+
+    for tick in range(ticks):
+        packet_collection = PacketCollection([create_packet(protocol=protocol, payload=bytes(payload_size),
+                                                            reliable=True) for _ in range(packet_count)])
+        writer.reset()
+        packet_collection.write_to(writer)
+        writer.to_bytes()
+
+        in_flight.append(packet_collection)
+        if len(in_flight) > latency:
+            in_flight.popleft().on_ack()
+
+    while in_flight:
+        in_flight.popleft().on_ack()
+
+    return create_packet
+
+
+def benchmark_packet_pool(ticks=2000, packet_count=16, payload_size=64, latency=8):
+    """Measure memory and time taken to send reliable packets under sustained load, against packets cached by
+    a lru_cache on to_bytes
+
+    :param ticks: number of ticks to send
+    :param packet_count: number of packets sent each tick
+    :param payload_size: size of each packet payload
+    :param latency: number of ticks before packets are acknowledged
+    """
+    _LegacyPacket.to_bytes.cache_clear()
+
+    arguments = ticks, packet_count, payload_size, latency
+    legacy_peak, legacy_retained = measure_retained(_send_reliable_packets, _LegacyPacket, *arguments)
+    _LegacyPacket.to_bytes.cache_clear()
+
+    pool = PacketPool()
+    pooled_peak, pooled_retained = measure_retained(_send_reliable_packets, pool.create, *arguments)
+
+    return {"legacy_peak_bytes": legacy_peak,
+            "legacy_retained_bytes": legacy_retained,
+            "pooled_peak_bytes": pooled_peak,
+            "pooled_retained_bytes": pooled_retained,
+            "pooled_allocated_packets": pool.allocated_count,
+            "pooled_reused_packets": pool.reused_count,
+            "legacy_time": measure_time(_send_reliable_packets, 1, _LegacyPacket, *arguments) / ticks,
+            "pooled_time": measure_time(_send_reliable_packets, 1, PacketPool().create, *arguments) / ticks}
+
+
+def benchmark_parallel_send(connection_count=32, packet_count=64, payload_size=256, iterations=20,
+                            worker_counts=(1, 2, 4, 8)):
+    """Measure time taken to send to many connections sequentially, and with thread pools of several sizes.
+
+    Packets are pulled from connections sequentially in every case, and only the datagrams are written (and
+    compressed) by the thread pool. Times are measured with and without compression negotiated.
+
+    Without compression no work releases the GIL, so threads are slower than sequential sends (by 10-15% when
+    measured). With compression, zlib releases the GIL, but on a single core threads were measured to perform no
+    better than sequential sends, so any gain requires several cores
+
+    :param connection_count: number of connections
+    :param packet_count: number of packets sent by each connection per send
+    :param payload_size: size of each packet payload
+    :param iterations: number of sends to time
+    :param worker_counts: numbers of worker threads to time
+    """
+    connections = [Connection(("benchmark", port)) for port in range(connection_count)]
+    protocol = ConnectionProtocols.attribute_update
+
+    # Half random payloads, which compress enough to be sent compressed
+    random_generator = Random(0)
+    payloads = [bytes(random_generator.getrandbits(8) for _ in range(payload_size // 2)) + bytes(payload_size // 2)
+                for _ in range(packet_count)]
+
+    def send_all(executor):
+        total_time = 0.0
+
+        for _ in range(iterations):
+            for connection in connections:
+                connection.injector.queue.extend([Packet(protocol=protocol, payload=payload) for payload in payloads])
+
+            started = default_timer()
+            send_connections(connections, True, executor)
+            total_time += default_timer() - started
+
+        return total_time / iterations
+
+    results = {}
+
+    try:
+        for prefix, is_negotiated in (("uncompressed", False), ("compressed", True)):
+            for connection in connections:
+                connection.compressor.is_negotiated = is_negotiated
+
+            results["{}_sequential_time".format(prefix)] = send_all(None)
+
+            for worker_count in worker_counts:
+                with ThreadPoolExecutor(worker_count) as executor:
+                    results["{}_threads_{}_time".format(prefix, worker_count)] = send_all(executor)
+
+    finally:
+        for connection in connections:
+            connection.deregister()
+
+    return results
+
+
+def benchmark_compression(datagrams=1000, actors=16):
+    """Measure bytes sent and time taken to compress datagrams of rigid body updates, with and without a preset
+    dictionary trained from earlier datagrams
+
+    :param datagrams: number of datagrams to compress (as many again are used to train the dictionary)
+    :param actors: number of attribute updates per datagram
+    """
+    state = _PhysicsState()
+    handler = get_handler(TypeFlag(_PhysicsState))
+    protocol = ConnectionProtocols.attribute_update
+
+    def create_datagram(tick):
+        packets = []
+
+        for actor in range(actors):
+            state.position_x = actor * 2.0 + tick * 0.16
+            state.position_z = actor * 0.5 - tick * 0.05
+            state.velocity_x = 9.6 + (tick % 7) * 0.01
+            state.collision_group = actor % 4
+
+            packets.append(Packet(protocol=protocol, payload=bytes((actor,)) + handler.pack(state)))
+
+        return PacketCollection(packets).to_bytes()
+
+    training_datagrams = [create_datagram(tick) for tick in range(datagrams)]
+    sent_datagrams = [create_datagram(tick) for tick in range(datagrams, 2 * datagrams)]
+
+    results = {"raw_bytes": sum(len(datagram) for datagram in sent_datagrams) / datagrams}
+
+    for name, compressor in (("zlib", PacketCompressor()),
+                             ("dictionary", PacketCompressor(train_dictionary(training_datagrams)))):
+        sent_bytes = 0
+
+        started = default_timer()
+
+        for datagram in sent_datagrams:
+            compressed = compressor.compress(datagram)
+            sent_bytes += len(datagram) if compressed is None else len(compressed)
+
+        results["{}_time".format(name)] = (default_timer() - started) / datagrams
+        results["{}_bytes".format(name)] = sent_bytes / datagrams
+        results["{}_skipped".format(name)] = compressor.skipped_count
+
+    return results
+
+
+def run_benchmarks():
+    for name, benchmark in sorted(globals().items()):
+        if not name.startswith("benchmark_"):
+            continue
+
+        print(name)
+
+        for key, value in sorted(benchmark().items()):
+            print("    {}: {}".format(key, value))
+
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -1,15 +1,65 @@
 import unittest
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from os import path as os_path
+from socket import socket, AF_INET, SOCK_DGRAM
+from tempfile import TemporaryDirectory
+from threading import current_thread
+from types import SimpleNamespace
+from time import sleep
+from timeit import default_timer
 
 from ..bitfield import BitField, USE_BITARRAY
+from ..bitstream import BitReader, BitWriter
+from ..channel import Channel
+from ..async_network import AsyncNetwork, AsyncNetworkProtocol
+from ..capture import CaptureDirection, CaptureReader, CaptureWriter
+from ..compression import PacketCompressor, train_dictionary
+from ..connection import Connection
+from ..containers import AttributeStorageContainer
+from ..delta import DeltaDecoder, DeltaEncoder
 from ..descriptors import Attribute
+from ..enums import ConnectionProtocols, ConnectionState, IterableCompressionType, Netmodes, Roles
+from ..flag_serialiser import FlagSerialiser
 from ..type_flag import TypeFlag
 from ..handlers import get_handler
 from ..native_handlers import *
+from ..network import Network, send_connections
+from ..packet import Packet, PacketCollection, PacketPool, PacketWriter
+from ..profiler import profiler
+from ..relevancy import RelevancyGrid
+from ..replay import CaptureReplay
+from ..replicable import Replicable
+from ..rules import ReplicationRulesBase
+from ..signals import Signal
+from ..socket_backends import BatchedSocketBackend, SocketBackend
+from ..simple_network import SimpleNetwork, respect_interval
+from ..sharding import (SharedMemoryRing, ShardWorker, WorldSnapshotReader, WorldSnapshotWriter, get_front_id_range,
+                        get_worker_id_range, pack_address, unpack_address)
+from ..streams import Dispatcher, FragmentStream, PriorityScheduler, ReplicationStream
 from ..struct import Struct
+from ..swarm import ClientSwarm, SwarmClient
 from ..serialiser import *
+from ..utilities import percentile
+from ..world_info import WorldInfo
 
+try:
+    from ..serialiser import numpy_serialiser
 
-__all__ = ["SerialiserTest", "run_tests"]
+except ImportError:
+    numpy_serialiser = None
+
+try:
+    from game_system.physics import RigidBodyStateStore
+
+except ImportError:
+    RigidBodyStateStore = None
+
+
+__all__ = ["SerialiserTest", "ShardingTest", "NetworkTest", "FragmentationTest", "ConnectionTest",
+           "RelevancyTest", "CaptureTest", "SwarmTest", "ChannelTest", "SchedulerTest", "PhysicsTest",
+           "CompressionTest", "PacketPoolTest", "run_tests"]
 
 
 class SerialiserTest(unittest.TestCase):
@@ -159,6 +209,17 @@ class SerialiserTest(unittest.TestCase):
         packed_value = bitfield_handler.pack(bitfield)
         self.assertEqual(packed_value, self.py_bitfield_variable_value)
 
+    def test_bitfield_mask(self):
+        bitfield = BitField.from_iterable(self.bitfield_list)
+        mask = bitfield.to_int()
+
+        self.assertEqual(BitField.from_int(len(self.bitfield_list), mask)[:], self.bitfield_list)
+        self.assertEqual(list(bitfield.iter_set_bits()), [i for i, value in enumerate(self.bitfield_list) if value])
+        self.assertEqual(bitfield.popcount(), sum(self.bitfield_list))
+
+        bitfield.shift_in(True)
+        self.assertEqual(bitfield[:], [True] + self.bitfield_list[:-1])
+
     def test_pack_int_64bit(self):
         self.assertEqual(UInt64.pack(self.int_value_64bit), self.int_bytes_string64bit)
 
@@ -183,18 +244,1759 @@ class SerialiserTest(unittest.TestCase):
     def test_unpack_int_8bit(self):
         self.assertEqual(UInt8.unpack_from(self.int_bytes_string8bit)[0],self.int_value_8bit)
 
+    def test_get_int_varint(self):
+        self.assertIs(get_handler(TypeFlag(int, encoding="varint")), VarUInt)
+        self.assertIs(get_handler(TypeFlag(int, encoding="varint", signed=True)), VarInt)
+
+    def test_varint_round_trip(self):
+        values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32, 2 ** 70]
+
+        for value in values:
+            packed = VarUInt.pack(value)
+            self.assertEqual(VarUInt.unpack_from(packed), (value, len(packed)))
+            self.assertEqual(VarUInt.size(packed), len(packed))
+
+        self.assertEqual(len(VarUInt.pack(127)), 1)
+        self.assertEqual(len(VarUInt.pack(128)), 2)
+
+        packed = VarUInt.pack_multiple(values, len(values))
+        self.assertEqual(VarUInt.unpack_multiple(b'\x00' + packed, len(values), 1), (values, len(packed)))
+
+    def test_zigzag_varint_round_trip(self):
+        values = [0, -1, 1, -64, 63, -65, 64, -2 ** 40, 2 ** 40]
+
+        for value in values:
+            packed = VarInt.pack(value)
+            self.assertEqual(VarInt.unpack_from(packed), (value, len(packed)))
+
+        self.assertEqual(len(VarInt.pack(-64)), 1)
+        self.assertEqual(len(VarInt.pack(-65)), 2)
+
+        packed = VarInt.pack_multiple(values, len(values))
+        self.assertEqual(VarInt.unpack_multiple(packed, len(values))[0], values)
+
+    def test_packet_writer(self):
+        writer = PacketWriter(4)
+
+        for handler, value in ((UInt16, 1000), (Float64, 0.5), (VarUInt, 5), (VarUInt, 300), (VarInt, -65)):
+            writer.write_value(handler, value)
+
+        self.assertEqual(writer.to_bytes(), UInt16.pack(1000) + Float64.pack(0.5) + VarUInt.pack(5) +
+                         VarUInt.pack(300) + VarInt.pack(-65))
+
+        packets = PacketCollection([Packet(protocol=1, payload=b'abc'), Packet(protocol=200, payload=bytes(200))])
+
+        # Buffer is reused, and may be larger than the written data
+        writer.reset()
+        packets.write_to(writer)
+
+        self.assertEqual(writer.to_bytes(), packets.to_bytes())
+        self.assertEqual(packets.size, len(packets.to_bytes()))
+
+    def test_string_handler_cache(self):
+        # String and bytes handlers are built once for each length header
+        self.assertIs(get_handler(TypeFlag(str)), get_handler(TypeFlag(str)))
+        self.assertIs(get_handler(TypeFlag(bytes)), get_handler(TypeFlag(bytes)))
+        self.assertIsNot(get_handler(TypeFlag(str)), get_handler(TypeFlag(str, max_length=2 ** 16 - 1)))
+
+        for max_length in 255, 2 ** 16 - 1:
+            string_handler = get_handler(TypeFlag(str, max_length=max_length))
+            bytes_handler = get_handler(TypeFlag(bytes, max_length=max_length))
+
+            value = "handler" * 30
+            self.assertEqual(string_handler.unpack_from(string_handler.pack(value))[0], value)
+            self.assertEqual(bytes_handler.unpack_from(bytes_handler.pack(value.encode()))[0], value.encode())
+
     def test_pack_float(self):
         self.assertEqual(Float64.pack(self.float_value), self.float_bytes)
 
     def test_unpack_float(self):
         self.assertEqual(Float64.unpack_from(self.float_bytes)[0], self.float_value)
 
+    def test_get_float_quantised(self):
+        handler = get_handler(TypeFlag(float, min=-100.0, max=100.0, precision=0.01))
+
+        self.assertIsInstance(handler, QuantisedFloat)
+        self.assertEqual(handler.bits, 15)
+        self.assertEqual(handler.size(), 2)
+
+    def test_quantised_float_round_trip(self):
+        handler = get_handler(TypeFlag(float, min=-100.0, max=100.0, precision=0.01))
+        values = [-100.0, -12.3456, 0.0, 0.004, 33.333, 99.995, 100.0]
+
+        for value in values:
+            unpacked_value, size = handler.unpack_from(handler.pack(value))
+            self.assertAlmostEqual(unpacked_value, value, delta=handler.precision / 2 + 1e-9)
+            self.assertEqual(size, handler.size())
+
+        # Values are clamped to range
+        self.assertEqual(handler.unpack_from(handler.pack(150.0))[0], 100.0)
+        self.assertEqual(handler.unpack_from(handler.pack(-150.0))[0], -100.0)
+
+        # Multiple values are bit-packed together
+        packed = handler.pack_multiple(values, len(values))
+        self.assertEqual(len(packed), bits_to_bytes(handler.bits * len(values)))
+
+        unpacked_values, size = handler.unpack_multiple(packed, len(values))
+        for unpacked_value, value in zip(unpacked_values, values):
+            self.assertAlmostEqual(unpacked_value, value, delta=handler.precision / 2 + 1e-9)
+
     def test_pack_bool(self):
         self.assertEqual(BoolHandler.pack(self.bool_value), self.bool_bytes)
 
     def test_unpack_bool(self):
         self.assertEqual(BoolHandler.unpack_from(self.bool_bytes)[0], self.bool_value)
 
+    def test_unpack_string_from_view(self):
+        handler = get_handler(TypeFlag(str))
+        bytes_string = memoryview(bytearray(b'\x00' + handler.pack("TestString")))
+
+        self.assertEqual(handler.unpack_from(bytes_string, 1), ("TestString", 11))
+
+    def test_flag_serialiser_merged_fields(self):
+        arguments = OrderedDict([("x", TypeFlag(float)), ("y", TypeFlag(float)), ("name", TypeFlag(str)),
+                                 ("visible", TypeFlag(bool))])
+        serialiser = FlagSerialiser(arguments)
+
+        full_data = {"x": 1.0, "y": 2.0, "name": "Test", "visible": True}
+        partial_data = {"x": None, "y": 2.0, "visible": False}
+
+        for data in (full_data, partial_data):
+            self.assertEqual(dict(serialiser.unpack(serialiser.pack(data))), data)
+
+    def test_pack_lists(self):
+        lists = [[], [1.0, 2.5, 2.5, 2.5, -3.0] * 20], [[], [True, True, False] * 5], [[], ["a", "bb", "bb", ""]]
+        element_flags = TypeFlag(float), TypeFlag(bool), TypeFlag(str)
+
+        compression_types = (IterableCompressionType.auto, IterableCompressionType.compress,
+                             IterableCompressionType.no_compress)
+
+        for compression in compression_types:
+            for element_flag, values in zip(element_flags, lists):
+                handler = get_handler(TypeFlag(list, element_flag=element_flag, compression=compression))
+
+                for value in values:
+                    packed = handler.pack(value)
+                    self.assertEqual(handler.unpack_from(packed), (value, len(packed)))
+                    self.assertEqual(handler.size(packed), len(packed))
+
+    def test_pack_array(self):
+        list_handler = get_handler(TypeFlag(list, element_flag=TypeFlag(float)))
+        array_handler = get_handler(TypeFlag(array, element_flag=TypeFlag(float)))
+
+        values = array(array_handler.typecode, [1.0, 2.5, -3.0] * 10)
+        packed = array_handler.pack(values)
+
+        # Arrays share the packed format of lists
+        self.assertEqual(packed, list_handler.pack(values.tolist()))
+        self.assertEqual(array_handler.unpack_from(packed), (values, len(packed)))
+        self.assertIsInstance(array_handler.unpack_from(packed)[0], array)
+
+        with self.assertRaises(TypeError):
+            get_handler(TypeFlag(array, element_flag=TypeFlag(str)))
+
+    @unittest.skipIf(numpy_serialiser is None, "NumPy is not installed")
+    def test_numpy_parity(self):
+        handlers = (numpy_serialiser.UInt8, numpy_serialiser.UInt16, numpy_serialiser.UInt32,
+                    numpy_serialiser.UInt64, numpy_serialiser.Int8, numpy_serialiser.Int16, numpy_serialiser.Int32,
+                    numpy_serialiser.Int64, numpy_serialiser.Float32, numpy_serialiser.Float64)
+
+        for handler in handlers:
+            if handler.dtype.kind == "f":
+                values = [0.0, -1.5, 1024.5, 3.25]
+
+            elif handler.dtype.kind == "i":
+                values = [0, -1, 100, -100]
+
+            else:
+                values = [0, 1, 100, 255]
+
+            packed = handler.handler.pack_multiple(values, len(values))
+            self.assertEqual(handler.pack_multiple(values, len(values)), packed)
+
+            unpacked_values, size = handler.unpack_multiple(b'\x00' + packed, len(values), 1)
+            self.assertEqual(unpacked_values, list(handler.handler.unpack_multiple(packed, len(values))[0]))
+            self.assertEqual(size, len(packed))
+
+        self.assertIs(numpy_serialiser.int_selector(TypeFlag(int)), numpy_serialiser.UInt8)
+        self.assertIs(numpy_serialiser.int_selector(TypeFlag(int, max_value=70000)), numpy_serialiser.UInt32)
+        self.assertIs(numpy_serialiser.float_selector(TypeFlag(float, max_precision=True)), numpy_serialiser.Float64)
+
+    @unittest.skipIf(numpy_serialiser is None, "NumPy is not installed")
+    def test_numpy_columns(self):
+        handler = numpy_serialiser.Float32
+        positions = [[float(i), float(i) * 2, -1.0] for i in range(10)]
+
+        packed = handler.pack_column(positions)
+        self.assertEqual(packed, Float32.pack_multiple([c for p in positions for c in p], 30))
+
+        columns, size = handler.unpack_column(b'\x00' + packed, (10, 3), 1)
+        self.assertEqual(columns.shape, (10, 3))
+        self.assertEqual(columns.tolist(), positions)
+        self.assertEqual(size, len(packed))
+
+    def test_bit_stream(self):
+        values = [(5, 3), (0, 1), (1, 1), (1000, 10), (2 ** 40 + 3, 41), (0, 7), (255, 8)]
+
+        writer = BitWriter()
+        for value, bits in values:
+            writer.write(value, bits)
+
+        bytes_string = writer.to_bytes()
+        self.assertEqual(len(bytes_string), bits_to_bytes(sum(bits for _, bits in values)))
+
+        reader = BitReader(bytes_string)
+        self.assertEqual([reader.read(bits) for _, bits in values], [value for value, _ in values])
+
+    def test_flag_serialiser_bit_packed(self):
+        arguments = OrderedDict([("health", TypeFlag(int, max_value=100)), ("visible", TypeFlag(bool)),
+                                 ("x", TypeFlag(float)), ("name", TypeFlag(str)), ("roles", TypeFlag(Roles)),
+                                 ("flags", TypeFlag(BitField, fields=3)), ("alive", TypeFlag(bool))])
+        serialiser = FlagSerialiser(arguments, bit_packed=True)
+        byte_serialiser = FlagSerialiser(arguments)
+
+        data = {"health": 99, "visible": True, "x": 1.5, "name": "Test", "roles": Roles(Roles.authority, Roles.none),
+                "flags": BitField.from_iterable([True, False, True]), "alive": None}
+
+        packed = serialiser.pack(data)
+        self.assertLess(len(packed), len(byte_serialiser.pack(data)))
+
+        unpacked = dict(serialiser.unpack(b'\x00' + packed, offset=1))
+        self.assertEqual(unpacked["flags"][:], data["flags"][:])
+        self.assertEqual((unpacked["roles"].local, unpacked["roles"].remote), (Roles.none, Roles.authority))
+
+        for key in ("health", "visible", "x", "name", "alive"):
+            self.assertEqual(unpacked[key], data[key])
+
+    def test_delta_codec(self):
+        struct = self.create_struct()
+        delta_flag = TypeFlag(type(struct), delta=True)
+
+        encoder = DeltaEncoder(delta_flag)
+        decoder = DeltaDecoder(delta_flag)
+
+        full_payload, snapshot_id = encoder.encode(struct)
+        received = decoder.decode(full_payload)
+        encoder.on_ack(snapshot_id)
+
+        struct.x = 3.5
+        delta_payload, _ = encoder.encode(struct)
+        self.assertLess(len(delta_payload), len(full_payload))
+
+        # Lost payloads are not required to decode later payloads
+        struct.y = -2.25
+        struct.name = "Changed"
+        delta_payload, _ = encoder.encode(struct)
+        decoder.decode(delta_payload, received)
+
+        self.assertAlmostEqual(received.x, struct.x, delta=encoder.precision)
+        self.assertAlmostEqual(received.y, struct.y, delta=encoder.precision)
+        self.assertEqual(received.name, struct.name)
+
+        # Outdated payloads are not applied
+        self.assertIsNone(decoder.decode(full_payload, received))
+
+
+class ShardTestPawn(Replicable):
+    health = Attribute(100)
+    name = Attribute(data_type=str)
+
+
+class ShardingTest(unittest.TestCase):
+
+    worker_id_count = 64
+
+    def setUp(self):
+        # Front and worker processes are emulated by separate register contexts
+        self.front_context = Replicable.get_context_manager("Front")
+        self.worker_context = Replicable.get_context_manager("Worker")
+        self.connection_context = Connection.get_context_manager("Worker")
+
+        with self.front_context:
+            Replicable.set_id_range(get_front_id_range(self.worker_id_count))
+
+        with self.worker_context:
+            Replicable.set_id_range(get_worker_id_range(self.worker_id_count))
+
+    def tearDown(self):
+        for context in (self.front_context, self.worker_context):
+            with context:
+                Replicable.clear_graph()
+
+        with self.connection_context:
+            Connection.clear_graph()
+
+    def test_ring_push_pop(self):
+        ring = SharedMemoryRing(capacity=64)
+        reader = SharedMemoryRing(ring.name)
+
+        try:
+            self.assertIsNone(reader.pop())
+
+            # Records are padded to 4 bytes, with a 4 byte length
+            for index in range(3):
+                self.assertTrue(ring.push(bytes([index]) * 10))
+
+            self.assertEqual(len(reader), 48)
+            self.assertEqual(reader.pop_all()[:2], [bytes([0]) * 10, bytes([1]) * 10])
+
+            # Record does not fit before the end of the buffer, so is written at the start
+            self.assertTrue(ring.push(b'wrapped' * 3))
+            self.assertEqual(reader.pop_all(), [b'wrapped' * 3])
+            self.assertEqual(len(reader), 0)
+
+        finally:
+            reader.close()
+            ring.close()
+
+    def test_ring_full(self):
+        ring = SharedMemoryRing(capacity=64)
+
+        try:
+            for _ in range(4):
+                self.assertTrue(ring.push(bytes(12)))
+
+            self.assertFalse(ring.push(b''))
+            self.assertEqual(ring.pop(), bytes(12))
+
+            # Skipped space at the end of the buffer is not free
+            self.assertFalse(ring.push(bytes(16)))
+            self.assertTrue(ring.push(bytes(12)))
+            self.assertEqual(len(ring.pop_all()), 4)
+
+        finally:
+            ring.close()
+
+    def test_address(self):
+        address = ("127.0.0.1", 1200)
+        self.assertEqual(unpack_address(b'\x00' + pack_address(address), 1), (address, 10 + 2))
+
+    def test_snapshot_round_trip(self):
+        writer = WorldSnapshotWriter()
+        reader = WorldSnapshotReader()
+
+        with self.front_context:
+            first = ShardTestPawn()
+            second = ShardTestPawn()
+            second.name = "Second"
+            full_snapshot = writer.write([first, second], full=True)
+
+        with self.worker_context:
+            reader.read(full_snapshot)
+            replicas = reader.replicables
+
+            self.assertEqual(sorted(replicas), sorted([first.instance_id, second.instance_id]))
+            self.assertEqual(replicas[second.instance_id].name, "Second")
+            self.assertEqual(len(Replicable), 2)
+
+        with self.front_context:
+            # First delta contains all values, as there is no previous delta
+            writer.write([first, second])
+
+            first.health = 50
+            snapshot = writer.write([first])
+
+        # Delta snapshot contains changed values, and removed replicables
+        self.assertLess(len(snapshot), len(full_snapshot) // 2)
+
+        with self.worker_context:
+            reader.read(snapshot)
+
+            self.assertEqual(list(replicas), [first.instance_id])
+            self.assertEqual(replicas[first.instance_id].health, 50)
+            self.assertEqual(list(Replicable), [replicas[first.instance_id]])
+
+            # Full snapshots remove replicables which they do not contain
+            with self.front_context:
+                snapshot = writer.write([], full=True)
+
+            reader.read(snapshot)
+            self.assertFalse(Replicable)
+
+    def test_snapshot_worker_ids(self):
+        writer = WorldSnapshotWriter()
+        reader = WorldSnapshotReader()
+
+        with self.front_context:
+            pawns = [ShardTestPawn() for _ in range(3)]
+            snapshot = writer.write(pawns, full=True)
+
+        with self.worker_context:
+            # Replicables created by the worker (such as by the rules on connect) do not use the ids of the front
+            controller = ShardTestPawn()
+            controller_id = controller.instance_id
+            self.assertIn(controller_id, get_worker_id_range(self.worker_id_count))
+
+            reader.read(snapshot)
+
+            self.assertEqual(controller.instance_id, controller_id)
+            self.assertIs(Replicable[controller_id], controller)
+            self.assertEqual(sorted(reader.replicables), [pawn.instance_id for pawn in pawns])
+
+        # Without disjoint ranges the conflict is raised, rather than re-assigning the id of the worker replicable
+        with Replicable.get_context_manager("Unreserved"):
+            controller = ShardTestPawn(instance_id=pawns[0].instance_id, static=False)
+
+            with self.assertRaises(ValueError):
+                WorldSnapshotReader().read(snapshot)
+
+            self.assertEqual(controller.instance_id, pawns[0].instance_id)
+            Replicable.clear_graph()
+
+    def test_worker_update(self):
+        inbound_ring = SharedMemoryRing(capacity=2 ** 12)
+        outbound_ring = SharedMemoryRing(capacity=2 ** 12)
+        worker = ShardWorker(inbound_ring, outbound_ring)
+        address = ("127.0.0.1", 1200)
+
+        with self.front_context:
+            pawn = ShardTestPawn()
+            snapshot = WorldSnapshotWriter().write([pawn], full=True)
+
+        # Datagram with sequence 1, and no packets
+        ack_packer = get_handler(TypeFlag(BitField, fields=Connection.ack_window))
+        datagram = UInt16.pack(1) + UInt16.pack(0) + ack_packer.pack(BitField(Connection.ack_window))
+
+        try:
+            with self.worker_context, self.connection_context:
+                inbound_ring.push(bytes((ShardWorker.datagram_record,)) + pack_address(address) + datagram)
+                self.assertFalse(worker.update())
+
+                connection = Connection[address]
+                self.assertEqual(connection.remote_sequence, 1)
+                self.assertFalse(outbound_ring.pop_all())
+
+                inbound_ring.push(bytes((ShardWorker.tick_record, True)) + snapshot)
+                self.assertTrue(worker.update())
+
+                self.assertIn(pawn.instance_id, worker.snapshot_reader.replicables)
+
+                # Connection sent its datagram to the outbound ring
+                records = outbound_ring.pop_all()
+                self.assertEqual(len(records), 1)
+
+                record_address, size = unpack_address(records[0])
+                self.assertEqual(record_address, address)
+                self.assertEqual(UInt16.unpack_from(records[0], size)[0], connection.local_sequence)
+
+        finally:
+            inbound_ring.close()
+            outbound_ring.close()
+
+
+class NetworkTest(unittest.TestCase):
+
+    def setUp(self):
+        # Networks clear the graphs when they stop
+        self.contexts = [Connection.get_context_manager("Network"), Replicable.get_context_manager("Network"),
+                         Signal.get_context_manager("Network")]
+
+        for context in self.contexts:
+            context.__enter__()
+
+    def tearDown(self):
+        Connection.clear_graph()
+        Replicable.clear_graph()
+
+        for context in reversed(self.contexts):
+            context.__exit__(None, None, None)
+
+    @staticmethod
+    def create_datagram(sequence):
+        ack_packer = get_handler(TypeFlag(BitField, fields=Connection.ack_window))
+        return UInt16.pack(sequence) + UInt16.pack(0) + ack_packer.pack(BitField(Connection.ack_window))
+
+    def create_connections(self, port, count=4):
+        connections = [Connection(("127.0.0.1", port + index)) for index in range(count)]
+
+        for index, connection in enumerate(connections):
+            connection.compressor.is_negotiated = True
+
+            payloads = [bytes([index, packet_index]) * 40 + bytes(range(packet_index)) for packet_index in range(60)]
+            connection.injector.queue.extend([Packet(protocol=ConnectionProtocols.attribute_update, payload=payload)
+                                              for payload in payloads])
+
+        return connections
+
+    def test_send_connections_concurrent(self):
+        sequential_datagrams = send_connections(self.create_connections(1000), True)
+
+        with ThreadPoolExecutor(3) as executor:
+            concurrent_datagrams = send_connections(self.create_connections(2000), True, executor)
+
+        # Datagrams are identical, and in the same order
+        self.assertGreater(len(sequential_datagrams), 4)
+        self.assertEqual([data for data, _ in sequential_datagrams], [data for data, _ in concurrent_datagrams])
+        self.assertEqual([address[1] - 1000 for _, address in sequential_datagrams],
+                         [address[1] - 2000 for _, address in concurrent_datagrams])
+
+    def test_send_connections_timeout(self):
+        connections = self.create_connections(1000)
+        timeout_threads = []
+
+        # Timed out connections are removed by the calling thread
+        timed_out_connection = connections[1]
+        handshake = timed_out_connection.handshake
+        handshake.timeout_duration = -1.0
+        handshake.on_timeout = lambda: (timeout_threads.append(current_thread()), handshake._cleanup())
+
+        with ThreadPoolExecutor(2) as executor:
+            send_connections(connections, True, executor)
+
+        self.assertEqual(timeout_threads, [current_thread()])
+        self.assertFalse(timed_out_connection.registered)
+
+    def test_received_data_lifetime(self):
+        backend_classes = [SocketBackend]
+
+        if BatchedSocketBackend.is_supported():
+            backend_classes.append(BatchedSocketBackend)
+
+        sent_payloads = [bytes([index]) * 16 for index in range(3)]
+
+        for backend_cls in backend_classes:
+            with self.subTest(backend=backend_cls.__name__):
+                network = Network("127.0.0.1", 0, backend_cls(buffer_size=64, batch_size=2))
+                sender = socket(AF_INET, SOCK_DGRAM)
+
+                try:
+                    for payload in sent_payloads:
+                        sender.sendto(payload, network.socket.getsockname())
+
+                    received = [(payload, bytes(payload)) for payload, _ in network.received_data]
+
+                    # Copied payloads are retained, but views are overwritten by later batches
+                    self.assertEqual([copied for _, copied in received], sent_payloads)
+                    self.assertIsInstance(received[0][0], memoryview)
+                    self.assertEqual(bytes(received[0][0]), sent_payloads[2])
+
+                finally:
+                    sender.close()
+                    network.stop()
+
+    def test_send_to_host_name(self):
+        backend_classes = [SocketBackend]
+
+        if BatchedSocketBackend.is_supported():
+            backend_classes.append(BatchedSocketBackend)
+
+        for backend_cls in backend_classes:
+            with self.subTest(backend=backend_cls.__name__):
+                backend = backend_cls()
+                sender, receiver = socket(AF_INET, SOCK_DGRAM), socket(AF_INET, SOCK_DGRAM)
+
+                try:
+                    receiver.bind(("127.0.0.1", 0))
+                    receiver.settimeout(1.0)
+                    port = receiver.getsockname()[1]
+
+                    # Host names are resolved, as well as numeric hosts accepted
+                    sent_bytes = backend.send_to(sender, [(b'name', ("localhost", port)),
+                                                          (b'numeric', ("127.0.0.1", port))])
+
+                    self.assertEqual(sent_bytes, 11)
+                    self.assertEqual([receiver.recvfrom(64)[0] for _ in range(2)], [b'name', b'numeric'])
+
+                finally:
+                    sender.close()
+                    receiver.close()
+
+    def test_respect_interval(self):
+        calls = []
+        interval = 0.02
+
+        update = respect_interval(interval, lambda: calls.append(default_timer()))
+
+        # Each call sleeps until the interval has elapsed, rather than returning without calling the function
+        started = default_timer()
+        for _ in range(3):
+            update()
+
+        self.assertEqual(len(calls), 3)
+        self.assertGreaterEqual(calls[0] - started, interval * 0.9)
+        self.assertGreaterEqual(calls[2] - calls[0], interval * 2 * 0.9)
+
+        # Intervals are measured in wall time, so successive calls do not drift apart
+        self.assertLess(calls[0] - started, interval * 3)
+        self.assertLess(calls[2] - calls[0], interval * 2 + 0.05)
+
+        for first, second in zip(calls, calls[1:]):
+            self.assertLess(second - first, interval + 0.03)
+
+    def test_simple_network_run(self):
+        network = SimpleNetwork("127.0.0.1")
+
+        # Without connections, the network runs until the timeout elapses in wall time
+        started = default_timer()
+        network.run(timeout=0.1, update_rate=1/60)
+
+        elapsed = default_timer() - started
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(network.socket.fileno(), -1)
+
+    def test_async_network_run(self):
+        network = AsyncNetwork("127.0.0.1")
+
+        # Without peers, the network serves until the timeout elapses
+        started = default_timer()
+        network.run(timeout=0.05)
+
+        elapsed = default_timer() - started
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.5)
+        self.assertIsNone(network.transport)
+        self.assertEqual(network.socket.fileno(), -1)
+
+    def test_async_network_datagram(self):
+        network = AsyncNetwork("127.0.0.1")
+        address = ("127.0.0.1", 1200)
+
+        try:
+            protocol = AsyncNetworkProtocol(network)
+            protocol.datagram_received(self.create_datagram(3), address)
+
+            connection = Connection[address]
+            self.assertEqual(connection.remote_sequence, 3)
+            self.assertEqual(network.metrics.received_bytes, len(self.create_datagram(3)))
+
+            # Later datagrams are dispatched to the same connection
+            protocol.datagram_received(self.create_datagram(4), address)
+            self.assertIs(Connection[address], connection)
+            self.assertEqual(connection.remote_sequence, 4)
+
+        finally:
+            network.stop()
+
+
+class FragmentationTest(unittest.TestCase):
+
+    max_size = 200
+
+    def setUp(self):
+        self.sender = FragmentStream(Dispatcher())
+        self.receiver = FragmentStream(Dispatcher())
+
+        self.connection_context = Connection.get_context_manager("Fragmentation")
+        self.connection_context.__enter__()
+
+    def tearDown(self):
+        Connection.clear_graph()
+        self.connection_context.__exit__(None, None, None)
+
+    def fragment(self, payload, **kwargs):
+        packet = Packet(protocol=ConnectionProtocols.attribute_update, payload=payload, **kwargs)
+        return [fragment for collection in self.sender.split_packets(PacketCollection([packet]), self.max_size)
+                for fragment in collection]
+
+    def test_split_packets(self):
+        small_packets = [Packet(protocol=ConnectionProtocols.attribute_update, payload=bytes(50)) for _ in range(6)]
+        large_packet = Packet(protocol=ConnectionProtocols.invoke_method, payload=bytes(range(250)) * 4)
+
+        collections = self.sender.split_packets(PacketCollection(small_packets + [large_packet]), self.max_size)
+
+        self.assertGreater(len(collections), 1)
+        for collection in collections:
+            self.assertLessEqual(len(collection.to_bytes()), self.max_size)
+
+        # Small packets are not fragmented
+        members = [packet for collection in collections for packet in collection]
+        self.assertEqual(members[:6], small_packets)
+        self.assertTrue(all(packet.protocol == ConnectionProtocols.fragment for packet in members[6:]))
+        self.assertEqual(self.sender.fragments_sent, len(members) - 6)
+
+        # At least one collection is returned
+        self.assertEqual(len(self.sender.split_packets(PacketCollection(), self.max_size)), 1)
+
+    def test_reassemble_out_of_order(self):
+        payload = bytes(range(250)) * 4
+        fragments = self.fragment(payload)
+
+        self.assertGreater(len(fragments), 5)
+
+        results = [self.receiver.handle_fragment(fragment.payload) for fragment in reversed(fragments)]
+
+        # Only the last received fragment completes the packet
+        self.assertEqual(results[:-1], [None] * (len(fragments) - 1))
+        self.assertEqual(results[-1].protocol, ConnectionProtocols.attribute_update)
+        self.assertEqual(results[-1].payload, payload)
+
+        # Duplicated fragments of complete groups are ignored
+        self.assertIsNone(self.receiver.handle_fragment(fragments[0].payload))
+        self.assertFalse(self.receiver.pending_groups)
+
+    def test_reassemble_missing(self):
+        payload = bytes(range(250)) * 4
+        fragments = self.fragment(payload, reliable=True)
+
+        for fragment in fragments[1:]:
+            self.assertIsNone(self.receiver.handle_fragment(fragment.payload))
+
+        self.assertEqual(len(self.receiver.pending_groups), 1)
+
+        # Redelivered fragment completes the group
+        packet = self.receiver.handle_fragment(fragments[0].payload)
+        self.assertEqual(packet.payload, payload)
+        self.assertEqual(self.receiver.packets_reassembled, 1)
+
+    def test_fragment_ack(self):
+        acknowledged = []
+        dropped = []
+
+        fragments = self.fragment(bytes(1000), reliable=True, on_success=acknowledged.append,
+                                  on_failure=dropped.append)
+
+        # Original packet is informed once all fragments are received, or when any fragment is dropped
+        fragments[0].on_not_ack()
+        self.assertEqual(len(dropped), 1)
+
+        for fragment in fragments:
+            self.assertFalse(acknowledged)
+            fragment.on_ack()
+
+        self.assertEqual(len(acknowledged), 1)
+
+    def test_pending_groups_evicted(self):
+        self.receiver.max_pending_groups = 2
+
+        payloads = [bytes([index]) * 1000 for index in range(3)]
+        groups = [self.fragment(payload) for payload in payloads]
+
+        # Each group is missing its first fragment
+        for fragments in groups:
+            for fragment in fragments[1:]:
+                self.receiver.handle_fragment(fragment.payload)
+
+        self.assertEqual(self.receiver.groups_discarded, 1)
+        self.assertEqual(len(self.receiver.pending_groups), 2)
+
+        for fragments, payload in zip(groups[1:], payloads[1:]):
+            self.assertEqual(self.receiver.handle_fragment(fragments[0].payload).payload, payload)
+
+        # Oldest group was discarded, so cannot be completed
+        self.assertIsNone(self.receiver.handle_fragment(groups[0][0].payload))
+        self.assertEqual(self.receiver.packets_reassembled, 2)
+
+    def test_handle_packets(self):
+        received = []
+
+        class RecordingStream:
+
+            def __init__(self, dispatcher):
+                pass
+
+            @staticmethod
+            def handle_packets(packet_collection):
+                received.extend(packet_collection)
+
+        dispatcher = Dispatcher()
+        receiver = dispatcher.create_stream(FragmentStream)
+        dispatcher.create_stream(RecordingStream)
+
+        payload = bytes(range(250)) * 2
+        fragments = self.fragment(payload)
+
+        datagrams = [PacketCollection([fragment]).to_bytes() for fragment in fragments]
+        for datagram in reversed(datagrams):
+            receiver.handle_packets(PacketCollection.from_bytes(memoryview(datagram)))
+
+        reassembled = [packet for packet in received if packet.protocol != ConnectionProtocols.fragment]
+        self.assertEqual(len(reassembled), 1)
+        self.assertEqual(reassembled[0].payload, payload)
+
+    def test_connection_defers_datagrams(self):
+        connection = Connection(("127.0.0.1", 1200))
+        max_datagrams = connection.ack_window // 2
+
+        packet_count = max_datagrams * 2 + 4
+        connection.injector.queue.extend([Packet(protocol=ConnectionProtocols.attribute_update, payload=bytes(1000))
+                                          for _ in range(packet_count)])
+
+        # Datagrams which could not be acknowledged by the peer are deferred to the next send
+        datagram_counts = []
+        for _ in range(3):
+            datagrams = connection.send(True)
+            datagram_counts.append(len(datagrams))
+
+            self.assertTrue(all(len(datagram) <= connection.mtu for datagram in datagrams))
+
+        self.assertEqual(datagram_counts, [max_datagrams, max_datagrams, 4])
+        self.assertEqual(connection.local_sequence, packet_count)
+        self.assertFalse(connection.injector.queue)
+
+
+class ConnectionTest(unittest.TestCase):
+
+    ack_windows = 8, 32, 128
+
+    def setUp(self):
+        self.connection_context = Connection.get_context_manager("Acks")
+        self.connection_context.__enter__()
+
+        self.acknowledged = Counter()
+        self.dropped = Counter()
+
+        self.default_ack_window = Connection.ack_window
+
+    def tearDown(self):
+        Connection.ack_window = self.default_ack_window
+
+        Connection.clear_graph()
+        self.connection_context.__exit__(None, None, None)
+
+    def create_connections(self, ack_window, sequence):
+        """Return pair of connected connections, whose sequences start at sequence"""
+        Connection.clear_graph()
+        Connection.ack_window = ack_window
+
+        connections = Connection(("127.0.0.1", 1)), Connection(("127.0.0.1", 2))
+
+        for connection in connections:
+            connection.local_sequence = connection.remote_sequence = sequence
+
+        return connections
+
+    def queue_packet(self, connection, packet_id):
+        connection.injector.queue.append(
+            Packet(protocol=ConnectionProtocols.attribute_update, payload=UInt16.pack(packet_id), reliable=True,
+                   on_success=lambda packet: self.acknowledged.update((packet_id,)),
+                   on_failure=lambda packet: self.dropped.update((packet_id,))))
+
+    @staticmethod
+    def get_packet_ids(connection, datagram):
+        """Return ids of packets queued by queue_packet in datagram"""
+        offset = 2 * connection.sequence_handler.size() + connection.ack_packer.size()
+        return [UInt16.unpack_from(packet.payload)[0] for packet in PacketCollection.from_bytes(datagram, offset)
+                if packet.protocol == ConnectionProtocols.attribute_update]
+
+    def exchange(self, sender, receiver, ticks, is_lost=lambda tick: False, get_delay=lambda tick: 0, first_id=0):
+        """Send a reliable packet each tick, returning Counter of ids of packets in lost datagrams
+
+        :param is_lost: callback which returns True if the datagram of a tick is lost
+        :param get_delay: callback which returns the number of ticks by which the datagram of a tick is delayed
+        """
+        lost_ids = Counter()
+        delayed_datagrams = []
+
+        for tick in range(ticks):
+            self.queue_packet(sender, first_id + tick)
+
+            datagram, = sender.send(True)
+
+            if is_lost(tick):
+                lost_ids.update(self.get_packet_ids(sender, datagram))
+
+            else:
+                delayed_datagrams.append((tick + get_delay(tick), datagram))
+
+            # Datagrams are received out of order when they are delayed
+            for received_tick, datagram in [d for d in delayed_datagrams if d[0] <= tick]:
+                receiver.receive(datagram)
+                delayed_datagrams.remove((received_tick, datagram))
+
+            for ack_datagram in receiver.send(True):
+                sender.receive(ack_datagram)
+
+        self.assertFalse(delayed_datagrams)
+        return lost_ids
+
+    def test_acks(self):
+        for ack_window in self.ack_windows:
+            with self.subTest(ack_window=ack_window):
+                self.acknowledged.clear()
+                sender, receiver = self.create_connections(ack_window, 100)
+
+                ticks = ack_window * 3
+                lost_ids = self.exchange(sender, receiver, ticks)
+
+                self.assertFalse(lost_ids)
+                self.assertEqual(self.acknowledged, Counter(range(ticks)))
+                self.assertFalse(self.dropped)
+                self.assertEqual(sender.pending_ack_mask, 0)
+                self.assertEqual(sender.sent_packets, [None] * sender.sent_window)
+
+    def test_losses_and_reordering(self):
+        for ack_window in self.ack_windows:
+            with self.subTest(ack_window=ack_window):
+                self.acknowledged.clear()
+                self.dropped.clear()
+
+                # Sequences wrap around during the exchange
+                first_sequence = 2 ** 16 - ack_window
+                sender, receiver = self.create_connections(ack_window, first_sequence)
+
+                ticks = ack_window * 3
+                # Datagrams which are delayed by less than the ack window are not dropped
+                delay = ack_window // 2
+                lost_ids = self.exchange(sender, receiver, ticks, is_lost=lambda tick: tick % 5 == 1,
+                                         get_delay=lambda tick: delay if tick % 7 == 3 and tick < ticks - delay else 0)
+
+                # Redelivered packets are received once there are no losses
+                self.exchange(sender, receiver, ack_window * 2 + 2, first_id=ticks)
+
+                self.assertEqual(sender.local_sequence, (first_sequence + ticks + ack_window * 2 + 2) % 2 ** 16)
+                self.assertTrue(lost_ids)
+
+                # Lost packets are dropped (once for each loss), delayed packets are not
+                self.assertEqual(self.dropped, lost_ids)
+                self.assertEqual(self.acknowledged, Counter(range(ticks + ack_window * 2 + 2)))
+                self.assertEqual(sender.pending_ack_mask, 0)
+
+    def test_unacknowledged_ring(self):
+        for ack_window in self.ack_windows:
+            with self.subTest(ack_window=ack_window):
+                self.dropped.clear()
+                sender, _ = self.create_connections(ack_window, 2 ** 16 - 3)
+
+                # Without acknowledgements, the oldest packets fall out of the ring of sent packets
+                for packet_id in range(sender.sent_window + 3):
+                    self.queue_packet(sender, packet_id)
+                    sender.send(True)
+
+                self.assertEqual(self.dropped, Counter(range(3)))
+                self.assertEqual(bin(sender.pending_ack_mask).count("1"), sender.sent_window)
+                self.assertFalse(self.acknowledged)
+
+    def test_register_received(self):
+        for ack_window in self.ack_windows:
+            with self.subTest(ack_window=ack_window):
+                connection, _ = self.create_connections(ack_window, 2 ** 16 - 2)
+
+                # Across the sequence wrap, and out of order
+                for sequence in (2 ** 16 - 1, 1, 0):
+                    connection.register_received(sequence)
+
+                self.assertEqual(connection.remote_sequence, 1)
+
+                # Bit N is set if remote sequence - N - 1 was received (the initial sequence was not)
+                ack_bitfield = connection.get_reliable_information(connection.remote_sequence)
+                self.assertEqual(ack_bitfield.to_int(), 0b011)
+
+                # Sequences older than the ack window are ignored
+                connection.register_received((1 - ack_window - 1) % 2 ** 16)
+                self.assertEqual(connection.received_mask >> (ack_window + 1), 0)
+
+                # The oldest sequence of the ack window is acknowledged
+                connection.register_received((1 - ack_window) % 2 ** 16)
+                ack_bitfield = connection.get_reliable_information(connection.remote_sequence)
+                self.assertEqual(ack_bitfield.to_int(), 0b011 | 1 << (ack_window - 1))
+
+
+class RelevancyTestActor(Replicable):
+    roles = Attribute(Roles(Roles.authority, Roles.simulated_proxy))
+
+
+class RelevancyTestRules(ReplicationRulesBase):
+
+    def __init__(self, relevancy_grid):
+        self.relevancy_grid = relevancy_grid
+        self.viewpoint = 0.0, 0.0, 0.0
+
+        # Replicables which are relevant without a viewpoint, or when not tracked by the grid
+        self.relevant = set()
+
+    def post_initialise(self, replication_stream):
+        return RelevancyTestActor()
+
+    def is_relevant(self, conn, replicable):
+        return replicable in self.relevant
+
+    def get_viewpoint(self, conn):
+        return self.viewpoint
+
+
+class RelevancyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = RelevancyGrid(cell_size=10.0, view_distance=10.0)
+
+    def test_insert_and_query(self):
+        grid = self.grid
+
+        grid.update("near", (15.0, 5.0, 5.0))
+        grid.update("diagonal", (-9.0, 19.0, -9.0))
+        grid.update("far", (25.0, 5.0, 5.0))
+
+        self.assertEqual(len(grid), 3)
+        self.assertIn("far", grid)
+
+        # Only cells which lie within the view distance of the viewpoint are visited
+        self.assertEqual(grid.query((5.0, 5.0, 5.0)), {"near", "diagonal"})
+        self.assertEqual(grid.query((5.0, 5.0, 5.0), view_distance=5.0), {"near", "diagonal"})
+        self.assertEqual(grid.query((5.0, 5.0, 5.0), view_distance=0.0), set())
+        self.assertEqual(grid.query((5.0, 5.0, 5.0), view_distance=15.0), {"near", "diagonal", "far"})
+
+        # Cells are visited by index when there are more occupied cells than in range
+        for index in range(30):
+            grid.update(index, (index * 100.0, 0.0, 0.0))
+
+        self.assertEqual(grid.query((5.0, 5.0, 5.0)), {"near", "diagonal", 0})
+
+    def test_move_and_remove(self):
+        grid = self.grid
+
+        grid.update("actor", (1.0, 1.0, 1.0))
+        grid.update("actor", (2.0, 2.0, 2.0))
+        self.assertEqual(grid.query((0.0, 0.0, 0.0)), {"actor"})
+
+        grid.update("actor", (500.0, 0.0, 0.0))
+        self.assertEqual(grid.query((0.0, 0.0, 0.0)), set())
+        self.assertEqual(grid.query((500.0, 0.0, 0.0)), {"actor"})
+
+        grid.remove("actor")
+        grid.remove("actor")
+
+        self.assertNotIn("actor", grid)
+        self.assertEqual(len(grid), 0)
+        self.assertFalse(grid._cells)
+        self.assertEqual(grid.query((500.0, 0.0, 0.0)), set())
+
+    def test_rules_relevant_replicables(self):
+        rules = RelevancyTestRules(self.grid)
+        self.grid.update("near", (0.0, 0.0, 0.0))
+
+        self.assertEqual(rules.get_relevant_replicables(None), {"near"})
+
+        rules.viewpoint = None
+        self.assertIsNone(rules.get_relevant_replicables(None))
+
+        rules.relevancy_grid = None
+        self.assertIsNone(ReplicationRulesBase.get_relevant_replicables(rules, None))
+
+    def test_replication_relevancy(self):
+        rules = RelevancyTestRules(self.grid)
+        previous_rules, previous_netmode = WorldInfo.rules, WorldInfo.netmode
+
+        contexts = Replicable.get_context_manager("Relevancy"), Signal.get_context_manager("Relevancy")
+
+        for context in contexts:
+            context.__enter__()
+
+        try:
+            WorldInfo.rules = rules
+            WorldInfo.netmode = Netmodes.server
+
+            near, far, always_relevant, untracked, irrelevant = [RelevancyTestActor() for _ in range(5)]
+            always_relevant.always_relevant = True
+
+            self.grid.update(near, (1.0, 0.0, 0.0))
+            self.grid.update(far, (500.0, 0.0, 0.0))
+            self.grid.update(always_relevant, (500.0, 0.0, 0.0))
+            rules.relevant.add(untracked)
+
+            stream = ReplicationStream(Dispatcher())
+            sent = [channel.replicable for channel, _ in stream.send_attributes(stream.replicated_channels, 10 ** 6)]
+
+            # Tracked replicables are relevant if near, or always relevant, untracked replicables use is_relevant
+            self.assertIn(near, sent)
+            self.assertIn(always_relevant, sent)
+            self.assertIn(untracked, sent)
+            self.assertNotIn(far, sent)
+            self.assertNotIn(irrelevant, sent)
+
+        finally:
+            WorldInfo.rules, WorldInfo.netmode = previous_rules, previous_netmode
+
+            Replicable.clear_graph()
+
+            for context in reversed(contexts):
+                context.__exit__(None, None, None)
+
+
+class CaptureTest(unittest.TestCase):
+
+    def test_capture_log(self):
+        with TemporaryDirectory() as directory:
+            log_path = os_path.join(directory, "capture.bin")
+
+            writer = CaptureWriter(log_path)
+            writer.write(1.0, CaptureDirection.received, ("127.0.0.1", 1200), b'first')
+            writer.write(1.5, CaptureDirection.sent, ("localhost", 1201), b'second')
+            writer.close()
+
+            reader = CaptureReader(log_path)
+            records = list(reader)
+
+            self.assertEqual(len(reader), 2)
+            self.assertEqual(records[1].address, ("localhost", 1201))
+            self.assertEqual(records[1].direction, CaptureDirection.sent)
+            self.assertEqual(bytes(records[0].data), b'first')
+            self.assertEqual(reader.find_index(1.2), 1)
+
+            del records
+            reader.close()
+
+            # Logs which were not closed are indexed by reading their records
+            writer = CaptureWriter(log_path)
+            writer.write(1.0, CaptureDirection.received, ("127.0.0.1", 1200), b'first')
+            writer.write(1.5, CaptureDirection.received, ("127.0.0.1", 1200), b'second')
+            writer.file.close()
+
+            reader = CaptureReader(log_path)
+            self.assertEqual(reader.timestamps, [1.0, 1.5])
+            reader.close()
+
+    def replay_timing(self, log_path, speed):
+        reader = CaptureReader(log_path)
+        replay = CaptureReplay(reader, speed=speed)
+        received_times = []
+
+        replay.receive = lambda data, address: received_times.append(default_timer())
+        metrics = replay.run()
+
+        reader.close()
+        self.assertEqual(metrics.received_datagrams, 2)
+        return received_times[1] - received_times[0]
+
+    def test_replay_timing(self):
+        with TemporaryDirectory() as directory:
+            log_path = os_path.join(directory, "capture.bin")
+
+            writer = CaptureWriter(log_path)
+            writer.write(1.0, CaptureDirection.received, ("127.0.0.1", 1200), b'first')
+            writer.write(1.2, CaptureDirection.received, ("127.0.0.1", 1200), b'second')
+            writer.close()
+
+            with Connection.get_context_manager("Replay"):
+                # Replay reproduces the captured gap in wall time, to within an update
+                update_rate = 1 / 60
+                gap = self.replay_timing(log_path, 1.0)
+                self.assertGreater(gap, 0.2 - update_rate * 1.5)
+                self.assertLess(gap, 0.2 + update_rate + 0.05)
+
+                gap = self.replay_timing(log_path, 2.0)
+                self.assertGreater(gap, 0.1 - update_rate)
+                self.assertLess(gap, 0.1 + update_rate + 0.05)
+
+                # Without a speed, datagrams are replayed as fast as possible
+                self.assertLess(self.replay_timing(log_path, None), 0.05)
+
+
+class SwarmTest(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+
+        self.assertEqual(percentile(values, 0.5), 3)
+        self.assertEqual(percentile(values, 0.9), 5)
+        self.assertEqual(percentile(values, 0.0), 1)
+        self.assertEqual(percentile(values, 1.0), 5)
+
+    def setUp(self):
+        self.previous_netmode = WorldInfo.netmode
+        WorldInfo.netmode = Netmodes.client
+
+        self.contexts = [Connection.get_context_manager("Swarm"), Replicable.get_context_manager("Swarm")]
+
+        for context in self.contexts:
+            context.__enter__()
+
+    def tearDown(self):
+        Connection.clear_graph()
+
+        for context in reversed(self.contexts):
+            context.__exit__(None, None, None)
+
+        WorldInfo.netmode = self.previous_netmode
+
+    def test_run_duration(self):
+        swarm = ClientSwarm("127.0.0.1", 1, 2)
+
+        # Runs last for their duration in wall time
+        started = default_timer()
+
+        try:
+            report = swarm.run(0.2)
+
+        finally:
+            swarm.stop()
+
+        elapsed = default_timer() - started
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertLess(elapsed, 1.0)
+        self.assertGreaterEqual(report.duration, 0.2)
+        self.assertLess(report.duration, 1.0)
+        self.assertEqual(report.client_count, 2)
+
+    def test_latency_samples(self):
+        server_socket = socket(AF_INET, SOCK_DGRAM)
+        server_socket.bind(("127.0.0.1", 0))
+
+        client = SwarmClient(server_socket.getsockname(), SocketBackend())
+        connection = client.connection
+
+        try:
+            client.send(True)
+            _, client_address = server_socket.recvfrom(2048)
+            sent_sequence = connection.local_sequence
+
+            # Latency is sampled in wall time, from the datagram being sent until it is acknowledged
+            delay = 0.05
+            sleep(delay)
+
+            ack_packer = get_handler(TypeFlag(BitField, fields=Connection.ack_window))
+            ack_bits = ack_packer.pack(BitField(Connection.ack_window))
+            ack_datagram = UInt16.pack(1) + UInt16.pack(sent_sequence) + ack_bits
+            server_socket.sendto(ack_datagram, ("127.0.0.1", client_address[1]))
+            sleep(0.01)
+
+            client.receive()
+
+        finally:
+            client.stop()
+            server_socket.close()
+
+        self.assertEqual(len(client.latency_samples), 1)
+        self.assertGreaterEqual(client.latency_samples[0], delay)
+        self.assertLess(client.latency_samples[0], delay + 0.5)
+
+
+class ChannelTestActor(Replicable):
+    roles = Attribute(Roles(Roles.authority, Roles.simulated_proxy))
+    health = Attribute(100)
+    name = Attribute("", data_type=str)
+    scores = Attribute([], element_flag=TypeFlag(int))
+    waypoints = Attribute([], element_flag=TypeFlag(int), versioned=True)
+
+    def conditions(self, is_owner, is_complaint, is_initial):
+        yield from super().conditions(is_owner, is_complaint, is_initial)
+
+        yield "health"
+        yield "name"
+        yield "scores"
+        yield "waypoints"
+
+
+class ChannelTestStream:
+
+    def __init__(self, bit_packed=False):
+        self.bit_packed = bit_packed
+        self.replicable = None
+
+
+class ChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_netmode = WorldInfo.netmode
+        WorldInfo.netmode = Netmodes.server
+
+        self.contexts = [Replicable.get_context_manager("Channel"), Signal.get_context_manager("Channel")]
+
+        for context in self.contexts:
+            context.__enter__()
+
+    def tearDown(self):
+        Replicable.clear_graph()
+
+        for context in reversed(self.contexts):
+            context.__exit__(None, None, None)
+
+        WorldInfo.netmode = self.previous_netmode
+
+    @staticmethod
+    def get_sent_values(channel):
+        """Begin a replication pass, and return mapping of names to values of attributes sent by channel"""
+        AttributeStorageContainer.begin_replication_pass()
+
+        data = channel.get_attributes(False)
+        if data is None:
+            return {}
+
+        return dict(channel.serialiser.unpack(data))
+
+    @staticmethod
+    def get_counter_change(counters, name):
+        return profiler.get_counters().get(name, 0) - counters.get(name, 0)
+
+    def test_unchanged_attributes(self):
+        actor = ChannelTestActor()
+        actor.health = 50
+        channel = Channel(ChannelTestStream(), actor)
+
+        self.assertEqual(self.get_sent_values(channel), {"health": 50})
+
+        # Unchanged attributes are not sent again
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        actor.name = "name"
+        self.assertEqual(self.get_sent_values(channel), {"name": "name"})
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        # Setting an equal value does not change the attribute
+        actor.name = "name"
+        self.assertEqual(self.get_sent_values(channel), {})
+
+    def test_mutated_attributes(self):
+        actor = ChannelTestActor()
+        storage = actor._attribute_container
+        channel = Channel(ChannelTestStream(), actor)
+
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        # Attributes modified in place are described once per pass, bumping their version when changed
+        version = storage.versions[ChannelTestActor.scores]
+        actor.scores.append(4)
+
+        self.assertEqual(self.get_sent_values(channel), {"scores": [4]})
+        self.assertEqual(storage.versions[ChannelTestActor.scores], version + 1)
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        # Versioned attributes are only sent once marked as changed
+        actor.waypoints.append(2)
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        storage.mark_changed(ChannelTestActor.waypoints)
+        self.assertEqual(self.get_sent_values(channel), {"waypoints": [2]})
+        self.assertEqual(self.get_sent_values(channel), {})
+
+    def test_initial_channel(self):
+        actor = ChannelTestActor()
+        channel = Channel(ChannelTestStream(), actor)
+
+        actor.health = 50
+        actor.name = "name"
+        actor.scores.append(4)
+
+        self.assertEqual(self.get_sent_values(channel), {"health": 50, "name": "name", "scores": [4]})
+        self.assertEqual(self.get_sent_values(channel), {})
+
+        # New channels send every changed value, whatever other channels have already sent
+        initial_channel = Channel(ChannelTestStream(), actor)
+        self.assertTrue(initial_channel.is_initial)
+
+        self.assertEqual(self.get_sent_values(initial_channel), {"health": 50, "name": "name", "scores": [4]})
+        self.assertFalse(initial_channel.is_initial)
+        self.assertEqual(self.get_sent_values(initial_channel), {})
+
+    def test_encode_cache(self):
+        actor = ChannelTestActor()
+        storage = actor._attribute_container
+        encoded_values = []
+
+        def encode(values):
+            encoded_values.append(values)
+            return repr(sorted(values.items())).encode()
+
+        # Values are encoded once per pass, for all callers
+        AttributeStorageContainer.begin_replication_pass()
+        actor.health = 50
+
+        results = [storage.get_encoded({"health": actor.health}, encode) for _ in range(3)]
+        self.assertEqual(len(encoded_values), 1)
+        self.assertEqual([is_cached for _, is_cached in results], [False, True, True])
+        self.assertEqual(len({data for data, _ in results}), 1)
+
+        # Changed values are encoded again within the pass
+        actor.health = 60
+        data, is_cached = storage.get_encoded({"health": actor.health}, encode)
+        self.assertFalse(is_cached)
+        self.assertEqual(encoded_values[-1], {"health": 60})
+
+        # Encoded values are discarded by a new pass
+        AttributeStorageContainer.begin_replication_pass()
+        _, is_cached = storage.get_encoded({"health": actor.health}, encode)
+        self.assertFalse(is_cached)
+        self.assertEqual(len(encoded_values), 3)
+
+    def test_channels_share_encoded(self):
+        actor = ChannelTestActor()
+        channels = [Channel(ChannelTestStream(), actor) for _ in range(4)]
+
+        for channel in channels:
+            self.get_sent_values(channel)
+
+        # Channels replicating identical updates within a pass pack them once
+        for health in 40, 30:
+            actor.health = health
+            AttributeStorageContainer.begin_replication_pass()
+
+            counters = profiler.get_counters()
+            datagrams = [channel.get_attributes(False) for channel in channels]
+
+            self.assertEqual(len(set(datagrams)), 1)
+            self.assertEqual(dict(channels[0].serialiser.unpack(datagrams[0])), {"health": health})
+            self.assertEqual(self.get_counter_change(counters, "encode_cache_misses"), 1)
+            self.assertEqual(self.get_counter_change(counters, "encode_cache_hits"), len(channels) - 1)
+
+    def test_shared_serialiser(self):
+        first, second = ChannelTestActor(), ChannelTestActor()
+        stream, other_stream, bit_packed_stream = ChannelTestStream(), ChannelTestStream(), ChannelTestStream(True)
+
+        # Channels of the same replicable class and bit packing share a serialiser
+        channel = Channel(stream, first)
+        self.assertIs(Channel(other_stream, first).serialiser, channel.serialiser)
+        self.assertIs(Channel(stream, second).serialiser, channel.serialiser)
+        self.assertIsNot(Channel(bit_packed_stream, first).serialiser, channel.serialiser)
+        self.assertIsNot(Channel(stream, RelevancyTestActor()).serialiser, channel.serialiser)
+
+        # Shared serialisers pack values of each replicable
+        first.health, first.name = 20, "first"
+        second.health, second.name = 40, "second"
+
+        for replicable in first, second:
+            values = dict(channel.serialiser.unpack(Channel(stream, replicable).get_attributes(False)))
+            self.assertEqual((values["health"], values["name"]), (replicable.health, replicable.name))
+
+
+class SchedulerTestChannel:
+
+    def __init__(self, name, replication_priority):
+        self.name = name
+        self.replication_priority = replication_priority
+
+    def __repr__(self):
+        return self.name
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sent_items = []
+
+    def send(self, item):
+        self.sent_items.append(item)
+        return 10
+
+    def schedule(self, scheduler, channels, available_bandwidth):
+        items = [(channel, False) for channel in channels]
+        return [item[0] for item in scheduler.schedule(items, available_bandwidth, self.send)]
+
+    def test_bandwidth_budget(self):
+        scheduler = PriorityScheduler()
+        low, medium, high, highest = [SchedulerTestChannel(name, priority) for name, priority
+                                      in (("low", 1.0), ("medium", 2.0), ("high", 3.0), ("highest", 4.0))]
+        channels = [low, medium, high, highest]
+
+        # Items are sent in order of priority until bandwidth is spent, and the rest are deferred
+        self.assertEqual(self.schedule(scheduler, channels, 15), [highest, high])
+        self.assertEqual(len(self.sent_items), 2)
+        self.assertEqual(scheduler.accumulated_priorities, {medium: 2.0, low: 1.0})
+
+        # At least one item is sent without bandwidth
+        self.assertEqual(self.schedule(PriorityScheduler(), channels, 0), [highest])
+
+        # All items are sent within the budget
+        self.assertEqual(self.schedule(PriorityScheduler(), channels, 100), [highest, high, medium, low])
+
+    def test_deferred_priority_ages(self):
+        scheduler = PriorityScheduler()
+        channels = [SchedulerTestChannel("channel_{}".format(index), 4.0 / (index + 1)) for index in range(5)]
+        lowest = channels[-1]
+
+        # Deferred items accumulate priority each tick until they are sent, so none are starved
+        last_priority = 0.0
+        for tick in range(1, 30):
+            sent_channels = self.schedule(scheduler, channels, 10)
+            self.assertEqual(len(sent_channels), 1)
+
+            if lowest in sent_channels:
+                break
+
+            priority = scheduler.accumulated_priorities[lowest]
+            self.assertGreater(priority, last_priority)
+            self.assertEqual(scheduler.deferred_ticks[lowest], tick)
+            last_priority = priority
+
+        else:
+            self.fail("Lowest priority channel was never sent")
+
+        self.assertNotIn(lowest, scheduler.accumulated_priorities)
+        self.assertNotIn(lowest, scheduler.deferred_ticks)
+
+    def test_deferral_metrics(self):
+        scheduler = PriorityScheduler(starvation_threshold=2)
+        low, high = SchedulerTestChannel("low", 1.0), SchedulerTestChannel("high", 10.0)
+
+        self.schedule(scheduler, [low, high], 0)
+        self.assertEqual((scheduler.bytes_sent, scheduler.deferred_count), (10, 1))
+        self.assertEqual((scheduler.starved_count, scheduler.max_deferred_ticks), (0, 1))
+
+        self.schedule(scheduler, [low, high], 0)
+        self.assertEqual((scheduler.bytes_sent, scheduler.deferred_count), (20, 2))
+        self.assertEqual((scheduler.starved_count, scheduler.max_deferred_ticks), (1, 2))
+
+        # Channels which are no longer due are forgotten
+        self.schedule(scheduler, [high], 0)
+        self.assertEqual((scheduler.bytes_sent, scheduler.deferred_count), (30, 2))
+        self.assertEqual((scheduler.starved_count, scheduler.max_deferred_ticks), (0, 0))
+        self.assertEqual(scheduler.accumulated_priorities, {})
+
+
+class PhysicsTestActor:
+
+    def __init__(self, position):
+        self.transform = SimpleNamespace(world_position=position, world_orientation=(0.0, 0.0, 0.5))
+        self.physics = SimpleNamespace(world_velocity=(1.0, 0.0, 0.0), world_angular=(0.0, 0.0, 0.0))
+
+        self.network_states = []
+
+    def set_network_state(self, position, velocity, angular, orientation, timestamp):
+        self.network_states.append((tuple(position), tuple(velocity), tuple(angular), tuple(orientation),
+                                    timestamp))
+
+
+@unittest.skipIf(RigidBodyStateStore is None, "mathutils is not installed")
+class PhysicsTest(unittest.TestCase):
+
+    def test_changed_states(self):
+        store = RigidBodyStateStore()
+        actors = [PhysicsTestActor((float(index), 0.0, 0.0)) for index in range(4)]
+
+        # Unsaved states are always written
+        store.save(actors)
+        store.write_network_states(1.0)
+
+        self.assertEqual(store.changed_count, 4)
+        self.assertEqual([len(actor.network_states) for actor in actors], [1, 1, 1, 1])
+
+        # Unchanged states are not written again
+        store.save(actors)
+        store.write_network_states(2.0)
+
+        self.assertEqual(store.changed_count, 0)
+        self.assertEqual([len(actor.network_states) for actor in actors], [1, 1, 1, 1])
+
+        # Only states of changed actors are written
+        actors[1].transform.world_position = (1.0, 2.0, 0.0)
+        actors[3].physics.world_angular = (0.0, 0.0, 1.0)
+
+        store.save(actors)
+        store.write_network_states(3.0)
+
+        self.assertEqual(store.changed_count, 2)
+        self.assertEqual([len(actor.network_states) for actor in actors], [1, 2, 1, 2])
+        self.assertEqual(actors[1].network_states[-1][0], (1.0, 2.0, 0.0))
+        self.assertEqual(actors[3].network_states[-1][2], (0.0, 0.0, 1.0))
+
+    def test_state_round_trip(self):
+        store = RigidBodyStateStore()
+        actors = [PhysicsTestActor((float(index), -float(index), 0.25)) for index in range(3)]
+
+        for index, actor in enumerate(actors):
+            actor.physics.world_velocity = (0.5 * index, 1.0, -2.0)
+            actor.physics.world_angular = (0.0, 0.125 * index, 0.0)
+            actor.transform.world_orientation = (0.1 * index, 0.0, 3.0)
+
+        store.save(actors)
+        store.write_network_states(1.5)
+
+        # Written states are those which were saved
+        for actor in actors:
+            expected_state = (actor.transform.world_position, actor.physics.world_velocity,
+                              actor.physics.world_angular, actor.transform.world_orientation, 1.5)
+            self.assertEqual(actor.network_states, [expected_state])
+
+        # Removing an actor moves the last row into its place, keeping the states of other actors
+        removed, first, last = actors[1], actors[0], actors[2]
+        store.save([first, last])
+        store.write_network_states(2.0)
+
+        self.assertEqual(store.actors, [first, last])
+        self.assertEqual(store.changed_count, 0)
+        self.assertEqual(len(store.columns["position"]), 6)
+
+        last.transform.world_position = (9.0, 9.0, 9.0)
+        store.save([first, last])
+        store.write_network_states(3.0)
+
+        self.assertEqual(store.changed_count, 1)
+        self.assertEqual(last.network_states[-1], ((9.0, 9.0, 9.0), last.physics.world_velocity,
+                                                   last.physics.world_angular, last.transform.world_orientation,
+                                                   3.0))
+        self.assertEqual(len(first.network_states), 1)
+        self.assertEqual(len(removed.network_states), 1)
+
+
+class CompressionTestStream:
+
+    # Protocol which is not handled by other streams
+    protocol = 100
+
+    def __init__(self, dispatcher):
+        self.protocols = []
+        self.payloads = []
+
+    def handle_packets(self, packet_collection):
+        for packet in packet_collection:
+            self.protocols.append(packet.protocol)
+
+            if packet.protocol == self.protocol:
+                self.payloads.append(bytes(packet.payload))
+
+    @staticmethod
+    def pull_packets(network_tick, bandwidth):
+        return None
+
+
+class CompressionTestRules(ReplicationRulesBase):
+
+    def pre_initialise(self, addr, netmode):
+        return
+
+    def post_initialise(self, replication_stream):
+        return None
+
+    def post_disconnected(self, replication_stream, replicable):
+        return
+
+    def is_relevant(self, conn, replicable):
+        return False
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_rules, self.previous_netmode = WorldInfo.rules, WorldInfo.netmode
+        WorldInfo.rules = CompressionTestRules()
+
+        self.contexts = [Connection.get_context_manager("Compression"), Replicable.get_context_manager("Compression"),
+                         Signal.get_context_manager("Compression")]
+
+        for context in self.contexts:
+            context.__enter__()
+
+    def tearDown(self):
+        Connection.clear_graph()
+        Replicable.clear_graph()
+
+        for context in reversed(self.contexts):
+            context.__exit__(None, None, None)
+
+        WorldInfo.rules, WorldInfo.netmode = self.previous_rules, self.previous_netmode
+
+    def exchange(self, sender, receiver, receiver_netmode):
+        """Send datagrams from sender to receiver, handling them in the netmode of the receiver"""
+        datagrams = sender.send(True)
+
+        WorldInfo.netmode = receiver_netmode
+        for datagram in datagrams:
+            receiver.receive(datagram)
+
+        return datagrams
+
+    def connect(self, client_enabled, server_enabled, server_dictionary=b''):
+        """Return client and server connections which completed the handshake"""
+        WorldInfo.netmode = Netmodes.client
+        client = Connection(("127.0.0.1", 1300))
+        client.compressor.enabled = client_enabled
+
+        WorldInfo.netmode = Netmodes.server
+        server = Connection(("127.0.0.1", 1301))
+        server.compressor.enabled = server_enabled
+        server.compressor.compressor = PacketCompressor(server_dictionary)
+
+        for _ in range(3):
+            WorldInfo.netmode = Netmodes.client
+            self.exchange(client, server, Netmodes.server)
+
+            WorldInfo.netmode = Netmodes.server
+            self.exchange(server, client, Netmodes.client)
+
+        self.assertEqual(client.handshake.state, ConnectionState.connected)
+        self.assertEqual(server.handshake.state, ConnectionState.connected)
+
+        return client, server
+
+    def send_payloads(self, server, client):
+        """Send compressible payloads from server to client, and return the stream which received them"""
+        received_stream = client.dispatcher.create_stream(CompressionTestStream)
+
+        payloads = [b'attribute update ' + bytes([index]) * 16 + b' position velocity' * 4 for index in range(8)]
+        server.injector.queue.extend([Packet(protocol=CompressionTestStream.protocol, payload=payload)
+                                      for payload in payloads])
+
+        WorldInfo.netmode = Netmodes.server
+        self.exchange(server, client, Netmodes.client)
+
+        self.assertEqual(received_stream.payloads, payloads)
+        return received_stream
+
+    def test_packet_compressor(self):
+        samples = [b'attribute update ' + bytes([index]) * 8 + b' position velocity' for index in range(32)]
+        dictionary = train_dictionary(samples)
+        compressor = PacketCompressor(dictionary)
+
+        data = b''.join(samples[:4])
+        compressed = compressor.compress(data)
+
+        self.assertLess(len(compressed), len(PacketCompressor().compress(data)))
+        self.assertEqual(compressor.decompress(compressed), data)
+        self.assertIsNone(PacketCompressor().decompress(compressed))
+
+        # Data which is too small, or does not compress, is skipped
+        self.assertIsNone(compressor.compress(data[:10]))
+
+        incompressible = bytes(range(256))
+        for _ in range(PacketCompressor.probe_interval):
+            self.assertIsNone(compressor.compress(incompressible))
+
+        self.assertGreater(compressor.skipped_count, compressor.compressed_count)
+
+    def test_negotiated(self):
+        client, server = self.connect(True, True)
+
+        # Both peers agreed to compression
+        self.assertTrue(client.compressor.is_negotiated)
+        self.assertTrue(server.compressor.is_negotiated)
+
+        # Compressed datagrams are expanded by the receiving connection
+        received_stream = self.send_payloads(server, client)
+
+        self.assertIn(ConnectionProtocols.compressed, received_stream.protocols)
+        self.assertGreater(server.compressor.compressor.compressed_count, 0)
+        self.assertEqual(client.compressor.decompression_failures, 0)
+
+    def test_opted_out(self):
+        # Peers with different preset dictionaries cannot agree
+        dictionary = train_dictionary([b'attribute update ' + bytes([index]) * 8 for index in range(32)])
+
+        for client_enabled, server_enabled, server_dictionary in ((True, False, b''), (False, True, b''),
+                                                                  (True, True, dictionary)):
+            with self.subTest(client_enabled=client_enabled, server_enabled=server_enabled,
+                              same_dictionary=not server_dictionary):
+                client, server = self.connect(client_enabled, server_enabled, server_dictionary)
+
+                # Without agreement of both peers, datagrams are not compressed
+                self.assertFalse(client.compressor.is_negotiated)
+                self.assertFalse(server.compressor.is_negotiated)
+
+                received_stream = self.send_payloads(server, client)
+
+                self.assertNotIn(ConnectionProtocols.compressed, received_stream.protocols)
+                self.assertEqual(server.compressor.compressor.compressed_count, 0)
+
+                Connection.clear_graph()
+
+
+class PacketPoolTest(unittest.TestCase):
+
+    def test_packet_pool(self):
+        pool = PacketPool(max_size=1)
+        acknowledged = []
+
+        packet = pool.create(protocol=1, payload=b'abc', on_success=acknowledged.append)
+        packed = packet.to_bytes()
+
+        self.assertTrue(packet.reliable)
+        self.assertIs(packet.to_bytes(), packed)
+
+        packet.on_ack()
+
+        self.assertEqual(acknowledged, [packet])
+        self.assertEqual(pool.free, [packet])
+        self.assertEqual(packet.payload, b'')
+
+        # Released packets are reused, without their encoded bytes
+        reused = pool.create(protocol=2, payload=b'de')
+        self.assertIs(reused, packet)
+        self.assertFalse(reused.reliable)
+        self.assertEqual(reused.to_bytes(), Packet(protocol=2, payload=b'de').to_bytes())
+
+        # Free list is bounded
+        pool.create().release()
+        reused.release()
+        self.assertEqual(len(pool.free), 1)
+
 
 def run_tests():
     unittest.main(module="network.testing", exit=False)
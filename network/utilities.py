@@ -1,4 +1,6 @@
-utilities = ["clamp", "median", "lerp", "mean"]
+from math import ceil
+
+utilities = ["clamp", "median", "lerp", "mean", "percentile"]
 
 
 def clamp(low, high, value):
@@ -56,4 +58,15 @@ def median(iterable):
     else:
         start_index = total // 2
         end_index = start_index + 1
-        return (fixed[start_index] + fixed[end_index]) / 2
\ No newline at end of file
+        return (fixed[start_index] + fixed[end_index]) / 2
+
+def percentile(iterable, fraction):
+    """Finds the value below which a fraction of the terms of an iterable object fall (nearest rank)
+
+    :param iterable: iterable object
+    :param fraction: fraction of terms, from 0 to 1
+    :returns: percentile of all terms
+    """
+    fixed = sorted(iterable)
+    index = min(max(ceil(fraction * len(fixed)) - 1, 0), len(fixed) - 1)
+    return fixed[index]